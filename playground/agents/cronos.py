@@ -1,6 +1,5 @@
 import os
-from agno.agent import Agent
-from agno.storage.postgres import PostgresStorage
+from custom.agent.agent import Agent
 from agno.memory.v2.memory import Memory
 from agno.memory.v2.db.postgres import PostgresMemoryDb
 
@@ -8,9 +7,16 @@ from models.gemini import get_gemini_model
 from vectordb.pgvector import get_pgvector
 from knowledgebase.cronosKnowledge import get_cronos_knowledge
 from embedder.google import get_google_embedder
+from db.engine import get_db_engine
+from db.storage import get_agent_storage
+from cache.response import get_response_cache
+from cache.context import get_context_budget
+from cache.memory import get_memory_extractor
 
-db_url=os.getenv("PGVECTOR_URI", "postgresql+psycopg://ai:ai@localhost:5532/ai")
 def get_cronos_agent() -> Agent:
+    # Shared connection pool for the knowledge, storage and memory tables
+    db_engine = get_db_engine()
+
     # Model for the Agent
     model = get_gemini_model()
 
@@ -19,26 +25,30 @@ def get_cronos_agent() -> Agent:
     vectordb = get_pgvector(
         table_name = os.getenv("CRONOS_KNOWLEDGE_TABLE", "cronos-knowledge"),
         embedder=embedder,
+        corpus="cronos",
     )
 
     # Knowledge for the Agent
     knowledge = get_cronos_knowledge(vector_db=vectordb)
 
-    # Storage for the Agent
-    storage = PostgresStorage(
+    # Storage for the Agent: a header row per session and a row per run
+    storage = get_agent_storage(
         table_name = os.getenv("CRONOS_STORAGE_TABLE", "cronos-storage"),
-        db_url=db_url
+        db_engine=db_engine,
     )
 
     # Memory for the Agent
     memory = Memory(
         model=model,
         db=PostgresMemoryDb(
-            db_url=db_url,
+            db_engine=db_engine,
             table_name = os.getenv("TESTER_MEMORY_TABLE", "tester-memory"),
         )
     )
 
+    # Extracts user memories from the finished runs, batched per user
+    memory_extractor = get_memory_extractor()
+
     return Agent(
         model=model,
 
@@ -79,9 +89,16 @@ def get_cronos_agent() -> Agent:
         knowledge=knowledge,
         storage=storage,
 
-        # Memory
+        # Answer repeated questions from the semantic response cache
+        response_cache=get_response_cache(),
+
+        # Keep prompts under the token budget: summarize older history, trim low-ranked references
+        context_budget=get_context_budget(),
+
+        # Memory: with the background extractor, memories are made after the response instead of during the run
         memory=memory,
-        enable_agentic_memory=True,
+        memory_extractor=memory_extractor,
+        enable_agentic_memory=memory_extractor is None,
         enable_user_memories=True,
         add_history_to_messages=True,
         num_history_runs=3,
@@ -1,6 +1,5 @@
 import os
-from agno.agent import Agent
-from agno.storage.postgres import PostgresStorage
+from custom.agent.agent import Agent
 from agno.memory.v2.memory import Memory
 from agno.memory.v2.db.postgres import PostgresMemoryDb
 
@@ -8,10 +7,16 @@ from models.gemini import get_gemini_model
 from vectordb.pgvector import get_pgvector
 from knowledgebase.cronosKnowledge import get_cronos_knowledge
 from embedder.google import get_google_embedder
+from db.engine import get_db_engine
+from db.storage import get_agent_storage
+from cache.response import get_response_cache
+from cache.context import get_context_budget
 
-db_url=os.getenv("PGVECTOR_URI", "postgresql+psycopg://ai:ai@localhost:5532/ai")
 
 def get_edc_tester_agent() -> Agent:
+    # Shared connection pool for the knowledge, storage and memory tables
+    db_engine = get_db_engine()
+
     # Model for the Agent
     model = get_gemini_model()
 
@@ -20,22 +25,23 @@ def get_edc_tester_agent() -> Agent:
     vectordb = get_pgvector(
         table_name = os.getenv("EDC_TESTER_KNOWLEDGE_TABLE", "edc-tester-knowledge"),
         embedder=embedder,
+        corpus="edcTester",
     )
 
     # Knowledge for the Agent
     knowledge = get_cronos_knowledge(vector_db=vectordb)
 
-    # Storage for the Agent
-    storage = PostgresStorage(
+    # Storage for the Agent: a header row per session and a row per run
+    storage = get_agent_storage(
         table_name = os.getenv("EDC_TESTER_STORAGE_TABLE", "edc-tester-storage"),
-        db_url=db_url,
+        db_engine=db_engine,
     )
 
     # Memory for the Agent
     # memory = Memory(
     #     model=model,
     #     db=PostgresMemoryDb(
-    #         db_url=db_url,
+    #         db_engine=db_engine,
     #         table_name = os.getenv("EDC_TESTER_MEMORY_TABLE", "edc-tester-memory"),
     #     )
     # )
@@ -84,6 +90,12 @@ def get_edc_tester_agent() -> Agent:
         knowledge=knowledge,
         storage=storage,
 
+        # Answer repeated questions from the semantic response cache
+        response_cache=get_response_cache(),
+
+        # Keep prompts under the token budget: summarize older history, trim low-ranked references
+        context_budget=get_context_budget(),
+
         # Memory
         # memory=memory,
         # enable_agentic_memory=True,
@@ -0,0 +1,3 @@
+"""
+Offline benchmarks for the playground (local pgvector, no Gemini calls)
+"""
@@ -0,0 +1,144 @@
+"""
+Offline bulk load benchmark.
+
+    python -m benchmarks.bulkload [--chunks 5000] [--dimensions 768] [--output report.json]
+
+Writes the same chunks into a local pgvector (PGVECTOR_URI or --db-url) with
+PgVector's row-insert path (multi-row INSERT ... ON CONFLICT per batch) and its
+bulk_load path (binary COPY into a staging table, merged in one statement).
+Each pass times an upsert into an empty table and an upsert of the same chunks
+over it (every row updated). Embeddings are computed once, before timing, with
+the deterministic HashingEmbedder, so only the database writes are measured.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from agno.document.base import Document
+from agno.utils.log import log_info
+from sqlalchemy.engine import Engine
+
+from benchmarks.embedder import HashingEmbedder
+from custom.vectordb.pgVector import PgVector
+from db.engine import get_db_engine, get_db_url
+
+_WORDS = (
+    "pump valve sensor calibration pressure flow batch reactor cleaning protocol deviation "
+    "specification sample release stability assay buffer filter column temperature audit"
+).split()
+
+
+def build_chunks(num_chunks: int, chunk_chars: int, embedder: HashingEmbedder, seed: int = 42) -> List[Document]:
+    """Embedded chunks of random words, a few per page of a few documents"""
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(num_chunks):
+        words: List[str] = []
+        while sum(len(w) + 1 for w in words) < chunk_chars:
+            words.append(rng.choice(_WORDS))
+        content = f"chunk {i} " + " ".join(words)
+        chunk = Document(
+            id=f"doc{i // 500}_{i}",
+            name=f"doc{i // 500}",
+            content=content,
+            meta_data={"page": i % 500 // 5 + 1, "chunk": i % 5 + 1},
+        )
+        chunk.embedding = embedder.get_embedding(content)
+        chunks.append(chunk)
+    return chunks
+
+
+def measure(name: str, vector_db: PgVector, chunks: List[Document], batch_size: int, passes: int) -> Dict[str, Any]:
+    insert_seconds: List[float] = []
+    update_seconds: List[float] = []
+    for _ in range(passes):
+        vector_db.drop()
+        vector_db.create()
+        start = time.perf_counter()
+        vector_db.upsert(chunks, batch_size=batch_size)
+        insert_seconds.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        vector_db.upsert(chunks, batch_size=batch_size)
+        update_seconds.append(time.perf_counter() - start)
+    vector_db.drop()
+
+    result = {
+        "mode": name,
+        # Best of the passes, the least disturbed by the rest of the machine
+        "insert_seconds": min(insert_seconds),
+        "update_seconds": min(update_seconds),
+        "insert_chunks_per_second": len(chunks) / min(insert_seconds),
+        "update_chunks_per_second": len(chunks) / min(update_seconds),
+    }
+    log_info(
+        f"{name}: {len(chunks)} chunks upserted into an empty table in {min(insert_seconds):.2f}s, "
+        f"over existing rows in {min(update_seconds):.2f}s (best of {passes})"
+    )
+    return result
+
+
+def run(
+    db_engine: Engine,
+    chunks: List[Document],
+    embedder: HashingEmbedder,
+    schema: str,
+    batch_size: int,
+    passes: int,
+) -> List[Dict[str, Any]]:
+    results = []
+    for name, bulk_load in (("row", False), ("copy", True)):
+        vector_db = PgVector(
+            table_name=f"benchmark_bulkload_{name}",
+            schema=schema,
+            db_engine=db_engine,
+            embedder=embedder,
+            bulk_load=bulk_load,
+        )
+        results.append(measure(name, vector_db, chunks, batch_size, passes))
+    row, copy = results
+    for phase in ("insert", "update"):
+        copy[f"{phase}_speedup"] = row[f"{phase}_seconds"] / copy[f"{phase}_seconds"]
+    return results
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Compare PgVector's row-insert and COPY bulk load paths")
+    parser.add_argument("--chunks", type=int, default=5000, help="Chunks written per pass")
+    parser.add_argument("--chunk-chars", type=int, default=1000, help="Characters per chunk")
+    parser.add_argument("--dimensions", type=int, default=768, help="Embedding dimensions")
+    parser.add_argument("--batch-size", type=int, default=100, help="Chunks per INSERT on the row path")
+    parser.add_argument("--passes", type=int, default=3, help="Timed passes per mode, the best is reported")
+    parser.add_argument("--seed", type=int, default=42, help="Chunk text generator seed")
+    parser.add_argument("--db-url", help="Database url, defaults to PGVECTOR_URI")
+    parser.add_argument("--schema", default="ai")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    db_url = args.db_url or get_db_url()
+    embedder = HashingEmbedder(dimensions=args.dimensions)
+    chunks = build_chunks(args.chunks, args.chunk_chars, embedder, seed=args.seed)
+    results = run(get_db_engine(db_url), chunks, embedder, args.schema, args.batch_size, args.passes)
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "db_url": get_db_engine(db_url).url.render_as_string(hide_password=True),
+        "chunks": args.chunks,
+        "chunk_chars": args.chunk_chars,
+        "dimensions": args.dimensions,
+        "batch_size": args.batch_size,
+        "passes": args.passes,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        log_info(f"Wrote bulk load benchmark report to {args.output}")
+    else:
+        print(output)
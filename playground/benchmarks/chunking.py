@@ -0,0 +1,166 @@
+"""
+Offline chunking benchmark.
+
+    python -m benchmarks.chunking [--corpus data/cronos/pdfs] [--price-per-million 0.15] [--output report.json]
+    python -m benchmarks.chunking --corpus data/cronos/pdfs --page-cache data/cache/pages
+
+Reads every page of a PDF corpus once and chunks it with each strategy:
+per-page recursive chunking (what the knowledge bases used so far) and the
+cross-page, token-aware chunker at a few budgets. For every strategy the
+number of chunks, their size in tokens, the chunks under --tiny-tokens, the
+tokens sent to the embedder and the embedding requests at --batch-size are
+reported, with the cost at --price-per-million input tokens when given.
+Nothing is embedded or written to a database.
+
+Without --corpus a synthetic corpus is generated (see benchmarks.corpus).
+With --page-cache the extracted page text is cached on disk, so later runs
+on the same corpus skip PDF parsing; the report has the extraction time.
+Tokens are estimated from the number of characters, as the chunker does.
+"""
+import argparse
+import json
+import math
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from agno.document.base import Document
+from agno.document.chunking.recursive import RecursiveChunking
+from agno.document.chunking.strategy import ChunkingStrategy
+from agno.utils.log import log_info
+
+from benchmarks.corpus import build_synthetic_corpus
+from benchmarks.metrics import summary
+from custom.knowledge.crossPageChunking import CrossPageChunking, estimate_tokens
+from custom.knowledge.pageTextCache import PageTextCache
+from custom.knowledge.pdfReader import PDFReader
+
+DEFAULT_STRATEGIES: List[Tuple[str, ChunkingStrategy]] = [
+    ("recursive-5000", RecursiveChunking(chunk_size=5000)),
+    ("recursive-1000-overlap100", RecursiveChunking(chunk_size=1000, overlap=100)),
+    ("cross-page-256", CrossPageChunking(chunk_tokens=256)),
+    ("cross-page-512", CrossPageChunking(chunk_tokens=512)),
+    ("cross-page-1024", CrossPageChunking(chunk_tokens=1024)),
+]
+
+
+def read_corpus(corpus_path: Path, page_cache: Optional[PageTextCache] = None) -> Dict[str, List[Document]]:
+    """Unchunked page documents of every PDF, by document name"""
+    reader = PDFReader(chunk=False, page_cache=page_cache)
+    pages: Dict[str, List[Document]] = {}
+    for pdf in sorted(corpus_path.glob("**/*.pdf")):
+        name = reader.get_doc_name(pdf)
+        pages[name] = [reader.build_page_document(name, page, content) for page, content in reader.iter_pages(pdf)]
+    return pages
+
+
+def chunk_corpus(pages: Dict[str, List[Document]], strategy: ChunkingStrategy) -> List[Document]:
+    reader = PDFReader(chunking_strategy=strategy)
+    chunks: List[Document] = []
+    for page_documents in pages.values():
+        chunks.extend(reader.chunk_pages(page_documents))
+    return chunks
+
+
+def measure(
+    name: str,
+    pages: Dict[str, List[Document]],
+    strategy: ChunkingStrategy,
+    batch_size: int,
+    tiny_tokens: int,
+    price_per_million: Optional[float],
+) -> Dict[str, Any]:
+    start = time.perf_counter()
+    chunks = chunk_corpus(pages, strategy)
+    seconds = time.perf_counter() - start
+
+    tokens = [estimate_tokens(chunk.content) for chunk in chunks]
+    spanning = sum(1 for chunk in chunks if chunk.meta_data.get("page_end", chunk.meta_data["page"]) != chunk.meta_data["page"])
+    embedded_tokens = sum(tokens)
+    result = {
+        "strategy": name,
+        "chunks": len(chunks),
+        "chunk_tokens": summary(tokens),
+        "tiny_chunks": sum(1 for t in tokens if t < tiny_tokens),
+        "multi_page_chunks": spanning,
+        "embedded_tokens": embedded_tokens,
+        "embedding_requests": math.ceil(len(chunks) / batch_size),
+        "embedding_cost": embedded_tokens / 1_000_000 * price_per_million if price_per_million is not None else None,
+        "chunking_seconds": seconds,
+    }
+    log_info(
+        f"{name}: {len(chunks)} chunks, mean {result['chunk_tokens']['mean']:.0f} tokens, "
+        f"{result['tiny_chunks']} under {tiny_tokens} tokens, {embedded_tokens} tokens embedded "
+        f"in {result['embedding_requests']} requests"
+    )
+    return result
+
+
+def compare(results: Sequence[Dict[str, Any]], baseline: str) -> None:
+    """Add the change in chunks, embedded tokens and requests against the baseline strategy"""
+    base = next((r for r in results if r["strategy"] == baseline), None)
+    if base is None:
+        return
+    for result in results:
+        result["vs_baseline"] = {
+            key: (result[key] - base[key]) / base[key] if base[key] else 0.0
+            for key in ("chunks", "embedded_tokens", "embedding_requests")
+        }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Compare chunk counts and embedding cost of chunking strategies")
+    parser.add_argument("--corpus", help="Directory of PDFs, defaults to a generated synthetic corpus")
+    parser.add_argument("--files", type=int, default=10, help="Synthetic corpus: number of PDFs")
+    parser.add_argument("--pages", type=int, default=20, help="Synthetic corpus: pages per PDF")
+    parser.add_argument("--seed", type=int, default=42, help="Synthetic corpus: generator seed")
+    parser.add_argument("--batch-size", type=int, default=100, help="Chunks per embedding request")
+    parser.add_argument("--tiny-tokens", type=int, default=64, help="Chunks under this many tokens count as tiny")
+    parser.add_argument("--price-per-million", type=float, help="Embedding price per million input tokens")
+    parser.add_argument("--page-cache", help="Directory of the extracted page text cache, none by default")
+    parser.add_argument("--baseline", default="recursive-5000", help="Strategy the others are compared with")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus_path = Path(args.corpus)
+    else:
+        corpus_path = Path(tempfile.mkdtemp(prefix="chunking-benchmark-")) / "corpus"
+        build_synthetic_corpus(corpus_path, num_files=args.files, pages_per_file=args.pages, seed=args.seed)
+
+    page_cache = PageTextCache(args.page_cache) if args.page_cache else None
+    start = time.perf_counter()
+    pages = read_corpus(corpus_path, page_cache)
+    extraction_seconds = time.perf_counter() - start
+    log_info(f"Read {sum(len(p) for p in pages.values())} pages in {extraction_seconds:.2f}s")
+    results = [
+        measure(name, pages, strategy, args.batch_size, args.tiny_tokens, args.price_per_million)
+        for name, strategy in DEFAULT_STRATEGIES
+    ]
+    compare(results, args.baseline)
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "corpus": {
+            "path": str(corpus_path),
+            "synthetic": not args.corpus,
+            "files": len(pages),
+            "pages": sum(len(p) for p in pages.values()),
+            "page_tokens": summary([estimate_tokens(d.content) for p in pages.values() for d in p]),
+            "extraction_seconds": extraction_seconds,
+            "page_cache_hits": page_cache.hits if page_cache else None,
+        },
+        "batch_size": args.batch_size,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        log_info(f"Wrote chunking benchmark report to {args.output}")
+    else:
+        print(output)
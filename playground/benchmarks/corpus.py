@@ -0,0 +1,139 @@
+import json
+import random
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import fitz  # PyMuPDF
+
+_SYLLABLES = ["bra", "cor", "dex", "fen", "gal", "hol", "ix", "jun", "kor", "lum", "mar", "nex", "or", "pax",
+              "quil", "ros", "sol", "tor", "ul", "vex", "wyn", "xan", "yor", "zed"]
+_TEAMS = ["platform", "payments", "identity", "search", "billing", "growth", "storage", "network", "security", "data"]
+_STORES = ["postgres", "redis", "kafka", "bigquery", "elastic", "cassandra", "spanner", "clickhouse"]
+_REGIONS = ["frankfurt", "oregon", "tokyo", "mumbai", "virginia", "sydney", "paris", "toronto"]
+_FILLER = [
+    "The {team} team reviewed the {store} capacity during quarterly planning.",
+    "Incidents in {region} are escalated to the on-call engineer of the {team} team.",
+    "Deployments to {region} are frozen during the last week of the quarter.",
+    "Dashboards for the {store} clusters are maintained by the {team} team.",
+    "Runbooks describe how to fail over from {region} to a secondary region.",
+    "Access to {store} requires approval from the {team} team lead.",
+]
+_FACTS = [
+    ("The {component} service is owned by the {team} team.", "Which team owns the {component} service?"),
+    ("{component} stores its data in the {store} cluster in {region}.", "Where does {component} store its data?"),
+    ("The {component} batch job runs every {minutes} minutes.", "How often does the {component} batch job run?"),
+    ("The {component} API listens on port {port} behind the gateway.", "Which port does the {component} API listen on?"),
+]
+
+
+@dataclass
+class LabeledQuery:
+    """A query and the (document name, page) locations that answer it"""
+
+    query: str
+    relevant: List[Dict[str, Any]] = field(default_factory=list)
+
+    @staticmethod
+    def matches(target: Dict[str, Any], name: Optional[str], meta_data: Optional[Dict[str, Any]]) -> bool:
+        """Whether a retrieved document comes from a relevant location"""
+        if target.get("name") not in (None, name):
+            return False
+        page = target.get("page")
+        return page is None or page in document_pages(meta_data or {})
+
+
+def document_pages(meta_data: Dict[str, Any]) -> List[int]:
+    """Pages a retrieved document was read from, from its metadata"""
+    if "page" in meta_data:
+        # Merged adjacent chunks can span pages
+        return list(range(meta_data["page"], meta_data.get("page_end", meta_data["page"]) + 1))
+    return []
+
+
+def _component_name(rng: random.Random, used: set) -> str:
+    while True:
+        name = "".join(rng.choice(_SYLLABLES) for _ in range(3))
+        if name not in used:
+            used.add(name)
+            return name
+
+
+def build_synthetic_corpus(
+    path: Union[str, Path],
+    num_files: int = 10,
+    pages_per_file: int = 20,
+    facts_per_page: int = 2,
+    filler_per_page: int = 6,
+    seed: int = 42,
+) -> List[LabeledQuery]:
+    """
+    Write a deterministic corpus of PDFs and return one labeled query per fact.
+
+    Every page holds a few facts about made-up components between filler
+    sentences that reuse the same vocabulary, so a query can only be answered
+    by the page that states its fact.
+
+    Args:
+        path: Directory to write the PDFs to.
+        num_files: Number of PDF files.
+        pages_per_file: Pages per file.
+        facts_per_page: Facts (and queries) per page.
+        filler_per_page: Filler sentences per page.
+        seed: Seed of the generator, the same seed gives the same corpus.
+
+    Returns:
+        The labeled queries, relevant locations are {"name": document name, "page": page number}.
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    used: set = set()
+    queries: List[LabeledQuery] = []
+
+    for file_number in range(num_files):
+        name = f"synthetic_{file_number:03d}"
+        pdf = fitz.open()
+        for page_number in range(1, pages_per_file + 1):
+            sentences = []
+            for _ in range(filler_per_page):
+                sentences.append(rng.choice(_FILLER).format(
+                    team=rng.choice(_TEAMS), store=rng.choice(_STORES), region=rng.choice(_REGIONS)
+                ))
+            for _ in range(facts_per_page):
+                fact, question = rng.choice(_FACTS)
+                values = {
+                    "component": _component_name(rng, used),
+                    "team": rng.choice(_TEAMS),
+                    "store": rng.choice(_STORES),
+                    "region": rng.choice(_REGIONS),
+                    "minutes": rng.choice([5, 10, 15, 30, 60]),
+                    "port": rng.randint(1024, 65535),
+                }
+                sentences.insert(rng.randint(0, len(sentences)), fact.format(**values))
+                queries.append(LabeledQuery(
+                    query=question.format(**values),
+                    relevant=[{"name": name, "page": page_number}],
+                ))
+            page = pdf.new_page()
+            page.insert_textbox(fitz.Rect(72, 72, page.rect.width - 72, page.rect.height - 72), "\n".join(sentences), fontsize=10)
+        pdf.save(str(path / f"{name}.pdf"))
+        pdf.close()
+    return queries
+
+
+def load_queries(path: Union[str, Path]) -> List[LabeledQuery]:
+    """Read labeled queries from a JSON Lines file of {"query": ..., "relevant": [{"name": ..., "page": ...}]}"""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                queries.append(LabeledQuery(query=item["query"], relevant=item.get("relevant", [])))
+    return queries
+
+
+def save_queries(queries: List[LabeledQuery], path: Union[str, Path]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for query in queries:
+            f.write(json.dumps(asdict(query)) + "\n")
@@ -0,0 +1,63 @@
+import hashlib
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from agno.document import Document
+from agno.embedder.base import Embedder
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class HashingEmbedder(Embedder):
+    """
+    Deterministic local stand-in for the Gemini embedder.
+
+    Texts are embedded as signed feature-hashed bags of words (log term
+    frequency, unit length), so texts sharing words are close in cosine space
+    and the same text always gets the same vector in every process.
+    latency_seconds simulates the round trip of a remote embedding API.
+    """
+
+    dimensions: int = 256
+    id: str = "hashing"
+    # Added to every call, single text or batch
+    latency_seconds: float = 0.0
+
+    def _bucket(self, token: str) -> Tuple[int, float]:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dimensions, 1.0 if value >> 63 else -1.0
+
+    def _embed(self, text: str) -> List[float]:
+        counts: Dict[str, int] = {}
+        for token in _TOKEN.findall(text.lower()):
+            counts[token] = counts.get(token, 0) + 1
+
+        vector = [0.0] * self.dimensions
+        for token, count in counts.items():
+            index, sign = self._bucket(token)
+            vector[index] += sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector] if norm else vector
+
+    def get_embedding(self, text: str) -> List[float]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return self._embed(text)
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+    def get_embeddings_and_usage(self, texts: List[str]) -> List[Tuple[List[float], Optional[Dict]]]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return [(self._embed(text), None) for text in texts]
+
+    def embed_documents(self, documents: List[Document]) -> None:
+        embeddings = self.get_embeddings_and_usage([document.content for document in documents])
+        for document, (embedding, _) in zip(documents, embeddings):
+            document.embedding = embedding
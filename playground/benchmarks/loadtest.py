@@ -0,0 +1,388 @@
+"""
+Load test of the Playground app with a mock model and embedder.
+
+    python -m benchmarks.loadtest run --concurrency 32 --sessions 200
+    python -m benchmarks.loadtest serve --port 7777
+    python -m benchmarks.loadtest run --url http://127.0.0.1:7777 --concurrency 32
+
+run drives N concurrent streaming sessions against
+/v1/playground/agents/{agent_id}/runs and reports time to first token,
+tokens/s, latency percentiles, server event-loop lag and DB pool waits as JSON.
+Without --url it starts the app in-process (in its own thread and event loop)
+with the stubs installed; serve starts the same stubbed app on its own, e.g.
+to run it under a profiler.
+
+The stubs replace models.gemini.get_gemini_model and
+embedder.google.get_google_embedder, so no Gemini calls are made, but storage,
+memory and the knowledge search the mock model calls before every answer
+(query embedding and pgvector search, unless --no-search) still go through the
+real database (PGVECTOR_URI). Empty knowledge tables are loaded with a
+synthetic corpus of --knowledge-files PDFs first. Agent tables get a "loadtest-" prefix unless
+their env vars are set.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from agno.utils.log import log_info
+from benchmarks.metrics import latency_summary, summary
+
+# Table env vars of the agents, pointed at loadtest tables unless already set
+_TABLE_ENV_VARS = {
+    "BABE_TESTER_KNOWLEDGE_TABLE": "babe-tester-knowledge",
+    "BABE_TESTER_STORAGE_TABLE": "babe-tester-storage",
+    "EDC_TESTER_KNOWLEDGE_TABLE": "edc-tester-knowledge",
+    "EDC_TESTER_STORAGE_TABLE": "edc-tester-storage",
+    "CRONOS_KNOWLEDGE_TABLE": "cronos-knowledge",
+    "CRONOS_STORAGE_TABLE": "cronos-storage",
+    "TESTER_MEMORY_TABLE": "tester-memory",
+    "DEV_KNOWLEDGE_TABLE": "dev-knowledge",
+    "DEV_STORAGE_TABLE": "dev-storage",
+    "DEV_MEMORY_TABLE": "dev-memory",
+    "KNOWLEDGE_CORPUS_TABLE": "knowledge-corpus",
+}
+
+STATS_PATH = "/v1/loadtest/stats"
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a task that sleeps for interval seconds"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def reset(self) -> None:
+        self.samples = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"samples": len(self.samples), **latency_summary(self.samples)}
+
+
+@dataclass
+class StubSettings:
+    first_token_latency: float = 0.3
+    tokens_per_second: float = 50.0
+    response_tokens: int = 200
+    embed_latency: float = 0.0
+    dimensions: int = 256
+    search_tool: Optional[str] = "search_knowledge_base"
+
+
+def load_knowledge(agents: List[Any], num_files: int, pages_per_file: int = 10) -> None:
+    """Load a synthetic corpus into the agents' knowledge tables that are empty, so their searches return chunks"""
+    from benchmarks.corpus import build_synthetic_corpus
+    from custom.knowledge.pdfKnowledge import PDFKnowledgeBase, PDFReader
+
+    corpus_path = Path(tempfile.mkdtemp(prefix="loadtest-corpus-"))
+    build_synthetic_corpus(corpus_path, num_files=num_files, pages_per_file=pages_per_file)
+    for agent in agents:
+        knowledge = agent.get().knowledge
+        vector_db = getattr(knowledge, "vector_db", None)
+        if vector_db is None or (vector_db.exists() and vector_db.get_count() > 0):
+            continue
+        PDFKnowledgeBase(
+            path=corpus_path,
+            reader=PDFReader(),
+            vector_db=vector_db,
+            chunking_strategy=knowledge.chunking_strategy,
+            manifest_path=corpus_path / f".{vector_db.table_name}.manifest.json",
+        ).load(upsert=True)
+        log_info(f"Loaded {vector_db.get_count()} synthetic chunks into {vector_db.table_name}")
+
+
+def build_app(stubs: StubSettings, knowledge_files: int = 5):
+    """
+    Import main with the stubs installed and add the loadtest stats endpoint.
+
+    With knowledge_files, empty knowledge tables get a synthetic corpus of that many PDFs first.
+    """
+    for env_var, default in _TABLE_ENV_VARS.items():
+        os.environ.setdefault(env_var, f"loadtest-{default}")
+
+    from benchmarks.stubs import install_stubs
+    install_stubs(**asdict(stubs))
+
+    import main
+    if knowledge_files > 0 and stubs.search_tool is not None:
+        load_knowledge(main.registry.agents, knowledge_files)
+    from db.engine import get_pool_stats
+
+    app = main.app
+    monitor = LoopLagMonitor()
+
+    # async handlers run on the server's event loop, which the monitor has to sample
+    @app.get(STATS_PATH)
+    async def loadtest_stats():
+        monitor.start()
+        return {"event_loop_lag_ms": monitor.to_dict(), "pool": get_pool_stats()}
+
+    @app.delete(STATS_PATH)
+    async def reset_loadtest_stats():
+        monitor.start()
+        monitor.reset()
+        return {"reset": True}
+
+    return app
+
+
+def start_server_thread(app, host: str = "127.0.0.1", port: int = 0):
+    """Serve the app from a background thread with its own event loop, returns (server, thread, url)"""
+    import uvicorn
+
+    if port == 0:
+        with socket.socket() as s:
+            s.bind((host, 0))
+            port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="loadtest-server", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Load test server failed to start")
+        time.sleep(0.05)
+    return server, thread, f"http://{host}:{port}"
+
+
+@dataclass
+class RunResult:
+    """Client-side timings of one streamed run"""
+
+    ok: bool
+    seconds: float
+    ttft: Optional[float] = None
+    tokens: int = 0
+    # Time between first and last token
+    stream_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def _decode_events(buffer: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Split the concatenated JSON objects the runs endpoint streams, returns (events, rest)"""
+    decoder = json.JSONDecoder()
+    events = []
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            return events, ""
+        try:
+            event, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            return events, buffer
+        events.append(event)
+        buffer = buffer[end:]
+
+
+async def stream_run(client: httpx.AsyncClient, agent_id: str, message: str, session_id: str, user_id: str) -> RunResult:
+    start = time.perf_counter()
+    first_token = last_token = None
+    tokens = 0
+    try:
+        async with client.stream(
+            "POST",
+            f"/v1/playground/agents/{agent_id}/runs",
+            data={"message": message, "stream": "true", "session_id": session_id, "user_id": user_id},
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return RunResult(ok=False, seconds=time.perf_counter() - start, error=f"HTTP {response.status_code}")
+            buffer = ""
+            async for text in response.aiter_text():
+                events, buffer = _decode_events(buffer + text)
+                for event in events:
+                    if event.get("event") == "RunError":
+                        return RunResult(ok=False, seconds=time.perf_counter() - start, error=str(event.get("content")))
+                    if event.get("event") == "RunResponse" and event.get("content"):
+                        now = time.perf_counter()
+                        first_token = first_token or now
+                        last_token = now
+                        tokens += 1
+    except httpx.HTTPError as e:
+        return RunResult(ok=False, seconds=time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+
+    end = time.perf_counter()
+    return RunResult(
+        ok=tokens > 0,
+        seconds=end - start,
+        ttft=first_token - start if first_token else None,
+        tokens=tokens,
+        stream_seconds=(last_token - first_token) if first_token else 0.0,
+        error=None if tokens else "No tokens streamed",
+    )
+
+
+@dataclass
+class LoadTestConfig:
+    concurrency: int = 16
+    sessions: int = 100
+    # Runs per session, later runs load the session history from storage
+    turns: int = 1
+    message: str = "Draft test cases for a login form with email and password."
+    agent: Optional[str] = None
+    timeout: float = 120.0
+    stubs: Optional[StubSettings] = field(default=None)
+
+
+async def run_load_test(url: str, config: LoadTestConfig) -> Dict[str, Any]:
+    """Drive config.sessions sessions, config.concurrency at a time, against a running app"""
+    limits = httpx.Limits(max_connections=config.concurrency + 2, max_keepalive_connections=config.concurrency + 2)
+    async with httpx.AsyncClient(base_url=url, timeout=config.timeout, limits=limits) as client:
+        agents = (await client.get("/v1/playground/agents")).raise_for_status().json()
+        if not agents:
+            raise RuntimeError("The app serves no agents")
+        agent = agents[0]
+        if config.agent:
+            agent = next((a for a in agents if config.agent in (a.get("agent_id"), a.get("name"))), None)
+            if agent is None:
+                raise RuntimeError(f"No agent {config.agent!r}, available: {[a.get('name') for a in agents]}")
+        agent_id = agent["agent_id"]
+
+        stats_before = (await client.get(STATS_PATH)).json() if (await client.delete(STATS_PATH)).status_code == 200 else None
+
+        run_id = f"loadtest-{int(time.time())}"
+        next_session = iter(range(config.sessions))
+        results: List[RunResult] = []
+
+        async def worker():
+            for session_number in next_session:
+                for turn in range(config.turns):
+                    results.append(await stream_run(
+                        client,
+                        agent_id,
+                        message=f"{config.message} (session {session_number}, turn {turn})",
+                        session_id=f"{run_id}-{session_number}",
+                        user_id=f"{run_id}-user-{session_number % 10}",
+                    ))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(config.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        stats_after = (await client.get(STATS_PATH)).json() if stats_before is not None else None
+
+    ok = [r for r in results if r.ok]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r.ok:
+            errors[r.error or "error"] = errors.get(r.error or "error", 0) + 1
+    report: Dict[str, Any] = {
+        "url": url,
+        "agent": {"agent_id": agent_id, "name": agent.get("name")},
+        "config": asdict(config),
+        "runs": len(results),
+        "failed": len(results) - len(ok),
+        "errors": errors,
+        "seconds": elapsed,
+        "runs_per_second": len(ok) / elapsed if elapsed else 0.0,
+        "tokens_per_second": sum(r.tokens for r in ok) / elapsed if elapsed else 0.0,
+        "ttft_ms": latency_summary([r.ttft for r in ok if r.ttft is not None]),
+        "latency_ms": latency_summary([r.seconds for r in ok]),
+        "stream_tokens_per_second": summary([r.tokens / r.stream_seconds for r in ok if r.stream_seconds > 0]),
+    }
+    if stats_after is not None:
+        report["event_loop_lag_ms"] = stats_after["event_loop_lag_ms"]
+        report["db_pool"] = _pool_delta(stats_before["pool"], stats_after["pool"])
+    return report
+
+
+def _pool_delta(before: Dict[str, Dict[str, Any]], after: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Pool counters accumulated during the test, plus the pool size after it"""
+    delta = {}
+    for url, stats in after.items():
+        previous = before.get(url, {})
+        delta[url] = {
+            **{k: stats[k] for k in ("size", "overflow", "max_wait_seconds") if k in stats},
+            **{k: stats[k] - previous.get(k, 0) for k in ("checkouts", "waits", "wait_seconds", "timeouts") if k in stats},
+        }
+    return delta
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Load test the Playground app with a mock model")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "serve"):
+        sub = subcommands.add_parser(name)
+        sub.add_argument("--first-token-latency", type=float, default=0.3, help="Mock model: seconds before the first token")
+        sub.add_argument("--tokens-per-second", type=float, default=50.0, help="Mock model: streaming rate")
+        sub.add_argument("--response-tokens", type=int, default=200, help="Mock model: tokens per answer")
+        sub.add_argument("--embed-latency", type=float, default=0.0, help="Mock embedder: seconds per call")
+        sub.add_argument("--dimensions", type=int, default=256, help="Mock embedder: dimensions")
+        sub.add_argument("--no-search", action="store_true", help="Mock model: answer without calling the knowledge search")
+        sub.add_argument("--knowledge-files", type=int, default=5, help="Synthetic PDFs loaded into empty knowledge tables, 0 for none")
+    serve_parser = subcommands.choices["serve"]
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=7777)
+    run_parser = subcommands.choices["run"]
+    run_parser.add_argument("--url", help="Running app to test, defaults to starting one in-process")
+    run_parser.add_argument("--concurrency", type=int, default=16, help="Concurrent sessions")
+    run_parser.add_argument("--sessions", type=int, default=100, help="Total sessions")
+    run_parser.add_argument("--turns", type=int, default=1, help="Runs per session")
+    run_parser.add_argument("--agent", help="Agent name or id, defaults to the first agent")
+    run_parser.add_argument("--timeout", type=float, default=120.0, help="Seconds per request")
+    run_parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    stubs = StubSettings(
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        embed_latency=args.embed_latency,
+        dimensions=args.dimensions,
+        search_tool=None if args.no_search else "search_knowledge_base",
+    )
+    if args.command == "serve":
+        import uvicorn
+        uvicorn.run(build_app(stubs, args.knowledge_files), host=args.host, port=args.port)
+    else:
+        server = None
+        url = args.url
+        if url is None:
+            server, thread, url = start_server_thread(build_app(stubs, args.knowledge_files))
+        config = LoadTestConfig(
+            concurrency=args.concurrency,
+            sessions=args.sessions,
+            turns=args.turns,
+            agent=args.agent,
+            timeout=args.timeout,
+            stubs=stubs if args.url is None else None,
+        )
+        try:
+            report = asyncio.run(run_load_test(url, config))
+        finally:
+            if server is not None:
+                server.should_exit = True
+                thread.join(timeout=10)
+        log_info(
+            f"{report['runs']} runs ({report['failed']} failed) in {report['seconds']:.1f}s: "
+            f"TTFT p50 {report['ttft_ms']['p50']:.0f}ms / p99 {report['ttft_ms']['p99']:.0f}ms, "
+            f"latency p99 {report['latency_ms']['p99']:.0f}ms, {report['tokens_per_second']:.0f} tokens/s"
+        )
+        output = json.dumps(report, indent=2)
+        if args.output:
+            Path(args.output).write_text(output, encoding="utf-8")
+        else:
+            print(output)
@@ -0,0 +1,30 @@
+import math
+from typing import Dict, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """q-th percentile (0-100) with linear interpolation between the closest ranks"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower, upper = math.floor(position), math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summary(values: Sequence[float], scale: float = 1.0) -> Dict[str, float]:
+    """Mean, p50, p95, p99 and max of a list of values, multiplied by scale"""
+    if not values:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "mean": scale * sum(values) / len(values),
+        "p50": scale * percentile(values, 50),
+        "p95": scale * percentile(values, 95),
+        "p99": scale * percentile(values, 99),
+        "max": scale * max(values),
+    }
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    """Mean, p50, p95, p99 and max of a list of durations, in milliseconds"""
+    return summary(seconds, scale=1000)
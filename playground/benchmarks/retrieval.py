@@ -0,0 +1,340 @@
+"""
+Offline retrieval benchmark.
+
+    python -m benchmarks.retrieval [--configs configs.json] [--output report.json]
+    python -m benchmarks.retrieval --corpus data/cronos/pdfs --queries queries.jsonl
+
+Loads a PDF corpus through PDFKnowledgeBase into a local pgvector (PGVECTOR_URI
+or --db-url, see pgvector.docker-compose.yaml) with the deterministic
+HashingEmbedder, so no Gemini calls are made. Every configuration then replays
+the labeled queries, and recall@k, MRR, latency percentiles and QPS are written
+as JSON.
+
+Without --corpus a synthetic corpus with one labeled query per fact is
+generated. --configs is a JSON list of BenchmarkConfig fields, e.g.
+[{"name": "hybrid-k10", "search_type": "hybrid", "num_documents": 10}].
+Configurations that chunk and index the same way share one loaded table.
+"""
+import argparse
+import hashlib
+import json
+import tempfile
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from agno.document.chunking.recursive import RecursiveChunking
+from agno.document.chunking.strategy import ChunkingStrategy
+from agno.utils.log import log_info
+from agno.vectordb.pgvector import HNSW, Ivfflat, SearchType
+from sqlalchemy.engine import Engine
+
+from benchmarks.corpus import LabeledQuery, build_synthetic_corpus, load_queries, save_queries
+from benchmarks.embedder import HashingEmbedder
+from benchmarks.metrics import latency_summary
+from custom.knowledge.crossPageChunking import CrossPageChunking
+from custom.knowledge.pageTextCache import PageTextCache
+from custom.knowledge.pdfKnowledge import PDFKnowledgeBase, PDFReader
+from custom.vectordb.pgVector import PgVector
+from custom.vectordb.searchPostProcessor import SearchPostProcessor
+from db.engine import get_db_engine, get_db_url
+
+# Cut-offs recall is reported at, when not above num_documents
+_RECALL_CUTOFFS = (1, 3, 5, 10, 20)
+
+
+@dataclass
+class BenchmarkConfig:
+    """One retrieval configuration to benchmark"""
+
+    name: str
+    search_type: str = "hybrid"
+    num_documents: int = 5
+    # Chunking, changes what is loaded: "recursive" (chunk_size characters per page)
+    # or "cross_page" (chunk_tokens tokens, spanning pages)
+    chunk: bool = True
+    chunking: str = "recursive"
+    chunk_size: int = 5000
+    chunk_overlap: int = 0
+    chunk_tokens: int = 512
+    # ANN index build parameters, change what is loaded
+    index: str = "hnsw"
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    ivfflat_lists: int = 0
+    # Query-time parameters
+    ef_search: int = 40
+    probes: int = 10
+    vector_score_weight: float = 0.5
+    hybrid_candidates: int = 40
+    rrf_k: int = 60
+    # Retrieval post-processing (see SearchPostProcessor)
+    post_processing: bool = False
+    candidate_multiplier: int = 4
+    duplicate_threshold: float = 0.95
+    mmr_lambda: float = 0.7
+    merge_adjacent: bool = True
+
+    def post_processor(self) -> Optional[SearchPostProcessor]:
+        if not self.post_processing:
+            return None
+        return SearchPostProcessor(
+            candidate_multiplier=self.candidate_multiplier,
+            duplicate_threshold=self.duplicate_threshold,
+            mmr_lambda=self.mmr_lambda,
+            merge_adjacent=self.merge_adjacent,
+        )
+
+    def chunking_strategy(self) -> ChunkingStrategy:
+        if self.chunking == "cross_page":
+            return CrossPageChunking(chunk_tokens=self.chunk_tokens)
+        return RecursiveChunking(chunk_size=self.chunk_size, overlap=self.chunk_overlap)
+
+    def load_key(self) -> str:
+        """Hash of the settings that change the table contents or its index"""
+        key = (self.chunk, self.chunk_size, self.chunk_overlap, self.index, self.hnsw_m,
+               self.hnsw_ef_construction, self.ivfflat_lists)
+        if self.chunking != "recursive":
+            # Appended only for new strategies, so existing configurations keep their tables
+            key += (self.chunking, self.chunk_tokens)
+        return hashlib.md5(repr(key).encode("utf-8")).hexdigest()[:10]
+
+    def vector_index(self) -> Optional[Union[HNSW, Ivfflat]]:
+        if self.index == "hnsw":
+            return HNSW(m=self.hnsw_m, ef_construction=self.hnsw_ef_construction, ef_search=self.ef_search)
+        if self.index == "ivfflat":
+            return Ivfflat(lists=self.ivfflat_lists or 100, dynamic_lists=self.ivfflat_lists == 0, probes=self.probes)
+        return None
+
+
+DEFAULT_CONFIGS = [
+    BenchmarkConfig(name="vector-k5", search_type="vector"),
+    BenchmarkConfig(name="keyword-k5", search_type="keyword"),
+    BenchmarkConfig(name="hybrid-k5", search_type="hybrid"),
+    BenchmarkConfig(name="hybrid-k10", search_type="hybrid", num_documents=10),
+    BenchmarkConfig(name="hybrid-k5-ef100", search_type="hybrid", ef_search=100),
+    BenchmarkConfig(name="hybrid-k5-chunk1000", search_type="hybrid", chunk_size=1000, chunk_overlap=100),
+    BenchmarkConfig(name="hybrid-k5-ivfflat", search_type="hybrid", index="ivfflat"),
+    BenchmarkConfig(name="hybrid-k5-mmr", search_type="hybrid", post_processing=True),
+    BenchmarkConfig(name="hybrid-k5-crosspage", search_type="hybrid", chunking="cross_page"),
+]
+
+
+def load_configs(path: Union[str, Path]) -> List[BenchmarkConfig]:
+    known = {f.name for f in fields(BenchmarkConfig)}
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    configs = []
+    for item in items:
+        unknown = set(item) - known
+        if unknown:
+            raise ValueError(f"Unknown benchmark config fields: {sorted(unknown)}")
+        configs.append(BenchmarkConfig(**item))
+    return configs
+
+
+def score_query(query: LabeledQuery, documents: Sequence[Any], cutoffs: Sequence[int]) -> Dict[str, float]:
+    """Recall at each cut-off and reciprocal rank of one query's results"""
+    ranks = []
+    for target in query.relevant:
+        rank = next(
+            (i for i, doc in enumerate(documents, start=1) if LabeledQuery.matches(target, doc.name, doc.meta_data)),
+            None,
+        )
+        ranks.append(rank)
+    found = [rank for rank in ranks if rank is not None]
+    scores = {
+        f"recall@{k}": (sum(1 for rank in found if rank <= k) / len(ranks)) if ranks else 0.0 for k in cutoffs
+    }
+    scores["mrr"] = 1.0 / min(found) if found else 0.0
+    return scores
+
+
+class RetrievalBenchmark:
+    """Loads a corpus once per distinct table layout and replays labeled queries per configuration"""
+
+    def __init__(
+        self,
+        corpus_path: Union[str, Path],
+        queries: List[LabeledQuery],
+        db_engine: Engine,
+        embedder: Optional[HashingEmbedder] = None,
+        work_dir: Optional[Union[str, Path]] = None,
+        schema: str = "ai",
+        warmup: int = 20,
+        repeat: int = 1,
+    ):
+        self.corpus_path = Path(corpus_path)
+        self.queries = queries
+        self.db_engine = db_engine
+        self.embedder = embedder or HashingEmbedder()
+        self.work_dir = Path(work_dir or tempfile.mkdtemp(prefix="retrieval-benchmark-"))
+        self.schema = schema
+        self.warmup = warmup
+        self.repeat = max(1, repeat)
+        # load key -> {"table": ..., "seconds": ..., "documents": ...}
+        self.loaded: Dict[str, Dict[str, Any]] = {}
+        # Configurations that chunk differently parse every PDF only once
+        self.page_cache = PageTextCache(self.work_dir / "pages")
+
+    def _knowledge(self, config: BenchmarkConfig) -> PDFKnowledgeBase:
+        table_name = f"benchmark_{config.load_key()}"
+        vector_db = PgVector(
+            table_name=table_name,
+            schema=self.schema,
+            db_engine=self.db_engine,
+            embedder=self.embedder,
+            search_type=SearchType(config.search_type),
+            vector_index=config.vector_index(),
+            vector_score_weight=config.vector_score_weight,
+            hybrid_candidates=config.hybrid_candidates,
+            rrf_k=config.rrf_k,
+            post_processor=config.post_processor(),
+            bulk_load=True,
+            defer_index_build=True,
+        )
+        return PDFKnowledgeBase(
+            path=self.corpus_path,
+            reader=PDFReader(chunk=config.chunk, page_cache=self.page_cache),
+            vector_db=vector_db,
+            num_documents=config.num_documents,
+            chunking_strategy=config.chunking_strategy(),
+            manifest_path=self.work_dir / f".{table_name}.manifest.json",
+        )
+
+    def _load(self, config: BenchmarkConfig, knowledge: PDFKnowledgeBase) -> Dict[str, Any]:
+        key = config.load_key()
+        if key not in self.loaded:
+            start = time.perf_counter()
+            knowledge.load(recreate=True, upsert=True)
+            self.loaded[key] = {
+                "table": knowledge.vector_db.table_name,
+                "seconds": time.perf_counter() - start,
+                "documents": knowledge.vector_db.get_count(),
+            }
+            log_info(f"Loaded {self.loaded[key]['documents']} documents into {self.loaded[key]['table']}")
+        return self.loaded[key]
+
+    def run_config(self, config: BenchmarkConfig) -> Dict[str, Any]:
+        knowledge = self._knowledge(config)
+        load = self._load(config, knowledge)
+        # The table may have been loaded by a vector-only configuration, which skips the text search column
+        knowledge.vector_db.ensure_text_search()
+        cutoffs = [k for k in _RECALL_CUTOFFS if k < config.num_documents] + [config.num_documents]
+
+        for query in self.queries[: self.warmup]:
+            knowledge.search(query=query.query)
+
+        latencies: List[float] = []
+        context_chars = 0
+        totals: Dict[str, float] = {}
+        start = time.perf_counter()
+        for _ in range(self.repeat):
+            for query in self.queries:
+                query_start = time.perf_counter()
+                documents = knowledge.search(query=query.query)
+                latencies.append(time.perf_counter() - query_start)
+                context_chars += sum(len(doc.content) for doc in documents)
+                for metric, value in score_query(query, documents, cutoffs).items():
+                    totals[metric] = totals.get(metric, 0.0) + value
+        elapsed = time.perf_counter() - start
+
+        num_runs = len(latencies)
+        result = {
+            "config": asdict(config),
+            "load": load,
+            "queries": len(self.queries),
+            "retrieval": {metric: value / num_runs for metric, value in totals.items()} if num_runs else {},
+            # Prompt size the results cost, per query
+            "context_chars": context_chars / num_runs if num_runs else 0.0,
+            "latency_ms": latency_summary(latencies),
+            "qps": num_runs / elapsed if elapsed else 0.0,
+        }
+        retrieval = result["retrieval"]
+        log_info(
+            f"{config.name}: recall@{config.num_documents} {retrieval.get(f'recall@{config.num_documents}', 0):.3f}, "
+            f"MRR {retrieval.get('mrr', 0):.3f}, {result['context_chars']:.0f} chars, p50 {result['latency_ms']['p50']:.1f}ms, "
+            f"p99 {result['latency_ms']['p99']:.1f}ms, {result['qps']:.1f} QPS"
+        )
+        return result
+
+    def run(self, configs: Sequence[BenchmarkConfig]) -> List[Dict[str, Any]]:
+        return [self.run_config(config) for config in configs]
+
+    def drop_tables(self) -> None:
+        for load in self.loaded.values():
+            PgVector(table_name=load["table"], schema=self.schema, db_engine=self.db_engine, embedder=self.embedder).drop()
+        self.loaded.clear()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency against a local pgvector")
+    parser.add_argument("--configs", help="JSON list of BenchmarkConfig fields, defaults to DEFAULT_CONFIGS")
+    parser.add_argument("--corpus", help="Directory of PDFs, defaults to a generated synthetic corpus")
+    parser.add_argument("--queries", help="JSON Lines labeled queries, required with --corpus")
+    parser.add_argument("--files", type=int, default=10, help="Synthetic corpus: number of PDFs")
+    parser.add_argument("--pages", type=int, default=20, help="Synthetic corpus: pages per PDF")
+    parser.add_argument("--seed", type=int, default=42, help="Synthetic corpus: generator seed")
+    parser.add_argument("--dimensions", type=int, default=256, help="Embedding dimensions")
+    parser.add_argument("--warmup", type=int, default=20, help="Queries run before timing each configuration")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed passes over the query set")
+    parser.add_argument("--db-url", help="Database url, defaults to PGVECTOR_URI")
+    parser.add_argument("--schema", default="ai")
+    parser.add_argument("--keep-tables", action="store_true", help="Keep the benchmark tables after the run")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="retrieval-benchmark-"))
+    if args.corpus:
+        if not args.queries:
+            parser.error("--queries is required with --corpus")
+        corpus_path = Path(args.corpus)
+        queries = load_queries(args.queries)
+    else:
+        corpus_path = work_dir / "corpus"
+        queries = build_synthetic_corpus(corpus_path, num_files=args.files, pages_per_file=args.pages, seed=args.seed)
+        save_queries(queries, work_dir / "queries.jsonl")
+
+    configs = load_configs(args.configs) if args.configs else DEFAULT_CONFIGS
+    db_url = args.db_url or get_db_url()
+    embedder = HashingEmbedder(dimensions=args.dimensions)
+    benchmark = RetrievalBenchmark(
+        corpus_path=corpus_path,
+        queries=queries,
+        db_engine=get_db_engine(db_url),
+        embedder=embedder,
+        work_dir=work_dir,
+        schema=args.schema,
+        warmup=args.warmup,
+        repeat=args.repeat,
+    )
+    try:
+        results = benchmark.run(configs)
+    finally:
+        if not args.keep_tables:
+            benchmark.drop_tables()
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "db_url": get_db_engine(db_url).url.render_as_string(hide_password=True),
+        "embedder": {"id": embedder.id, "dimensions": embedder.dimensions},
+        "corpus": {
+            "path": str(corpus_path),
+            "synthetic": not args.corpus,
+            "files": len(list(corpus_path.glob("**/*.pdf"))),
+            "queries": len(queries),
+            "seed": None if args.corpus else args.seed,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        log_info(f"Wrote benchmark report to {args.output}")
+    else:
+        print(output)
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
+
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+
+from benchmarks.embedder import HashingEmbedder
+
+_WORDS = ["the", "test", "case", "should", "verify", "that", "user", "can", "submit", "form", "with", "valid",
+          "input", "and", "see", "a", "confirmation", "message", "when", "given", "then", "scenario", "step"]
+
+
+@dataclass
+class MockModel(Model):
+    """
+    Deterministic local stand-in for Gemini.
+
+    Streams response_tokens words, the first after first_token_latency seconds
+    and the rest at tokens_per_second. The words are seeded by the last user
+    message and the tool results since, so the same question against the same
+    knowledge gets the same answer.
+
+    When the agent gives it a tool named search_tool (its knowledge search by
+    default), every question is first answered with a call to that tool, with
+    the question as the query, after first_token_latency seconds; the answer is
+    streamed once the tool result is back, as a real model would.
+    """
+
+    id: str = "mock"
+    name: str = "MockModel"
+    provider: str = "Mock"
+
+    first_token_latency: float = 0.3
+    tokens_per_second: float = 50.0
+    response_tokens: int = 200
+    # Tool called before answering, None to answer straight away
+    search_tool: Optional[str] = "search_knowledge_base"
+
+    def _tool_call(self, messages: List[Message]) -> Optional[Dict[str, Any]]:
+        """The search tool call to make, None once its result is in the messages or without the tool"""
+        if self.search_tool is None or not self._functions:
+            return None
+        # Async runs register the async variant of the agent's knowledge search
+        name = next((n for n in (self.search_tool, f"async_{self.search_tool}") if n in self._functions), None)
+        if name is None:
+            return None
+        last_user = max((i for i, m in enumerate(messages) if m.role == "user"), default=-1)
+        if last_user < 0 or any(m.role == "tool" for m in messages[last_user + 1 :]):
+            return None
+        question = messages[last_user].get_content_string()
+        return {
+            "id": f"call_{hashlib.md5(question.encode('utf-8')).hexdigest()[:12]}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps({"query": question})},
+        }
+
+    def _tokens(self, messages: List[Message]) -> List[str]:
+        last_user = max((i for i, m in enumerate(messages) if m.role == "user"), default=-1)
+        seed = "\n".join(m.get_content_string() for m in messages[last_user:] if m.role in ("user", "tool"))
+        rng = random.Random(hashlib.md5(seed.encode("utf-8")).hexdigest())
+        return [rng.choice(_WORDS) + " " for _ in range(self.response_tokens)]
+
+    @property
+    def _token_interval(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def invoke(self, messages: List[Message], **kwargs) -> Union[str, Dict[str, Any]]:
+        tool_call = self._tool_call(messages)
+        if tool_call is not None:
+            time.sleep(self.first_token_latency)
+            return {"tool_calls": [tool_call]}
+        tokens = self._tokens(messages)
+        time.sleep(self.first_token_latency + self._token_interval * max(0, len(tokens) - 1))
+        return "".join(tokens)
+
+    async def ainvoke(self, messages: List[Message], **kwargs) -> Union[str, Dict[str, Any]]:
+        tool_call = self._tool_call(messages)
+        if tool_call is not None:
+            await asyncio.sleep(self.first_token_latency)
+            return {"tool_calls": [tool_call]}
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.first_token_latency + self._token_interval * max(0, len(tokens) - 1))
+        return "".join(tokens)
+
+    def invoke_stream(self, messages: List[Message], **kwargs) -> Iterator[Union[str, Dict[str, Any]]]:
+        time.sleep(self.first_token_latency)
+        tool_call = self._tool_call(messages)
+        if tool_call is not None:
+            yield {"tool_calls": [tool_call]}
+            return
+        for i, token in enumerate(self._tokens(messages)):
+            if i:
+                time.sleep(self._token_interval)
+            yield token
+
+    async def ainvoke_stream(self, messages: List[Message], **kwargs) -> AsyncIterator[Union[str, Dict[str, Any]]]:
+        await asyncio.sleep(self.first_token_latency)
+        tool_call = self._tool_call(messages)
+        if tool_call is not None:
+            yield {"tool_calls": [tool_call]}
+            return
+        for i, token in enumerate(self._tokens(messages)):
+            if i:
+                await asyncio.sleep(self._token_interval)
+            yield token
+
+    def parse_provider_response(self, response: Any) -> ModelResponse:
+        if isinstance(response, dict):
+            return ModelResponse(role="assistant", tool_calls=response["tool_calls"])
+        return ModelResponse(role="assistant", content=response)
+
+    def parse_provider_response_delta(self, response: Any) -> ModelResponse:
+        return self.parse_provider_response(response)
+
+
+def install_stubs(
+    first_token_latency: float = 0.3,
+    tokens_per_second: float = 50.0,
+    response_tokens: int = 200,
+    embed_latency: float = 0.0,
+    dimensions: int = 256,
+    search_tool: Optional[str] = "search_knowledge_base",
+) -> None:
+    """
+    Replace models.gemini.get_gemini_model and embedder.google.get_google_embedder with local stubs.
+
+    Must run before the agents modules are imported, they bind the factories at import time.
+    """
+    stale = [name for name in sys.modules if name.startswith("agents.") or name == "main"]
+    if stale:
+        raise RuntimeError(f"Install the stubs before importing {', '.join(sorted(stale))}")
+
+    import embedder.google
+    import models.gemini
+
+    def get_mock_model(system_prompt: Optional[str] = None) -> Model:
+        return MockModel(
+            first_token_latency=first_token_latency,
+            tokens_per_second=tokens_per_second,
+            response_tokens=response_tokens,
+            search_tool=search_tool,
+            system_prompt=system_prompt,
+        )
+
+    def get_hashing_embedder() -> HashingEmbedder:
+        return HashingEmbedder(dimensions=dimensions, latency_seconds=embed_latency)
+
+    models.gemini.get_gemini_model = get_mock_model
+    embedder.google.get_google_embedder = get_hashing_embedder
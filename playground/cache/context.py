@@ -0,0 +1,25 @@
+import os
+from typing import Optional
+
+from custom.agent.contextBudget import ContextBudget
+from models.gemini import get_gemini_model
+
+# One budget per process, shared by all agents (summaries are keyed by session id)
+_context_budget: Optional[ContextBudget] = None
+
+def get_context_budget() -> Optional[ContextBudget]:
+    """Get the prompt context budget, or None when CONTEXT_BUDGET_ENABLED is not "true"."""
+    global _context_budget
+    if os.getenv("CONTEXT_BUDGET_ENABLED", "true").lower() != "true":
+        return None
+    if _context_budget is None:
+        summarize = os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() == "true"
+        _context_budget = ContextBudget(
+            max_prompt_tokens=int(os.getenv("CONTEXT_MAX_PROMPT_TOKENS", "16000")),
+            max_reference_tokens=int(os.getenv("CONTEXT_MAX_REFERENCE_TOKENS", "4000")),
+            keep_recent_runs=int(os.getenv("HISTORY_KEEP_RECENT_RUNS", "1")),
+            # A model instance of its own, without the tools of an agent
+            summary_model=get_gemini_model() if summarize else None,
+            summary_max_words=int(os.getenv("HISTORY_SUMMARY_MAX_WORDS", "300")),
+        )
+    return _context_budget
@@ -0,0 +1,27 @@
+import os
+from typing import Optional
+
+from custom.agent.memoryExtractor import MemoryExtractor
+
+# One extractor per process, shared by all agents (runs are batched per memory table and user)
+_memory_extractor: Optional[MemoryExtractor] = None
+
+def get_memory_extractor() -> Optional[MemoryExtractor]:
+    """Get the background user-memory extractor, or None when MEMORY_EXTRACTION_DEFERRED is not "true"."""
+    global _memory_extractor
+    if os.getenv("MEMORY_EXTRACTION_DEFERRED", "true").lower() != "true":
+        return None
+    if _memory_extractor is None:
+        _memory_extractor = MemoryExtractor(
+            batch_runs=int(os.getenv("MEMORY_EXTRACTION_BATCH_RUNS", "5")),
+            batch_wait_seconds=float(os.getenv("MEMORY_EXTRACTION_BATCH_WAIT_SECONDS", "3")),
+            max_concurrency=int(os.getenv("MEMORY_EXTRACTION_CONCURRENCY", "2")),
+            max_queued_runs=int(os.getenv("MEMORY_EXTRACTION_MAX_QUEUED_RUNS", "1000")),
+            next_turn_wait_seconds=float(os.getenv("MEMORY_EXTRACTION_NEXT_TURN_WAIT_SECONDS", "10")),
+        )
+    return _memory_extractor
+
+def close_memory_extractor(timeout: Optional[float] = None) -> None:
+    """Extract the runs still queued, e.g. on shutdown"""
+    if _memory_extractor is not None:
+        _memory_extractor.close(timeout)
@@ -0,0 +1,21 @@
+import os
+from typing import Optional
+
+from custom.agent.responseCache import ResponseCache
+
+# One cache per process, shared by all agents (entries are keyed by agent and user)
+_response_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get the semantic response cache, or None when RESPONSE_CACHE_ENABLED is not "true"."""
+    global _response_cache
+    if os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() != "true":
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+            max_entries_per_agent=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+            version_check_interval=float(os.getenv("RESPONSE_CACHE_VERSION_CHECK_SECONDS", "30")),
+        )
+    return _response_cache
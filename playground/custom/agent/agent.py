@@ -0,0 +1,381 @@
+import asyncio
+import re
+import time
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Dict, List, Optional
+from uuid import uuid4
+
+from agno.agent import Agent as AgnoAgent
+from agno.memory.v2.memory import Memory
+from agno.models.message import Message
+from agno.run.response import RunEvent, RunResponse
+from agno.utils.log import log_debug, log_info, log_warning
+from agno.run.messages import RunMessages
+from agno.storage.session.agent import AgentSession
+from custom.agent.contextBudget import ContextBudget
+from custom.agent.memoryExtractor import MemoryExtractor
+from custom.agent.responseCache import CachedResponse, ResponseCache, ResponseCacheKey
+from custom.telemetry.telemetry import current_agent, telemetry
+
+# Split cached answers after each line so they stream like a model response
+_STREAM_PIECE = re.compile(r"[^\n]*\n|[^\n]+")
+
+
+@dataclass(init=False)
+class Agent(AgnoAgent):
+    """
+    Agent that can answer repeated questions from a semantic ResponseCache.
+
+    Only plain text questions without media are looked up, and only on the
+    first run of a session for a user without memories: a cached answer
+    depends on nothing but the question, so answers that history or memories
+    shaped are neither reused nor cached. Entries are per user. A cache hit is
+    returned (or streamed) in the usual RunResponse format and recorded in the
+    session like any other run; a miss runs the agent and caches its answer.
+
+    With a ContextBudget, the history added to each run is compacted to the
+    budget and knowledge search results are trimmed to their best ranked ones.
+
+    With a MemoryExtractor, enable_user_memories queues the run for background
+    extraction instead of creating memories before the run returns; a run
+    waits for the extraction of the user's previous runs only if it is still
+    pending.
+    """
+
+    response_cache: Optional[ResponseCache] = None
+    context_budget: Optional[ContextBudget] = None
+    memory_extractor: Optional[MemoryExtractor] = None
+
+    def __init__(
+        self,
+        *args,
+        response_cache: Optional[ResponseCache] = None,
+        context_budget: Optional[ContextBudget] = None,
+        memory_extractor: Optional[MemoryExtractor] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.response_cache = response_cache
+        self.context_budget = context_budget
+        self.memory_extractor = memory_extractor
+
+    def get_run_messages(self, *, session_id: str, **kwargs: Any) -> RunMessages:
+        run_messages = super().get_run_messages(session_id=session_id, **kwargs)
+        if self.context_budget is not None and self.add_history_to_messages:
+            run_messages.messages = self.context_budget.compact(run_messages.messages, session_id=session_id)
+        return run_messages
+
+    def get_relevant_docs_from_knowledge(
+        self, query: str, num_documents: Optional[int] = None, **kwargs
+    ) -> Optional[List[Dict[str, Any]]]:
+        docs = super().get_relevant_docs_from_knowledge(query=query, num_documents=num_documents, **kwargs)
+        if self.context_budget is not None:
+            docs = self.context_budget.trim_documents(docs)
+        return docs
+
+    async def aget_relevant_docs_from_knowledge(
+        self, query: str, num_documents: Optional[int] = None, **kwargs
+    ) -> Optional[List[Dict[str, Any]]]:
+        docs = await super().aget_relevant_docs_from_knowledge(query=query, num_documents=num_documents, **kwargs)
+        if self.context_budget is not None:
+            docs = self.context_budget.trim_documents(docs)
+        return docs
+
+    def _defer_user_memories(
+        self,
+        run_messages: RunMessages,
+        session_id: str,
+        user_id: Optional[str] = None,
+        messages: Optional[List[Any]] = None,
+    ) -> Optional[List[Message]]:
+        """Queue the run for the memory extractor, returning the messages agno counts in the session metrics"""
+        if self.memory_extractor is None or not self.enable_user_memories or not isinstance(self.memory, Memory):
+            return None
+        session_messages: List[Message] = []
+        if run_messages.user_message is None:
+            return session_messages
+        for message in messages or []:
+            if isinstance(message, Message):
+                session_messages.append(message)
+            elif isinstance(message, dict):
+                try:
+                    session_messages.append(Message(**message))
+                except Exception as e:
+                    log_warning(f"Failed to validate message: {e}")
+        self.memory_extractor.submit(
+            self.memory,
+            [run_messages.user_message, *session_messages],
+            user_id=user_id,
+            session_id=session_id,
+            agent_id=self.agent_id,
+        )
+        return session_messages
+
+    def _make_memories_and_summaries(
+        self,
+        run_messages: RunMessages,
+        session_id: str,
+        user_id: Optional[str] = None,
+        messages: Optional[List[Message]] = None,
+    ) -> None:
+        session_messages = self._defer_user_memories(run_messages, session_id, user_id, messages)
+        if session_messages is None:
+            return super()._make_memories_and_summaries(run_messages, session_id, user_id, messages)
+        if self.enable_session_summaries:
+            self.memory.create_session_summary(session_id=session_id, user_id=user_id)
+        self.session_metrics = self.calculate_session_metrics(session_messages)
+
+    async def _amake_memories_and_summaries(
+        self,
+        run_messages: RunMessages,
+        session_id: str,
+        user_id: Optional[str] = None,
+        messages: Optional[List[Message]] = None,
+    ) -> None:
+        session_messages = self._defer_user_memories(run_messages, session_id, user_id, messages)
+        if session_messages is None:
+            return await super()._amake_memories_and_summaries(run_messages, session_id, user_id, messages)
+        if self.enable_session_summaries:
+            await self.memory.acreate_session_summary(session_id=session_id, user_id=user_id)
+        self.session_metrics = self.calculate_session_metrics(session_messages)
+
+    async def _await_user_memories(self, user_id: Optional[str]) -> None:
+        """Let the memories of the user's previous runs land before this run reads them"""
+        if self.memory_extractor is None or not isinstance(self.memory, Memory):
+            return
+        if user_id is None:
+            user_id = self.user_id
+        if self.memory_extractor.pending(self.memory, user_id):
+            with telemetry.stage("memory_wait"):
+                await asyncio.to_thread(
+                    self.memory_extractor.wait, self.memory, user_id, self.memory_extractor.next_turn_wait_seconds
+                )
+
+    def _is_cacheable(self, message: Any, kwargs: Dict[str, Any]) -> bool:
+        if self.response_cache is None or not isinstance(message, str) or not message.strip():
+            return False
+        if self.response_model is not None:
+            return False
+        return not any(kwargs.get(k) for k in ("audio", "images", "videos", "files", "messages"))
+
+    def _is_personalized(self, session_id: Optional[str], user_id: Optional[str]) -> bool:
+        """Whether the run would see earlier runs of the session or memories of the user"""
+        if session_id is not None:
+            if isinstance(self.memory, Memory) and self.memory.get_runs(session_id):
+                return True
+            if self.storage is not None:
+                # Read without loading the session into the agent, which is shared between requests
+                with telemetry.stage("storage_read"):
+                    session = self.storage.read(session_id=session_id, user_id=user_id)
+                if session is not None and (session.memory or {}).get("runs"):
+                    return True
+        if (self.enable_user_memories or self.enable_agentic_memory) and isinstance(self.memory, Memory):
+            if self.memory.db is not None:
+                return bool(self.memory.db.read_memories(user_id=user_id or "default", limit=1))
+            return bool(self.memory.get_user_memories(user_id=user_id, refresh_from_db=False))
+        return False
+
+    async def arun(
+        self,
+        message: Optional[Any] = None,
+        *,
+        stream: Optional[bool] = None,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        stream_intermediate_steps: bool = False,
+        **kwargs: Any,
+    ) -> Any:
+        """Async Run the Agent, answering from the response cache when possible."""
+        if not telemetry.enabled:
+            return await self._arun_with_cache(
+                message,
+                stream=stream,
+                user_id=user_id,
+                session_id=session_id,
+                stream_intermediate_steps=stream_intermediate_steps,
+                **kwargs,
+            )
+
+        start = time.perf_counter()
+        token = current_agent.set(self.agent_id or "")
+        try:
+            response = await self._arun_with_cache(
+                message,
+                stream=stream,
+                user_id=user_id,
+                session_id=session_id,
+                stream_intermediate_steps=stream_intermediate_steps,
+                **kwargs,
+            )
+            if isinstance(response, RunResponse):
+                self._record_run_metrics(response)
+                telemetry.observe_stage("run", time.perf_counter() - start)
+                telemetry.record_run("ok")
+                return response
+        except Exception:
+            telemetry.record_run("error")
+            raise
+        finally:
+            current_agent.reset(token)
+        return self._astream_instrumented(response, start)
+
+    async def _arun_with_cache(
+        self,
+        message: Optional[Any] = None,
+        *,
+        stream: Optional[bool] = None,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        stream_intermediate_steps: bool = False,
+        **kwargs: Any,
+    ) -> Any:
+        await self._await_user_memories(user_id)
+        if not self._is_cacheable(message, kwargs):
+            return await super().arun(
+                message,
+                stream=stream,
+                user_id=user_id,
+                session_id=session_id,
+                stream_intermediate_steps=stream_intermediate_steps,
+                **kwargs,
+            )
+
+        # Sets the agent_id the cache entries are keyed by
+        self.initialize_agent()
+        if user_id is None:
+            user_id = self.user_id
+        with telemetry.stage("response_cache_lookup"):
+            if await asyncio.to_thread(self._is_personalized, session_id, user_id):
+                cached, key = None, None
+            else:
+                cached, key = await asyncio.to_thread(self.response_cache.lookup, self, message, user_id)
+        if key is not None:
+            telemetry.record_cache("response", cached is not None)
+
+        if stream is None:
+            stream = False if self.stream is None else self.stream
+
+        if cached is None:
+            response = await super().arun(
+                message,
+                stream=stream,
+                user_id=user_id,
+                session_id=session_id,
+                stream_intermediate_steps=stream_intermediate_steps,
+                **kwargs,
+            )
+            if key is None:
+                return response
+            if isinstance(response, RunResponse):
+                if isinstance(response.content, str):
+                    self.response_cache.store(key, response.content)
+                return response
+            return self._astream_and_cache(response, key)
+
+        run_response = self._record_cached_run(message, cached, user_id=user_id, session_id=session_id)
+        if stream:
+            return self._astream_cached(run_response, stream_intermediate_steps)
+        return run_response
+
+    async def _astream_instrumented(self, stream: AsyncIterator[RunResponse], start: float) -> AsyncIterator[RunResponse]:
+        """Pass the run's events through, recording time to first token and the run's metrics"""
+        # The stream is consumed by the response, outside arun, so label its measurements again
+        current_agent.set(self.agent_id or "")
+        first_token = True
+        status = "ok"
+        run_id = None
+        try:
+            async for chunk in stream:
+                run_id = chunk.run_id or run_id
+                if chunk.event == RunEvent.run_response.value and first_token and chunk.content:
+                    telemetry.record_first_token(time.perf_counter() - start)
+                    first_token = False
+                elif chunk.event == RunEvent.run_error.value:
+                    status = "error"
+                yield chunk
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            # The agent is shared between requests, only read run metrics that belong to this run
+            if self.run_response is not None and run_id is not None and self.run_response.run_id == run_id:
+                self._record_run_metrics(self.run_response)
+            telemetry.observe_stage("run", time.perf_counter() - start)
+            telemetry.record_run(status)
+
+    @staticmethod
+    def _record_run_metrics(run_response: RunResponse) -> None:
+        """Record the token counts, model time and tool times the run collected"""
+        metrics = run_response.metrics or {}
+        telemetry.record_tokens(sum(metrics.get("input_tokens", [])), sum(metrics.get("output_tokens", [])))
+        for seconds in metrics.get("time", []):
+            telemetry.observe_stage("generation", seconds)
+        for tool in run_response.tools or []:
+            seconds = getattr(tool.get("metrics"), "time", None)
+            if seconds:
+                telemetry.observe_stage(f"tool:{tool.get('tool_name')}", seconds)
+
+    def read_from_storage(self, session_id: str, user_id: Optional[str] = None) -> Optional[AgentSession]:
+        with telemetry.stage("storage_read"):
+            return super().read_from_storage(session_id=session_id, user_id=user_id)
+
+    def write_to_storage(self, session_id: str, user_id: Optional[str] = None) -> Optional[AgentSession]:
+        with telemetry.stage("storage_write"):
+            return super().write_to_storage(session_id=session_id, user_id=user_id)
+
+    def _record_cached_run(
+        self,
+        message: str,
+        cached: CachedResponse,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> RunResponse:
+        """Add the cached answer to the session as a run, so history and the UI see it"""
+        # The agent is shared between requests: the run is built here, not in run_id / run_response
+        user_id = user_id if user_id is not None else self.user_id
+        session_id = session_id or self.session_id or str(uuid4())
+
+        self.read_from_storage(session_id=session_id, user_id=user_id)
+        run_response = RunResponse(
+            run_id=str(uuid4()),
+            session_id=session_id,
+            agent_id=self.agent_id,
+            content=cached.content,
+            model=self.model.id if self.model is not None else None,
+            messages=[
+                Message(role="user", content=message),
+                Message(role="assistant", content=cached.content),
+            ],
+            event=RunEvent.run_response.value,
+        )
+        if isinstance(self.memory, Memory):
+            self.memory.add_run(session_id=session_id, run=run_response)
+        self.write_to_storage(session_id=session_id, user_id=user_id)
+        log_info(f"Answered from response cache (cached question: {cached.question!r})")
+        return run_response
+
+    async def _astream_cached(
+        self, run_response: RunResponse, stream_intermediate_steps: bool
+    ) -> AsyncIterator[RunResponse]:
+        if stream_intermediate_steps:
+            yield replace(run_response, content="Run started", messages=None, event=RunEvent.run_started.value)
+        for piece in _STREAM_PIECE.findall(run_response.content or ""):
+            yield replace(run_response, content=piece, messages=None)
+        if stream_intermediate_steps:
+            yield replace(run_response, messages=None, event=RunEvent.run_completed.value)
+
+    async def _astream_and_cache(
+        self, stream: AsyncIterator[RunResponse], key: ResponseCacheKey
+    ) -> AsyncIterator[RunResponse]:
+        """Pass the run's events through and cache the answer once the run completes without error"""
+        content = []
+        failed = False
+        async for chunk in stream:
+            if chunk.event == RunEvent.run_response.value and isinstance(chunk.content, str):
+                content.append(chunk.content)
+            elif chunk.event == RunEvent.run_error.value:
+                failed = True
+            yield chunk
+        if not failed:
+            self.response_cache.store(key, "".join(content))
+            log_debug(f"Cached response for agent {key.agent_id}")
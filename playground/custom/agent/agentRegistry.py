@@ -0,0 +1,186 @@
+import asyncio
+import importlib
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from agno.utils.log import log_info, logger
+
+
+class AgentState(str, Enum):
+    pending = "pending"
+    building = "building"
+    ready = "ready"
+    failed = "failed"
+
+
+@dataclass
+class AgentSpec:
+    """An agent the app serves, declared without building it"""
+
+    agent_id: str
+    name: str
+    # get_*_agent function, or its "module:function" path so the module is only imported on first use
+    factory: Union[str, Callable[[], Any]]
+
+    def load_factory(self) -> Callable[[], Any]:
+        if callable(self.factory):
+            return self.factory
+        module_name, function_name = self.factory.split(":")
+        return getattr(importlib.import_module(module_name), function_name)
+
+
+class LazyAgent:
+    """
+    Stands in for an agent in the Playground until it is needed.
+
+    agent_id and name are known up front, so the Playground can route to the
+    agent and list it without building it. Any other attribute builds the agent
+    (once, thread-safe) and is forwarded to it. A failed build is retried on the
+    next use.
+    """
+
+    _own_attributes = {"spec", "agent_id", "name", "state", "error", "build_seconds", "_agent", "_lock"}
+
+    def __init__(self, spec: AgentSpec):
+        self.spec = spec
+        self.agent_id = spec.agent_id
+        self.name = spec.name
+        self.state = AgentState.pending
+        self.error: Optional[str] = None
+        self.build_seconds: Optional[float] = None
+        self._agent: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._agent is not None
+
+    def get(self) -> Any:
+        """The agent, built and warmed on first call"""
+        agent = self._agent
+        if agent is not None:
+            return agent
+        with self._lock:
+            if self._agent is not None:
+                return self._agent
+            self.state = AgentState.building
+            start = time.perf_counter()
+            try:
+                agent = self.spec.load_factory()()
+                agent.agent_id = self.agent_id
+                agent.initialize_agent()
+                self._warm(agent)
+            except Exception as e:
+                self.state = AgentState.failed
+                self.error = f"{type(e).__name__}: {e}"
+                logger.error(f"Failed to build agent '{self.agent_id}': {self.error}")
+                raise
+            self.build_seconds = time.perf_counter() - start
+            self.error = None
+            self._agent = agent
+            self.state = AgentState.ready
+            log_info(f"Agent '{self.agent_id}' ready in {self.build_seconds:.2f}s")
+            return agent
+
+    @staticmethod
+    def _warm(agent: Any) -> None:
+        """Open the agent's database connections and check its tables before the first run"""
+        vector_db = getattr(agent.knowledge, "vector_db", None) if agent.knowledge is not None else None
+        if vector_db is not None:
+            vector_db.exists()
+        if agent.storage is not None:
+            agent.storage.table_exists()
+
+    async def aget(self) -> Any:
+        """The agent, built in a thread so the event loop keeps serving other requests"""
+        if self._agent is not None:
+            return self._agent
+        return await asyncio.to_thread(self.get)
+
+    def initialize_agent(self) -> None:
+        # The Playground initializes its agents on construction; that happens when the agent is built
+        if self._agent is not None:
+            self._agent.initialize_agent()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state.value,
+            "build_seconds": self.build_seconds,
+            "error": self.error,
+        }
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__") or name in LazyAgent._own_attributes:
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in LazyAgent._own_attributes:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.get(), name, value)
+
+
+class AgentRegistry:
+    """The agents of the app, built on first use or by a background warmup"""
+
+    def __init__(self, specs: List[AgentSpec]):
+        self.agents: List[LazyAgent] = [LazyAgent(spec) for spec in specs]
+        self._warmup_task: Optional[asyncio.Task] = None
+
+    def get(self, agent_id: str) -> Optional[LazyAgent]:
+        return next((agent for agent in self.agents if agent.agent_id == agent_id), None)
+
+    @property
+    def ready(self) -> bool:
+        return all(agent.is_ready for agent in self.agents)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {agent.agent_id: agent.status() for agent in self.agents}
+
+    async def warmup(self) -> None:
+        """Build every agent, one at a time, off the event loop"""
+        start = time.perf_counter()
+        for agent in self.agents:
+            try:
+                await agent.aget()
+            except Exception:
+                # Logged by the agent, retried on first use
+                pass
+        log_info(f"Agent warmup finished in {time.perf_counter() - start:.2f}s")
+
+    def start_warmup(self) -> asyncio.Task:
+        if self._warmup_task is None:
+            self._warmup_task = asyncio.get_running_loop().create_task(self.warmup())
+        return self._warmup_task
+
+    async def stop_warmup(self) -> None:
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+            try:
+                await self._warmup_task
+            except asyncio.CancelledError:
+                pass
+
+    async def ensure_for_path(self, path: str, prefix: str = "/v1/playground/agents") -> None:
+        """
+        Build the agents a Playground request needs before it reaches the router.
+
+        The Playground routes touch agent attributes from async handlers, so a
+        build there would block the event loop; building here runs it in a thread.
+        """
+        if not path.startswith(prefix):
+            return
+        agent_id = path[len(prefix):].strip("/").split("/")[0]
+        if agent_id:
+            agent = self.get(agent_id)
+            if agent is not None:
+                await agent.aget()
+        else:
+            # The agents listing reads every agent's model, tools and tables
+            for agent in self.agents:
+                await agent.aget()
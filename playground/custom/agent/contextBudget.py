@@ -0,0 +1,249 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.utils.log import log_debug, log_info, logger
+from custom.knowledge.crossPageChunking import estimate_tokens
+from custom.telemetry.telemetry import telemetry
+
+# Role, separators and formatting a model adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_INSTRUCTIONS = """You maintain a running summary of a conversation between a USER and an AI assistant.
+Update the current summary (if any) with the new conversation turns. Keep every requirement, decision,
+assumption, open question and name of a feature, screen or test case the USER mentioned, and what the
+assistant already delivered. Drop pleasantries and repeated content. Write plain bullet points, at most
+{max_words} words, and nothing else."""
+
+SUMMARY_PREFIX = "Summary of the earlier conversation in this session:\n"
+
+
+def message_tokens(message: Message) -> int:
+    text = message.get_content_string()
+    if message.tool_calls:
+        text += json.dumps(message.tool_calls, default=str)
+    return estimate_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _is_tool_exchange(message: Message) -> bool:
+    """A tool result, or an assistant message that only calls tools"""
+    if message.role == "tool":
+        return True
+    return message.role == "assistant" and bool(message.tool_calls) and not message.get_content_string().strip()
+
+
+def _split_runs(messages: List[Message]) -> List[List[Message]]:
+    """Group history messages into runs, each starting at a user message"""
+    runs: List[List[Message]] = []
+    for message in messages:
+        if not runs or (message.role == "user" and runs[-1][-1].role != "user"):
+            runs.append([])
+        runs[-1].append(message)
+    return runs
+
+
+def _run_digest(run: List[Message]) -> str:
+    h = hashlib.sha256()
+    for message in run:
+        h.update(message.role.encode())
+        h.update(message.get_content_string().encode())
+    return h.hexdigest()[:16]
+
+
+@dataclass
+class HistorySummary:
+    """Rolling summary of the older runs of a session"""
+
+    text: str
+    # Digests of the runs the summary covers, oldest first
+    runs: List[str] = field(default_factory=list)
+
+
+class ContextBudget:
+    """
+    Keeps the prompt of a run under a token budget.
+
+    When the system message, history and user message go over max_prompt_tokens,
+    the history is compacted in this order until it fits:
+
+    1. Tool calls and their results (e.g. retrieved chunks) are dropped from
+       earlier runs; the answers they led to stay.
+    2. Runs older than the last keep_recent_runs are replaced by a rolling
+       summary of the session. Summaries are built incrementally by
+       summary_model in a background thread (previous summary + the runs it
+       does not cover yet) and cached per session, so a run never waits for one;
+       until it is ready the older runs are trimmed instead.
+    3. The oldest remaining runs are dropped.
+
+    Knowledge search results are trimmed separately: documents are kept in rank
+    order until max_reference_tokens, the lower ranked rest is dropped.
+
+    Summaries live in process memory, so every serving process has its own.
+    """
+
+    def __init__(
+        self,
+        max_prompt_tokens: int = 16000,
+        max_reference_tokens: int = 4000,
+        keep_recent_runs: int = 1,
+        summary_model: Optional[Model] = None,
+        summary_max_words: int = 300,
+        max_sessions: int = 1000,
+        max_workers: int = 2,
+    ):
+        """
+        Args:
+            max_prompt_tokens: Token budget of the messages sent at the start of a run.
+            max_reference_tokens: Token budget of the documents one knowledge search returns, 0 for no limit.
+            keep_recent_runs: Most recent history runs never summarized.
+            summary_model: Model writing the history summaries, None to only trim. Use a model
+                instance of its own: agents set their tools on their model.
+            summary_max_words: Length the summary model is asked to stay under.
+            max_sessions: Sessions whose summary is cached, least recently used ones are evicted.
+            max_workers: Summaries written at the same time.
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_reference_tokens = max_reference_tokens
+        self.keep_recent_runs = keep_recent_runs
+        self.summary_model = summary_model
+        self.summary_max_words = summary_max_words
+        self.max_sessions = max_sessions
+        self._summaries: "OrderedDict[str, HistorySummary]" = OrderedDict()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history-summary")
+
+    def compact(self, messages: List[Message], session_id: Optional[str] = None) -> List[Message]:
+        """
+        Compact the history messages of a run to fit the prompt budget.
+
+        Args:
+            messages: Messages of the run, history messages tagged with from_history.
+            session_id: Session the history belongs to, its summary is used and updated.
+
+        Returns:
+            The messages to send, unchanged when they already fit.
+        """
+        before = sum(message_tokens(m) for m in messages)
+        history_positions = [i for i, m in enumerate(messages) if m.from_history]
+        if before <= self.max_prompt_tokens or not history_positions:
+            return messages
+
+        start, end = history_positions[0], history_positions[-1] + 1
+        head, tail = messages[:start], messages[end:]
+        budget = self.max_prompt_tokens - sum(message_tokens(m) for m in head + tail)
+
+        # 1. Earlier tool exchanges
+        runs = [[m for m in run if not _is_tool_exchange(m)] for run in _split_runs(messages[start:end])]
+        runs = [run for run in runs if run]
+
+        # 2. Older runs covered by the session summary
+        summary_message: Optional[Message] = None
+        if sum(message_tokens(m) for run in runs for m in run) > budget and session_id:
+            split = max(len(runs) - self.keep_recent_runs, 0)
+            older, recent = runs[:split], runs[split:]
+            summary_message, older = self._summarize(session_id, older)
+            runs = older + recent
+
+        # 3. Oldest first, the summary being the oldest
+        units: List[List[Message]] = ([[summary_message]] if summary_message is not None else []) + runs
+        while units and sum(message_tokens(m) for unit in units for m in unit) > budget:
+            units.pop(0)
+
+        compacted = head + [m for unit in units for m in unit] + tail
+        after = sum(message_tokens(m) for m in compacted)
+        log_info(
+            f"Context budget: prompt {before} -> {after} tokens ({before - after} saved, "
+            f"{'with' if summary_message is not None else 'without'} history summary)"
+        )
+        telemetry.record_context_saved("history", before - after)
+        return compacted
+
+    def _summarize(
+        self, session_id: str, older: List[List[Message]]
+    ) -> Tuple[Optional[Message], List[List[Message]]]:
+        """The summary message for the older runs it covers, and the runs it does not cover yet"""
+        if not older or self.summary_model is None:
+            return None, older
+
+        digests = [_run_digest(run) for run in older]
+        with self._lock:
+            summary = self._summaries.get(session_id)
+            if summary is not None:
+                self._summaries.move_to_end(session_id)
+        covered = 0
+        if summary is not None:
+            known = set(summary.runs)
+            covered = max((i + 1 for i, digest in enumerate(digests) if digest in known), default=0)
+
+        if covered < len(older):
+            self._schedule_summary(session_id, summary, older[covered:], digests[covered:])
+        if not covered:
+            return None, older
+        message = Message(role="user", content=SUMMARY_PREFIX + summary.text, from_history=True)
+        return message, older[covered:]
+
+    def _schedule_summary(
+        self, session_id: str, base: Optional[HistorySummary], runs: List[List[Message]], digests: List[str]
+    ) -> None:
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        self._executor.submit(self._update_summary, session_id, base, runs, digests)
+
+    def _update_summary(
+        self, session_id: str, base: Optional[HistorySummary], runs: List[List[Message]], digests: List[str]
+    ) -> None:
+        try:
+            transcript = "\n\n".join(
+                f"{message.role.upper()}: {message.get_content_string()}" for run in runs for message in run
+            )
+            prompt = f"Current summary:\n{base.text}\n\n" if base is not None else ""
+            prompt += f"New conversation turns:\n{transcript}"
+            response = self.summary_model.response(
+                messages=[
+                    Message(role="system", content=SUMMARY_INSTRUCTIONS.format(max_words=self.summary_max_words)),
+                    Message(role="user", content=prompt),
+                ]
+            )
+            text = (response.content or "").strip()
+            if not text:
+                return
+            covered = (base.runs if base is not None else []) + digests
+            with self._lock:
+                # Only the digests still in a history window matter
+                self._summaries[session_id] = HistorySummary(text=text, runs=covered[-50:])
+                self._summaries.move_to_end(session_id)
+                while len(self._summaries) > self.max_sessions:
+                    self._summaries.popitem(last=False)
+            log_debug(f"History summary of session {session_id} now covers {len(covered)} runs")
+        except Exception as e:
+            logger.warning(f"Could not summarize the history of session {session_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
+
+    def trim_documents(self, documents: Optional[List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+        """Keep the best ranked documents of a knowledge search that fit max_reference_tokens, at least one"""
+        if not documents or not self.max_reference_tokens:
+            return documents
+        kept: List[Dict[str, Any]] = []
+        used = 0
+        for document in documents:
+            tokens = estimate_tokens(str(document.get("content") or ""))
+            if kept and used + tokens > self.max_reference_tokens:
+                break
+            kept.append(document)
+            used += tokens
+        if len(kept) < len(documents):
+            saved = sum(estimate_tokens(str(d.get("content") or "")) for d in documents[len(kept):])
+            log_debug(f"Context budget: dropped {len(documents) - len(kept)} lower ranked documents ({saved} tokens)")
+            telemetry.record_context_saved("references", saved)
+        return kept
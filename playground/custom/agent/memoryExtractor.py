@@ -0,0 +1,275 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Set, Tuple
+
+from agno.memory.v2.memory import Memory
+from agno.models.message import Message
+from agno.utils.log import log_debug, log_info, logger
+from custom.telemetry.telemetry import telemetry
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def _normalize(text: str) -> str:
+    """Text compared to find duplicates: case, whitespace and punctuation ignored"""
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+
+@dataclass
+class _Job:
+    """The user messages of a run, waiting for extraction"""
+
+    memory: Memory
+    user_id: str
+    session_id: str
+    messages: List[Message]
+    agent_id: str = ""
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class MemoryExtractor:
+    """
+    Creates user memories in the background, after the run, instead of during it.
+
+    With enable_user_memories, agno asks the memory model for new memories and
+    writes them before the run returns (or before a streamed response ends),
+    once per run. Agents with an extractor queue the user messages of the run
+    instead, and worker threads extract them later:
+
+      - The runs of a user are batched: the messages of up to batch_runs runs,
+        or all that arrived within batch_wait_seconds of the first one, go to
+        the memory model in one call. Repeated messages are sent once.
+      - One batch per user at a time and at most max_concurrency overall, so a
+        burst of runs does not turn into a burst of model calls.
+      - After a batch, memories of the user that say the same thing (ignoring
+        case and punctuation) are reduced to the oldest one.
+
+    Memories are in the memory table once their batch is done. An agent that
+    starts a run for a user with queued runs calls wait() first, which extracts
+    them right away, so the next turn sees them; without queued runs it does
+    not wait, and it waits next_turn_wait_seconds at most.
+
+    One extractor can serve several agents: runs are batched per memory table
+    and user.
+    """
+
+    def __init__(
+        self,
+        batch_runs: int = 5,
+        batch_wait_seconds: float = 3.0,
+        max_concurrency: int = 2,
+        max_queued_runs: int = 1000,
+        next_turn_wait_seconds: float = 10.0,
+    ):
+        """
+        Args:
+            batch_runs: Most runs of a user extracted in one model call.
+            batch_wait_seconds: How long the first run of a batch waits for more runs of the same user.
+            max_concurrency: Worker threads, i.e. extraction model calls at once.
+            max_queued_runs: Runs waiting beyond it are not extracted (logged), to bound memory use.
+            next_turn_wait_seconds: Longest a run waits for the extraction of the user's previous runs.
+        """
+        self.batch_runs = batch_runs
+        self.batch_wait_seconds = batch_wait_seconds
+        self.max_concurrency = max_concurrency
+        self.max_queued_runs = max_queued_runs
+        self.next_turn_wait_seconds = next_turn_wait_seconds
+        # (memory table, user) -> runs waiting, oldest first
+        self._queued: "OrderedDict[Tuple[int, str], List[_Job]]" = OrderedDict()
+        self._num_queued = 0
+        # Keys being extracted, and keys to extract without waiting for more runs
+        self._running: Set[Tuple[int, str]] = set()
+        self._urgent: Set[Tuple[int, str]] = set()
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._closing = False
+
+    @staticmethod
+    def _key(memory: Memory, user_id: Optional[str]) -> Tuple[int, str]:
+        return id(memory), user_id or "default"
+
+    def submit(
+        self,
+        memory: Memory,
+        messages: List[Message],
+        user_id: Optional[str] = None,
+        session_id: str = "",
+        agent_id: Optional[str] = None,
+    ) -> bool:
+        """
+        Queue the user messages of a run for extraction.
+
+        Args:
+            memory: Memory of the agent, with a db and a model.
+            messages: Messages to extract memories from, only user messages are used.
+            user_id: User the memories are about, "default" when None.
+            session_id: Session of the run, for the logs.
+            agent_id: Agent of the run, for the metrics.
+
+        Returns:
+            False when nothing was queued: no user message, the queue is full or the extractor is closed.
+        """
+        messages = [m for m in messages if m.role == "user" and m.get_content_string().strip()]
+        if not messages:
+            return False
+        key = self._key(memory, user_id)
+        with self._cond:
+            if self._closing:
+                return False
+            if self._num_queued >= self.max_queued_runs:
+                logger.warning(f"Memory extraction queue full, skipping a run of user {key[1]}")
+                return False
+            job = _Job(memory=memory, user_id=key[1], session_id=session_id, messages=messages, agent_id=agent_id or "")
+            self._queued.setdefault(key, []).append(job)
+            self._num_queued += 1
+            if not self._workers:
+                self._start()
+            self._cond.notify_all()
+        log_debug(f"Queued memory extraction for user {key[1]} (session {session_id})")
+        return True
+
+    def pending(self, memory: Memory, user_id: Optional[str] = None) -> bool:
+        """Whether runs of the user are queued or being extracted"""
+        key = self._key(memory, user_id)
+        with self._cond:
+            return key in self._queued or key in self._running
+
+    def wait(self, memory: Memory, user_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Extract the queued runs of a user now and wait for them.
+
+        Args:
+            memory: Memory of the agent.
+            user_id: User whose runs to wait for.
+            timeout: Most seconds to wait, None to wait until done.
+
+        Returns:
+            True when nothing of the user is left to extract.
+        """
+        key = self._key(memory, user_id)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            if key in self._queued:
+                self._urgent.add(key)
+                self._cond.notify_all()
+            while key in self._queued or key in self._running:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _start(self) -> None:
+        self._workers = [
+            threading.Thread(target=self._work, name=f"memory-extractor-{i}", daemon=True)
+            for i in range(max(1, self.max_concurrency))
+        ]
+        for worker in self._workers:
+            worker.start()
+        log_info(f"Extracting user memories in the background with {len(self._workers)} workers")
+
+    def _next_batch(self) -> Optional[Tuple[Tuple[int, str], List[_Job]]]:
+        """The next batch due, blocking until there is one; None once closed and drained"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                next_due: Optional[float] = None
+                for key, jobs in self._queued.items():
+                    if key in self._running:
+                        continue
+                    due = jobs[0].queued_at + self.batch_wait_seconds
+                    if self._closing or key in self._urgent or len(jobs) >= self.batch_runs or due <= now:
+                        batch = jobs[: self.batch_runs]
+                        if len(jobs) > len(batch):
+                            self._queued[key] = jobs[len(batch):]
+                        else:
+                            del self._queued[key]
+                            self._urgent.discard(key)
+                        self._num_queued -= len(batch)
+                        self._running.add(key)
+                        return key, batch
+                    next_due = due if next_due is None else min(next_due, due)
+                if self._closing and not self._queued:
+                    return None
+                self._cond.wait(next_due - now if next_due is not None else None)
+
+    def _work(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            key, jobs = batch
+            try:
+                self._extract(jobs)
+            except Exception as e:
+                logger.error(f"Memory extraction failed for user {key[1]} ({len(jobs)} runs): {e}")
+            finally:
+                with self._cond:
+                    self._running.discard(key)
+                    self._cond.notify_all()
+
+    def _extract(self, jobs: List[_Job]) -> None:
+        source = jobs[0].memory
+        user_id = jobs[0].user_id
+        messages: List[Message] = []
+        seen: Set[str] = set()
+        for job in jobs:
+            for message in job.messages:
+                normalized = _normalize(message.get_content_string())
+                if normalized and normalized not in seen:
+                    seen.add(normalized)
+                    messages.append(message)
+
+        # A Memory of its own: agno's keeps the memories of all users in one dict and replaces it on every refresh
+        memory = Memory(
+            model=source.model if source.memory_manager is None else None,
+            memory_manager=source.memory_manager,
+            db=source.db,
+            delete_memories=source.delete_memories,
+            clear_memories=source.clear_memories,
+        )
+        start = time.perf_counter()
+        memory.create_user_memories(messages=messages, user_id=user_id)
+        removed = self._remove_duplicates(memory, user_id)
+        elapsed = time.perf_counter() - start
+        telemetry.observe_stage("memory_extraction", elapsed, agent=jobs[0].agent_id)
+        log_debug(
+            f"Extracted memories of user {user_id} from {len(jobs)} runs ({len(messages)} messages) in {elapsed:.2f}s"
+            + (f", {removed} duplicates removed" if removed else "")
+        )
+
+    @staticmethod
+    def _remove_duplicates(memory: Memory, user_id: str) -> int:
+        """Delete memories of the user that repeat an older one, returning how many"""
+        # Keyed by the id of their row: memory_id is not always set in the memory itself
+        memories = sorted(
+            (memory.memories or {}).get(user_id, {}).items(),
+            key=lambda item: item[1].last_updated.timestamp() if item[1].last_updated else 0.0,
+        )
+        kept: Set[str] = set()
+        removed = 0
+        for memory_id, user_memory in memories:
+            normalized = _normalize(user_memory.memory)
+            if normalized not in kept:
+                kept.add(normalized)
+            else:
+                memory.delete_user_memory(memory_id=memory_id, user_id=user_id, refresh_from_db=False)
+                removed += 1
+        return removed
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Extract everything queued, without waiting for batches to fill, and stop the workers"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            workers = list(self._workers)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for worker in workers:
+            worker.join(max(0.0, deadline - time.monotonic()) if deadline is not None else None)
+        with self._cond:
+            left = self._num_queued + len(self._running)
+        if left:
+            logger.warning(f"Shutting down with memory extraction of {left} runs or batches unfinished")
@@ -0,0 +1,217 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from agno.embedder.base import Embedder
+from agno.utils.log import log_debug, logger
+from custom.embedder.cachedEmbedder import normalize_text
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    embedding = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(embedding))
+    return embedding / norm if norm else embedding
+
+
+@dataclass
+class CachedResponse:
+    """An answer the agent gave"""
+
+    question: str
+    # Unit-length question embedding, so similarity is a dot product
+    embedding: np.ndarray = field(repr=False)
+    content: str
+    # User the answer was given to, it is only reused for them
+    user_id: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+
+
+@dataclass
+class ResponseCacheKey:
+    """Everything a lookup computed, so a miss can be stored without recomputing it"""
+
+    agent_id: str
+    question: str
+    embedding: np.ndarray = field(repr=False)
+    knowledge_version: Optional[str] = None
+    user_id: Optional[str] = None
+
+
+class ResponseCache:
+    """
+    Semantic cache of agent answers.
+
+    A cached answer is reused when the same agent gets a question from the same
+    user whose embedding is at least similarity_threshold (cosine) close to a
+    cached question, and the agent's knowledge table is at the version the answer
+    was generated against:
+    all entries of an agent are dropped when its knowledge table changes (checked
+    at most every version_check_interval seconds). Entries expire after
+    ttl_seconds.
+
+    A lookup embeds the question and nothing else; with a caching embedder the
+    knowledge search of a miss reuses that embedding. The question is all an
+    entry knows of the run, so the agent only uses the cache for runs without
+    history or user memories (see Agent).
+
+    Entries live in process memory, so every serving process has its own cache.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries_per_agent: int = 1000,
+        version_check_interval: float = 30.0,
+    ):
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_agent = max_entries_per_agent
+        self.version_check_interval = version_check_interval
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # agent_id -> entries, oldest first
+        self._entries: Dict[str, List[CachedResponse]] = {}
+        # agent_id -> embeddings and users of its entries stacked, built on the first lookup after a change
+        self._matrices: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # agent_id -> knowledge version the entries were created against
+        self._versions: Dict[str, Optional[str]] = {}
+        # id of the vector db -> (checked_at, version)
+        self._version_checks: Dict[int, Tuple[float, Optional[str]]] = {}
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _get_embedder(self, agent: Any) -> Optional[Embedder]:
+        if self.embedder is not None:
+            return self.embedder
+        vector_db = getattr(agent.knowledge, "vector_db", None) if agent.knowledge is not None else None
+        return getattr(vector_db, "embedder", None)
+
+    def _knowledge_version(self, agent: Any) -> Optional[str]:
+        vector_db = getattr(agent.knowledge, "vector_db", None) if agent.knowledge is not None else None
+        if vector_db is None or not hasattr(vector_db, "knowledge_version"):
+            return None
+        now = time.monotonic()
+        checked = self._version_checks.get(id(vector_db))
+        if checked is not None and now - checked[0] < self.version_check_interval:
+            return checked[1]
+        version = vector_db.knowledge_version()
+        self._version_checks[id(vector_db)] = (now, version)
+        return version
+
+    def lookup(
+        self, agent: Any, question: str, user_id: Optional[str] = None
+    ) -> Tuple[Optional[CachedResponse], Optional[ResponseCacheKey]]:
+        """
+        Look up a cached answer for a question to an agent.
+
+        Runs the question embedding, so call it off the event loop.
+
+        Args:
+            agent: The agent the question was asked to.
+            question: The user message.
+            user_id: User asking, only their own cached answers are reused.
+
+        Returns:
+            The cached answer or None, and the key to store the answer under on a miss
+            (None when the question cannot be cached).
+        """
+        embedder = self._get_embedder(agent)
+        if embedder is None or agent.agent_id is None:
+            return None, None
+
+        question = normalize_text(question)
+        try:
+            # Same text the knowledge search embeds, so a caching embedder computes it once
+            embedding = _unit(embedder.get_embedding(question))
+            version = self._knowledge_version(agent)
+        except Exception as e:
+            logger.warning(f"Response cache lookup failed: {e}")
+            return None, None
+        if not embedding.size:
+            return None, None
+
+        key = ResponseCacheKey(
+            agent_id=agent.agent_id, question=question, embedding=embedding, knowledge_version=version, user_id=user_id
+        )
+        with self._lock:
+            if self._versions.get(key.agent_id, version) != version:
+                log_debug(f"Knowledge of agent {key.agent_id} changed, dropping its cached responses")
+                self._drop(key.agent_id)
+            self._versions[key.agent_id] = version
+
+            best, best_similarity = None, self.similarity_threshold
+            entries = self._entries.get(key.agent_id)
+            if entries:
+                now = time.time()
+                if now - entries[0].created_at >= self.ttl_seconds:
+                    entries[:] = [e for e in entries if now - e.created_at < self.ttl_seconds]
+                    self._matrices.pop(key.agent_id, None)
+                if entries:
+                    stacked = self._matrices.get(key.agent_id)
+                    if stacked is None:
+                        stacked = self._matrices[key.agent_id] = (
+                            np.stack([e.embedding for e in entries]),
+                            np.asarray([e.user_id for e in entries], dtype=object),
+                        )
+                    matrix, users = stacked
+                    similarities = np.where(users == user_id, matrix @ embedding, -np.inf)
+                    i = int(np.argmax(similarities))
+                    if similarities[i] >= best_similarity:
+                        best, best_similarity = entries[i], float(similarities[i])
+                        best.last_used = now
+
+            if best is None:
+                self.misses += 1
+                return None, key
+            self.hits += 1
+        log_debug(f"Response cache hit for agent {key.agent_id} (similarity {best_similarity:.3f})")
+        return best, key
+
+    def store(self, key: ResponseCacheKey, content: str) -> None:
+        """Cache the answer to the question a lookup missed"""
+        if not content:
+            return
+        entry = CachedResponse(question=key.question, embedding=key.embedding, content=content, user_id=key.user_id)
+        with self._lock:
+            if self._versions.get(key.agent_id, key.knowledge_version) != key.knowledge_version:
+                # The knowledge changed while the answer was generated
+                return
+            entries = self._entries.setdefault(key.agent_id, [])
+            entries.append(entry)
+            if len(entries) > self.max_entries_per_agent:
+                # Evict the least recently used entry
+                entries.remove(min(entries, key=lambda e: e.last_used))
+            self._matrices.pop(key.agent_id, None)
+
+    def _drop(self, agent_id: str) -> None:
+        self._entries.pop(agent_id, None)
+        self._matrices.pop(agent_id, None)
+
+    def invalidate(self, agent_id: Optional[str] = None) -> None:
+        """Drop the cached answers of one agent, or of all agents"""
+        with self._lock:
+            if agent_id is None:
+                self._entries.clear()
+                self._matrices.clear()
+                self._version_checks.clear()
+            else:
+                self._drop(agent_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    def __deepcopy__(self, memo):
+        # Shared by every copy of an agent
+        return self
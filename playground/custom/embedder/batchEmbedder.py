@@ -0,0 +1,230 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from agno.document import Document
+from agno.embedder.base import Embedder
+from agno.utils.log import log_debug, log_info, logger
+
+T = TypeVar("T")
+
+
+def _status_code(e: Exception) -> Optional[int]:
+    code = getattr(e, "code", None) or getattr(e, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    """True for rate limit / quota errors (429)"""
+    code = _status_code(e)
+    if code is not None:
+        return code == 429
+    message = str(e).upper()
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "QUOTA" in message
+
+
+def is_retryable_error(e: Exception) -> bool:
+    """True for rate limit / quota (429) and transient server (5xx) errors"""
+    code = _status_code(e)
+    if code is not None and code >= 500:
+        return True
+    return is_rate_limit_error(e)
+
+
+@dataclass
+class EmbeddingStats:
+    """Throughput counters of an embedder"""
+
+    chunks: int = 0
+    # Estimated at ~4 characters per token, the embed API does not report tokens
+    tokens: int = 0
+    requests: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.chunks} chunks in {self.seconds:.2f}s "
+            f"({self.chunks_per_second:.1f} chunks/s, {self.tokens_per_second:.0f} tokens/s), "
+            f"{self.requests} requests, {self.retries} retries, {self.rate_limited} rate limited"
+        )
+
+
+class _AdaptiveLimiter:
+    """
+    Concurrency limit that halves on rate limiting and grows back by one after
+    `limit` consecutive successes. A rate limited request also pauses every
+    worker until its backoff has passed. Other failures leave the limit as is.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.successes = 0
+        self.paused_until = 0.0
+        self.cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self.cond:
+            while True:
+                delay = self.paused_until - time.monotonic()
+                if delay > 0:
+                    self.cond.wait(timeout=delay)
+                elif self.in_flight >= self.limit:
+                    self.cond.wait()
+                else:
+                    break
+            self.in_flight += 1
+
+    def release(self, rate_limited: bool = False, backoff: float = 0.0, failed: bool = False) -> None:
+        with self.cond:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit // 2)
+                self.successes = 0
+                self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+            elif failed:
+                self.successes = 0
+            else:
+                self.successes += 1
+                if self.limit < self.max_limit and self.successes >= self.limit:
+                    self.limit += 1
+                    self.successes = 0
+            self.cond.notify_all()
+
+
+@dataclass
+class BatchEmbedder(Embedder):
+    """
+    Embedder wrapper that embeds texts in provider-sized batches with a bounded
+    number of concurrent requests, backing off adaptively on 429/quota errors.
+
+    Lists of texts go through get_embeddings_and_usage / embed_documents, single
+    texts (e.g. search queries) are one request each; both share the same
+    concurrency limit. Only rate limiting shrinks the limit, transient server
+    errors (5xx) are retried with backoff by the request that got them.
+    """
+
+    embedder: Optional[Embedder] = None
+    # Texts per request, capped at the wrapped embedder's max_batch_size
+    batch_size: int = 100
+    # Maximum number of requests in flight
+    max_concurrency: int = 4
+    max_retries: int = 6
+    initial_backoff: float = 1.0
+    max_backoff: float = 60.0
+
+    stats: EmbeddingStats = field(default_factory=EmbeddingStats, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.embedder is None:
+            raise ValueError("BatchEmbedder needs an embedder to wrap")
+        self.dimensions = self.embedder.dimensions
+        self._limiter = _AdaptiveLimiter(self.max_concurrency)
+        self._stats_lock = threading.Lock()
+
+    @property
+    def id(self) -> Optional[str]:
+        return getattr(self.embedder, "id", None)
+
+    def _batch_call(self, texts: List[str]) -> List[Tuple[List[float], Optional[Dict]]]:
+        if hasattr(self.embedder, "get_embeddings_and_usage"):
+            return self.embedder.get_embeddings_and_usage(texts)
+        return [self.embedder.get_embedding_and_usage(text) for text in texts]
+
+    def _call(self, call: Callable[[], T]) -> T:
+        """Make one embedding request within the concurrency limit, retrying retryable errors with backoff and jitter"""
+        attempt = 0
+        while True:
+            self._limiter.acquire()
+            try:
+                result = call()
+            except Exception as e:
+                if not is_retryable_error(e) or attempt >= self.max_retries:
+                    self._limiter.release(failed=True)
+                    raise
+                backoff = min(self.max_backoff, self.initial_backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                rate_limited = is_rate_limit_error(e)
+                with self._stats_lock:
+                    self.stats.retries += 1
+                    if rate_limited:
+                        self.stats.rate_limited += 1
+                logger.warning(f"Embedding request failed ({e}), retrying in {backoff:.1f}s")
+                if rate_limited:
+                    # Pauses every request until the backoff has passed
+                    self._limiter.release(rate_limited=True, backoff=backoff)
+                else:
+                    self._limiter.release(failed=True)
+                    time.sleep(backoff)
+                attempt += 1
+                continue
+            self._limiter.release()
+            with self._stats_lock:
+                self.stats.requests += 1
+            return result
+
+    def _embed_batch(self, texts: List[str]) -> List[Tuple[List[float], Optional[Dict]]]:
+        return self._call(lambda: self._batch_call(texts))
+
+    def get_embeddings_and_usage(self, texts: List[str]) -> List[Tuple[List[float], Optional[Dict]]]:
+        """
+        Embed a list of texts in batches with bounded concurrency.
+
+        Args:
+            texts: Texts to embed.
+
+        Returns:
+            A (embedding, usage) tuple for each text, in order.
+        """
+        if not texts:
+            return []
+
+        batch_size = min(self.batch_size, getattr(self.embedder, "max_batch_size", self.batch_size))
+        batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+
+        start = time.perf_counter()
+        if len(batches) == 1 or self.max_concurrency <= 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                results = list(executor.map(self._embed_batch, batches))
+        elapsed = time.perf_counter() - start
+
+        num_tokens = sum(len(text) for text in texts) // 4
+        with self._stats_lock:
+            self.stats.chunks += len(texts)
+            self.stats.tokens += num_tokens
+            self.stats.seconds += elapsed
+        log_debug(
+            f"Embedded {len(texts)} chunks in {len(batches)} requests in {elapsed:.2f}s "
+            f"({len(texts) / elapsed if elapsed else 0:.1f} chunks/s, {num_tokens / elapsed if elapsed else 0:.0f} tokens/s)"
+        )
+        return [item for batch in results for item in batch]
+
+    def embed_documents(self, documents: List[Document]) -> None:
+        """Set the embedding and usage of every document, embedding them in batches"""
+        results = self.get_embeddings_and_usage([document.content for document in documents])
+        for document, (embedding, usage) in zip(documents, results):
+            document.embedding = embedding
+            document.usage = usage
+        if documents:
+            log_info(f"Embedding throughput: {self.stats}")
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embedding_and_usage(text)[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self._call(lambda: self.embedder.get_embedding_and_usage(text))
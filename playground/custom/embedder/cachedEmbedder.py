@@ -0,0 +1,227 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from agno.document import Document
+from agno.embedder.base import Embedder
+from agno.utils.log import log_debug, log_info
+from custom.telemetry.telemetry import telemetry
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before hashing so whitespace-only differences share a cache entry"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Persistent SQLite cache of embeddings keyed by (model id, dimensions, text hash).
+
+    Entries are evicted least-recently-used first once max_entries is exceeded.
+    Lookups only read: the entries they hit are marked used in memory and their
+    last_used written at most every touch_interval seconds, on a lookup or
+    when storing, and always before evicting.
+    Safe to share between threads, and between processes through SQLite's locking.
+    """
+
+    def __init__(self, path: Union[str, Path], max_entries: int = 500_000, touch_interval: float = 60.0):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " dimensions INTEGER NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, dimensions, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        # (model, dimensions, text hash) -> last hit, not written yet
+        self._touched: Dict[Tuple[str, int, str], float] = {}
+        self._last_touch_flush = time.monotonic()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(normalize_text(text).encode("utf-8", errors="surrogatepass")).hexdigest()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_many(self, model: str, dimensions: int, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        """Look up embeddings by text hash, returning only the ones found"""
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well under SQLite's bound parameter limit
+            for i in range(0, len(unique), 500):
+                batch = unique[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, embedding FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    (model, dimensions, *batch),
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob).tolist()
+            now = time.time()
+            for text_hash in found:
+                self._touched[(model, dimensions, text_hash)] = now
+            if self._touched and time.monotonic() - self._last_touch_flush >= self.touch_interval:
+                self._flush_touched()
+                self._conn.commit()
+            hits = sum(1 for h in hashes if h in found)
+            self.hits += hits
+            self.misses += len(hashes) - hits
+        telemetry.record_cache("embedding", True, hits)
+        telemetry.record_cache("embedding", False, len(hashes) - hits)
+        return found
+
+    def put_many(self, model: str, dimensions: int, items: Dict[str, List[float]]) -> None:
+        """Store embeddings by text hash, evicting the least recently used entries if over capacity"""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, dimensions, text_hash, embedding, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(model, dimensions, text_hash, array("f", embedding).tobytes(), now) for text_hash, embedding in items.items()],
+            )
+            self._size += max(cursor.rowcount, 0)
+            self._flush_touched()
+            if self._size > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def flush(self) -> None:
+        """Write the last_used of the entries hit since the last write"""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                [(last_used, *key) for key, last_used in self._touched.items()],
+            )
+            self._touched.clear()
+        self._last_touch_flush = time.monotonic()
+
+    def _evict(self) -> None:
+        # Evict down to 90% so we do not evict on every insert
+        target = int(self.max_entries * 0.9)
+        excess = self._size - target
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        log_debug(f"Evicted {excess} embeddings from cache '{self.path}'")
+
+    def __len__(self) -> int:
+        return self._size
+
+
+@dataclass
+class CachedEmbedder(Embedder):
+    """
+    Embedder wrapper that serves document and query embeddings from an EmbeddingCache
+    and only sends cache misses to the wrapped embedder.
+    """
+
+    embedder: Optional[Embedder] = None
+    cache: Optional[EmbeddingCache] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.embedder is None or self.cache is None:
+            raise ValueError("CachedEmbedder needs an embedder and a cache")
+        self.dimensions = self.embedder.dimensions
+
+    @property
+    def id(self) -> str:
+        return str(getattr(self.embedder, "id", type(self.embedder).__name__))
+
+    def _miss_embeddings(self, texts: List[str]) -> List[Tuple[List[float], Optional[Dict]]]:
+        with telemetry.stage("embedding", texts=len(texts)):
+            if hasattr(self.embedder, "get_embeddings_and_usage"):
+                return self.embedder.get_embeddings_and_usage(texts)
+            return [self.embedder.get_embedding_and_usage(text) for text in texts]
+
+    def get_embeddings_and_usage(self, texts: List[str]) -> List[Tuple[List[float], Optional[Dict]]]:
+        """
+        Embed a list of texts, calling the wrapped embedder only for uncached texts.
+
+        Args:
+            texts: Texts to embed.
+
+        Returns:
+            A (embedding, usage) tuple for each text, in order. Cached texts have no usage.
+        """
+        hashes = [EmbeddingCache.text_hash(text) for text in texts]
+        found = self.cache.get_many(self.id, self.dimensions, hashes)
+
+        # Embed each missing text once, even if it appears several times
+        missing: Dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in found and text_hash not in missing:
+                missing[text_hash] = text
+
+        usages: Dict[str, Optional[Dict]] = {}
+        if missing:
+            results = self._miss_embeddings(list(missing.values()))
+            new_items: Dict[str, List[float]] = {}
+            for text_hash, (embedding, usage) in zip(missing.keys(), results):
+                usages[text_hash] = usage
+                if embedding:
+                    new_items[text_hash] = embedding
+            found.update(new_items)
+            self.cache.put_many(self.id, self.dimensions, new_items)
+
+        return [(found.get(text_hash, []), usages.get(text_hash)) for text_hash in hashes]
+
+    def embed_documents(self, documents: List[Document]) -> None:
+        """Set the embedding and usage of every document, using the cache where possible"""
+        results = self.get_embeddings_and_usage([document.content for document in documents])
+        for document, (embedding, usage) in zip(documents, results):
+            document.embedding = embedding
+            document.usage = usage
+        if documents:
+            log_info(
+                f"Embedding cache: {self.cache.hits} hits, {self.cache.misses} misses "
+                f"({self.cache.hit_ratio:.0%} hit ratio), {len(self.cache)} entries"
+            )
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embedding_and_usage(text)[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        text_hash = EmbeddingCache.text_hash(text)
+        found = self.cache.get_many(self.id, self.dimensions, [text_hash])
+        if text_hash in found:
+            return found[text_hash], None
+        with telemetry.stage("embedding", texts=1):
+            embedding, usage = self.embedder.get_embedding_and_usage(text)
+        if embedding:
+            self.cache.put_many(self.id, self.dimensions, {text_hash: embedding})
+        return embedding, usage
@@ -0,0 +1,28 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from agno.embedder.google import GeminiEmbedder as AgnoGeminiEmbedder
+
+
+@dataclass
+class GeminiEmbedder(AgnoGeminiEmbedder):
+    """GeminiEmbedder that can also embed several texts in a single request"""
+
+    # Maximum number of texts the API accepts in one embed request
+    max_batch_size: int = 100
+
+    def get_embeddings_and_usage(self, texts: List[str]) -> List[Tuple[List[float], Optional[Dict]]]:
+        """
+        Embed a batch of texts with one request.
+
+        Args:
+            texts: Texts to embed, at most max_batch_size of them.
+
+        Returns:
+            A (embedding, usage) tuple for each text, in order.
+        """
+        response = self._response(text=texts)
+        embeddings = response.embeddings or []
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+        return [(embedding.values, None) for embedding in embeddings]
@@ -0,0 +1,208 @@
+import re
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from agno.document.base import Document
+from agno.document.chunking.strategy import ChunkingStrategy
+
+# Sentence ends: ., ! or ? followed by whitespace and what looks like the start of the next sentence
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+# Numbered ("3.2 Audit Trail"), all-caps ("SAMPLE INVENTORY") or markdown ("## Setup") headings
+_HEADING = re.compile(r"^(\d+(\.\d+)*\.?\s+\S.*|[A-Z0-9][A-Z0-9 &/,()\-]{2,}|#{1,6}\s+\S.*)$")
+_MAX_HEADING_CHARS = 80
+# Gemini tokenizers average about 4 characters per token on English text
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+@dataclass
+class _Unit:
+    """A sentence or heading, the smallest piece of text a chunk is built from"""
+
+    text: str
+    page: int
+    tokens: int
+    heading: bool = False
+    # Starts a new paragraph, so it is joined with a newline instead of a space
+    paragraph: bool = False
+
+
+class CrossPageChunking(ChunkingStrategy):
+    """
+    Chunks the pages of a document as one stream of sentences, up to a token budget.
+
+    Chunks end at sentence boundaries and preferably at section headings, never
+    in the middle of a sentence unless the sentence alone is over the budget.
+    Chunks may span pages: each records the pages it was read from as page
+    (first) and page_end (last) in its metadata, and its position in the
+    document as chunk_index. Short pages are merged into their neighbours
+    instead of becoming chunks of their own. With overlap_tokens, the length of
+    the text a chunk repeats from the previous one is recorded as overlap_chars.
+    """
+
+    def __init__(
+        self,
+        chunk_tokens: int = 512,
+        overlap_tokens: int = 0,
+        min_section_tokens: Optional[int] = None,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        """
+        Args:
+            chunk_tokens: Token budget of a chunk.
+            overlap_tokens: Trailing sentences of a chunk, up to this many tokens, repeated at the start of the next.
+            min_section_tokens: A heading starts a new chunk once the current one has this many tokens,
+                defaults to a quarter of chunk_tokens.
+            count_tokens: Token counter, defaults to an estimate from the number of characters.
+        """
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError(f"overlap_tokens ({overlap_tokens}) must be less than chunk_tokens ({chunk_tokens})")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_section_tokens = chunk_tokens // 4 if min_section_tokens is None else min_section_tokens
+        self.count_tokens = count_tokens
+
+    @property
+    def signature(self) -> str:
+        """Settings that change the chunks, recorded in the knowledge manifest"""
+        return f"cross-page:{self.chunk_tokens}:{self.overlap_tokens}:{self.min_section_tokens}"
+
+    def chunk(self, document: Document) -> List[Document]:
+        return list(self.chunk_pages([document]))
+
+    def chunk_pages(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """
+        Chunk the page documents of one file, in page order.
+
+        Chunks are yielded as soon as they are complete, so only the text of the
+        chunk being built is held in memory.
+
+        Args:
+            pages: Page documents with their page number in meta_data["page"].
+
+        Returns:
+            Iterator of chunk Documents.
+        """
+        current: List[_Unit] = []
+        tokens = 0
+        index = 0
+        # Leading units of current repeated from the previous chunk
+        overlap = 0
+        first: Optional[Document] = None
+
+        for page_document in pages:
+            if first is None:
+                first = page_document
+            page = (page_document.meta_data or {}).get("page", 1)
+            for unit in self._units(page_document.content, page):
+                if unit.heading and current and tokens >= self.min_section_tokens:
+                    index += 1
+                    yield self._build(first, current, index, overlap)
+                    current, tokens, overlap = [], 0, 0
+                for part in self._split_oversized(unit):
+                    if current and tokens + part.tokens > self.chunk_tokens:
+                        # A heading belongs with the text after it
+                        carried: List[_Unit] = []
+                        while current and current[-1].heading:
+                            carried.insert(0, current.pop())
+                        if current:
+                            index += 1
+                            yield self._build(first, current, index, overlap)
+                            repeated = self._overlap(current)
+                            current, overlap = repeated + carried, len(repeated)
+                        else:
+                            current, overlap = carried, 0
+                        tokens = sum(u.tokens for u in current)
+                    current.append(part)
+                    tokens += part.tokens
+
+        if first is not None and current:
+            index += 1
+            yield self._build(first, current, index, overlap)
+
+    def _units(self, text: str, page: int) -> Iterator[_Unit]:
+        """Split a page into headings and sentences, re-joining lines wrapped inside a paragraph"""
+        paragraph: List[str] = []
+
+        def flush() -> Iterator[_Unit]:
+            joined = " ".join(paragraph)
+            # Words hyphenated across a line break
+            joined = re.sub(r"(\w)- (\w)", r"\1\2", joined)
+            for i, sentence in enumerate(s for s in _SENTENCE_END.split(joined) if s.strip()):
+                sentence = sentence.strip()
+                yield _Unit(sentence, page, self.count_tokens(sentence), paragraph=i == 0)
+            paragraph.clear()
+
+        for line in text.splitlines():
+            line = " ".join(line.split())
+            if not line:
+                yield from flush()
+            elif len(line) <= _MAX_HEADING_CHARS and _HEADING.match(line) and not line.endswith((".", ",", ";", ":")):
+                yield from flush()
+                yield _Unit(line, page, self.count_tokens(line), heading=True, paragraph=True)
+            else:
+                paragraph.append(line)
+        yield from flush()
+
+    def _split_oversized(self, unit: _Unit) -> Iterator[_Unit]:
+        """Split a unit over the budget into word windows that fit"""
+        if unit.tokens <= self.chunk_tokens:
+            yield unit
+            return
+        window: List[str] = []
+        window_tokens = 0
+        paragraph = unit.paragraph
+        for word in unit.text.split(" "):
+            # Counted per word, which slightly over-counts, to keep long run-on text linear
+            word_tokens = self.count_tokens(word + " ")
+            if window and window_tokens + word_tokens > self.chunk_tokens:
+                text = " ".join(window)
+                yield _Unit(text, unit.page, self.count_tokens(text), paragraph=paragraph)
+                window, window_tokens, paragraph = [], 0, False
+            window.append(word)
+            window_tokens += word_tokens
+        if window:
+            text = " ".join(window)
+            yield _Unit(text, unit.page, self.count_tokens(text), paragraph=paragraph)
+
+    def _overlap(self, units: List[_Unit]) -> List[_Unit]:
+        if not self.overlap_tokens:
+            return []
+        carried: List[_Unit] = []
+        tokens = 0
+        for unit in reversed(units):
+            if unit.heading or tokens + unit.tokens > self.overlap_tokens:
+                break
+            carried.insert(0, unit)
+            tokens += unit.tokens
+        return carried
+
+    def _build(self, first: Document, units: List[_Unit], index: int, overlap: int = 0) -> Document:
+        content = ""
+        overlap_chars = 0
+        for i, unit in enumerate(units):
+            if content:
+                content += "\n" if unit.paragraph or unit.heading else " "
+            content += unit.text
+            if i + 1 == overlap:
+                overlap_chars = len(content)
+        page, page_end = units[0].page, units[-1].page
+        meta_data = dict(first.meta_data or {})
+        meta_data.update(
+            page=page,
+            page_end=page_end,
+            chunk_index=index,
+            tokens=sum(u.tokens for u in units),
+            overlap_chars=overlap_chars,
+        )
+        # Files with the same name in different directories are told apart by their source path
+        prefix = meta_data.get("source") or first.name
+        return Document(
+            id=f"{prefix}_{page}-{page_end}_{index}" if prefix else None,
+            name=first.name,
+            meta_data=meta_data,
+            content=content,
+        )
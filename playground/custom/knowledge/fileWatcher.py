@@ -0,0 +1,229 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Set, Tuple, Union
+
+from agno.utils.log import log_debug, log_info, logger
+
+# inotify(7) constants
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+# Files are reported once fully written (close after write) or moved in, not on every write
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+@dataclass
+class FileChanges:
+    """A debounced batch of changed paths"""
+
+    paths: Set[Path] = field(default_factory=set)
+    # Events were lost (e.g. the inotify queue overflowed), everything should be re-checked
+    rescan: bool = False
+
+
+class _InotifyBackend:
+    """Recursive inotify watches on Linux, through libc"""
+
+    def __init__(self, roots: Sequence[Path]):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: Dict[int, Path] = {}
+        for root in roots:
+            self._watch_tree(root)
+
+    def _watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            # Typically ENOSPC: fs.inotify.max_user_watches is too low
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self._directories[wd] = directory
+
+    def _watch_tree(self, root: Path) -> List[Path]:
+        """Watch a directory and its subdirectories, returning the files already in them"""
+        files: List[Path] = []
+        for directory, _, names in os.walk(root):
+            self._watch(Path(directory))
+            files.extend(Path(directory) / name for name in names)
+        return files
+
+    def wait(self, timeout: float) -> Tuple[Set[Path], bool]:
+        """Changed paths within timeout seconds, and whether events were lost"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set(), False
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set(), False
+
+        paths: Set[Path] = set()
+        overflow = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + _EVENT_HEADER.size: offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += _EVENT_HEADER.size + length
+            if mask & _IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            directory = self._directories.get(wd)
+            if mask & _IN_IGNORED:
+                self._directories.pop(wd, None)
+                continue
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                # A new directory: watch it, and report what was put in it before the watch existed
+                try:
+                    paths.update(self._watch_tree(path))
+                except OSError as e:
+                    logger.warning(f"Could not watch {path}: {e}")
+                    overflow = True
+            elif mask & _IN_CREATE:
+                # Reported again once written
+                continue
+            paths.add(path)
+        return paths, overflow
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class _PollingBackend:
+    """Compares the size and mtime of every file every poll_interval seconds"""
+
+    def __init__(self, roots: Sequence[Path], poll_interval: float):
+        self._roots = roots
+        self._poll_interval = poll_interval
+        self._snapshot = self._scan()
+        self._next_poll = time.monotonic() + poll_interval
+
+    def _scan(self) -> Dict[Path, Tuple[int, float]]:
+        snapshot: Dict[Path, Tuple[int, float]] = {}
+        for root in self._roots:
+            for directory, _, names in os.walk(root):
+                for name in names:
+                    path = Path(directory) / name
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    snapshot[path] = (stat.st_size, stat.st_mtime)
+        return snapshot
+
+    def wait(self, timeout: float) -> Tuple[Set[Path], bool]:
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set(), False
+        time.sleep(max(delay, 0))
+        self._next_poll = time.monotonic() + self._poll_interval
+        snapshot = self._scan()
+        changed = {p for p in snapshot.keys() | self._snapshot.keys() if snapshot.get(p) != self._snapshot.get(p)}
+        self._snapshot = snapshot
+        return changed, False
+
+    def close(self) -> None:
+        pass
+
+
+class FileWatcher:
+    """
+    Watches directories for added, modified and removed files, in debounced batches.
+
+    Uses inotify on Linux and falls back to polling file sizes and mtimes
+    elsewhere, or when inotify is unavailable (e.g. network filesystems or
+    too few inotify watches). Events are collected until no new event arrived
+    for debounce_seconds, but for at most max_delay_seconds, so a burst of
+    events (a copy of many files, an editor writing a file several times)
+    becomes one batch.
+    """
+
+    def __init__(
+        self,
+        roots: Sequence[Union[str, Path]],
+        suffixes: Sequence[str] = (".pdf",),
+        debounce_seconds: float = 2.0,
+        max_delay_seconds: float = 30.0,
+        poll_interval: float = 10.0,
+        use_inotify: bool = True,
+    ):
+        """
+        Args:
+            roots: Directories to watch, with their subdirectories.
+            suffixes: Suffixes of the files to report, directories are always reported.
+            debounce_seconds: Quiet time that ends a batch.
+            max_delay_seconds: Longest a changed path waits to be reported during a steady stream of events.
+            poll_interval: Seconds between two scans when polling.
+            use_inotify: Use inotify when available, False to always poll.
+        """
+        self.roots = [Path(root) for root in roots]
+        self.suffixes = tuple(suffixes)
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.backend: Union[_InotifyBackend, _PollingBackend]
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self.backend = _InotifyBackend(self.roots)
+                log_info(f"Watching {len(self.roots)} directories with inotify")
+                return
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify unavailable, polling every {poll_interval}s instead: {e}")
+        self.backend = _PollingBackend(self.roots, poll_interval)
+        log_info(f"Polling {len(self.roots)} directories every {poll_interval}s")
+
+    def _relevant(self, path: Path) -> bool:
+        # Removed directories no longer exist, so paths without a suffix are kept too
+        return path.suffix in self.suffixes or not path.suffix or path.is_dir()
+
+    def changes(self, stop: threading.Event) -> Iterator[FileChanges]:
+        """
+        Yield batches of changed paths until stop is set.
+
+        Args:
+            stop: Event ending the iteration, checked at least every second.
+
+        Returns:
+            Iterator of FileChanges.
+        """
+        pending = FileChanges()
+        first_event = last_event = 0.0
+        while not stop.is_set():
+            paths, overflow = self.backend.wait(timeout=min(self.debounce_seconds, 1.0))
+            paths = {path for path in paths if self._relevant(path)}
+            now = time.monotonic()
+            if paths or overflow:
+                if not pending.paths and not pending.rescan:
+                    first_event = now
+                last_event = now
+                pending.paths.update(paths)
+                pending.rescan = pending.rescan or overflow
+            elif not pending.paths and not pending.rescan:
+                continue
+            if now - last_event >= self.debounce_seconds or now - first_event >= self.max_delay_seconds:
+                log_debug(f"{len(pending.paths)} changed paths{', rescan' if pending.rescan else ''}")
+                yield pending
+                pending = FileChanges()
+
+    def close(self) -> None:
+        self.backend.close()
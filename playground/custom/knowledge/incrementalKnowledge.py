@@ -0,0 +1,179 @@
+from abc import abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from pydantic import Field
+
+from agno.document import Document
+from agno.knowledge.agent import AgentKnowledge
+from agno.utils.log import log_info
+from custom.knowledge.manifest import KnowledgeManifest, hash_file
+
+
+class IncrementalKnowledgeBase(AgentKnowledge):
+    """
+    Base of the file knowledge bases that only re-process what changed since the last load.
+
+    A content-hash manifest records every loaded file (hash, size, mtime and
+    chunking settings) per vector table. Subclasses list their files in _files()
+    and decide which parts of a changed file are re-processed.
+
+    Rows record the manifest key of their file, its path relative to the
+    knowledge base directory, as meta_data["source"]; files with the same name
+    in different directories only ever touch their own rows.
+    """
+
+    path: Union[str, Path]
+
+    exclude_files: List[str] = Field(default_factory=list)
+
+    # Only re-process files whose content hash changed since the last load
+    incremental: bool = True
+    # Manifest location, defaults to a hidden per-table file in the knowledge base directory
+    manifest_path: Optional[Union[str, Path]] = None
+
+    @property
+    def _root_path(self) -> Path:
+        _path: Path = Path(self.path) if isinstance(self.path, str) else self.path
+        return _path if _path.is_dir() else _path.parent
+
+    @abstractmethod
+    def _files(self) -> Iterator[Path]:
+        """Iterate over the files of the knowledge base, skipping excluded files"""
+
+    def _files_with_suffix(self, suffix: str) -> Iterator[Path]:
+        _path: Path = Path(self.path) if isinstance(self.path, str) else self.path
+
+        if _path.exists() and _path.is_dir():
+            for _file in sorted(_path.glob(f"**/*{suffix}")):
+                if _file.name in self.exclude_files:
+                    continue
+                yield _file
+        elif _path.exists() and _path.is_file() and _path.suffix == suffix:
+            if _path.name in self.exclude_files:
+                return
+            yield _path
+
+    def _chunk(self, document: Document) -> List[Document]:
+        if self.reader.chunk:
+            return self.reader.chunk_document(document)
+        return [document]
+
+    @property
+    def _chunking_signature(self) -> Optional[str]:
+        """Chunking settings recorded per file, when the chunking strategy has a signature"""
+        if not self.reader.chunk:
+            return None
+        return getattr(self.reader.chunking_strategy, "signature", None)
+
+    def get_manifest(self) -> KnowledgeManifest:
+        """Get the content-hash manifest for the vector table this knowledge base loads into"""
+        if self.manifest_path is not None:
+            return KnowledgeManifest(self.manifest_path)
+        table_name = getattr(self.vector_db, "table_name", "knowledge")
+        corpus = getattr(self.vector_db, "corpus", None)
+        if corpus is not None:
+            # Shared tables hold several corpora, keep one manifest per corpus
+            table_name = f"{table_name}.{corpus}"
+        return KnowledgeManifest(self._root_path / f".{table_name}.manifest.json")
+
+    def _manifest_key(self, path: Path) -> str:
+        try:
+            return path.relative_to(self._root_path).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def _delete_file_rows(self, key: str, name: str, meta_data: Optional[Dict[str, Any]] = None) -> int:
+        """Delete the rows of the file with manifest key `key`, optionally only those matching some metadata"""
+        return self.vector_db.delete_documents(name=name, meta_data={"source": key, **(meta_data or {})})
+
+    def _delete_unsourced_rows(self, name: str) -> int:
+        """Delete the rows of a document name written before rows recorded their source file"""
+        return self.vector_db.delete_documents(name=name, missing_key="source")
+
+    def _write_documents(
+        self,
+        documents: List[Document],
+        upsert: bool,
+        filters: Optional[Dict[str, Any]],
+    ) -> None:
+        if not documents:
+            return
+        if upsert and self.vector_db.upsert_available():
+            self.vector_db.upsert(documents=documents, filters=filters)
+        else:
+            self.vector_db.insert(documents=documents, filters=filters)
+
+    def _prepare_load(self, recreate: bool) -> KnowledgeManifest:
+        """Drop/create the table as needed and return the manifest matching its contents"""
+        manifest = self.get_manifest()
+
+        if recreate:
+            log_info("Dropping collection")
+            self.vector_db.drop()
+
+        if not self.vector_db.exists():
+            log_info("Creating collection")
+            self.vector_db.create()
+            # Nothing in the manifest is in the table anymore
+            manifest.clear()
+        return manifest
+
+    def _find_changed_files(
+        self, manifest: KnowledgeManifest, files: Optional[Iterable[Path]] = None
+    ) -> Tuple[Dict[str, Any], Set[str]]:
+        """Find the files whose content changed since the last load.
+
+        Args:
+            manifest: Manifest of the last load.
+            files: Files to check, defaults to all files of the knowledge base.
+
+        Returns:
+            The changed files as {key: (path, file hash, stat)}, and the keys of all checked files.
+        """
+        seen_keys = set()
+        changed: Dict[str, Any] = {}
+        signature = self._chunking_signature
+        for _file in self._files() if files is None else files:
+            key = self._manifest_key(_file)
+            seen_keys.add(key)
+            entry = manifest.get(key)
+            stat = _file.stat()
+            # Files chunked with other settings, or loaded before rows recorded their source, are re-chunked
+            if entry and (entry.get("chunking") != signature or "source" not in entry):
+                changed[key] = (_file, hash_file(_file), stat)
+                continue
+
+            # Fast path: untouched file
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                continue
+
+            file_hash = hash_file(_file)
+            if entry and entry["hash"] == file_hash:
+                entry.update(size=stat.st_size, mtime=stat.st_mtime)
+                manifest.save()
+                continue
+
+            changed[key] = (_file, file_hash, stat)
+        return changed, seen_keys
+
+    def _finish_load(self, manifest: KnowledgeManifest, removed_keys: Set[str]) -> None:
+        """Remove the vectors of files that no longer exist and record the load"""
+        for key in removed_keys:
+            entry = manifest.get(key)
+            if entry is None:
+                continue
+            if "source" in entry:
+                deleted = self._delete_file_rows(key, entry["name"])
+            else:
+                deleted = self._delete_unsourced_rows(entry["name"])
+            log_info(f"Removed {deleted} documents of deleted file '{key}'")
+            manifest.remove(key)
+            manifest.save()
+
+        if hasattr(self.vector_db, "ensure_text_search"):
+            self.vector_db.ensure_text_search()
+        if hasattr(self.vector_db, "ensure_vector_index"):
+            self.vector_db.ensure_vector_index()
+        if hasattr(self.vector_db, "mark_loaded"):
+            self.vector_db.mark_loaded(source=str(self.path))
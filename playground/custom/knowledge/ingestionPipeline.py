@@ -0,0 +1,252 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List
+
+from agno.document import Document
+from agno.utils.log import log_info
+
+# Tells a stage worker that the previous stage has finished
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """Throughput and input queue depth of one pipeline stage"""
+
+    name: str
+    concurrency: int
+    # Items taken from the input queue (sources, pages or batches)
+    items: int = 0
+    # Documents passed on to the next stage
+    documents: int = 0
+    # Time the workers spent working rather than waiting on queues
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0
+    _queue_depth_sum: int = field(default=0, repr=False)
+    _queue_depth_samples: int = field(default=0, repr=False)
+
+    def sample_queue_depth(self, depth: int) -> None:
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._queue_depth_sum += depth
+        self._queue_depth_samples += 1
+
+    @property
+    def mean_queue_depth(self) -> float:
+        return self._queue_depth_sum / self._queue_depth_samples if self._queue_depth_samples else 0.0
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "items": self.items,
+            "documents": self.documents,
+            "documents_per_second": self.documents / elapsed if elapsed else 0.0,
+            "busy_seconds": self.busy_seconds,
+            "mean_queue_depth": self.mean_queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+@dataclass
+class PipelineStats:
+    """Per-stage statistics of one pipeline run"""
+
+    stages: Dict[str, StageStats]
+    seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "seconds": self.seconds,
+            "stages": {name: stage.to_dict(self.seconds) for name, stage in self.stages.items()},
+        }
+
+    def __str__(self) -> str:
+        lines = [f"Ingestion pipeline finished in {self.seconds:.1f}s"]
+        for name, stage in self.stages.items():
+            rate = stage.documents / self.seconds if self.seconds else 0.0
+            lines.append(
+                f"  {name:<6} x{stage.concurrency}: {stage.documents} docs ({rate:.1f}/s), "
+                f"busy {stage.busy_seconds:.1f}s, queue depth mean {stage.mean_queue_depth:.1f} / max {stage.max_queue_depth}"
+            )
+        return "\n".join(lines)
+
+
+class IngestionPipeline:
+    """
+    Async ingestion pipeline: read -> chunk -> embed -> write.
+
+    Stages run concurrently with their own number of workers and are connected by
+    bounded queues, so a slow stage (usually embedding) makes the earlier stages
+    wait instead of letting them read ahead without limit. The blocking stage
+    functions run in threads.
+
+    Queue items are single documents between read and chunk, and batches of up to
+    batch_size documents between chunk, embed and write.
+    """
+
+    def __init__(
+        self,
+        read_concurrency: int = 2,
+        chunk_concurrency: int = 2,
+        embed_concurrency: int = 2,
+        write_concurrency: int = 1,
+        queue_size: int = 8,
+        batch_size: int = 100,
+        log_interval: float = 10.0,
+    ):
+        """
+        Args:
+            read_concurrency: Number of sources read at the same time.
+            chunk_concurrency: Number of chunking workers.
+            embed_concurrency: Number of batches embedded at the same time.
+            write_concurrency: Number of batches written at the same time.
+            queue_size: Maximum number of items waiting between two stages.
+            batch_size: Number of documents per embed/write batch.
+            log_interval: Seconds between progress logs, 0 disables them.
+        """
+        self.read_concurrency = max(1, read_concurrency)
+        self.chunk_concurrency = max(1, chunk_concurrency)
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.write_concurrency = max(1, write_concurrency)
+        self.queue_size = max(1, queue_size)
+        self.batch_size = max(1, batch_size)
+        self.log_interval = log_interval
+
+    async def run(
+        self,
+        sources: Iterable[Any],
+        read: Callable[[Any], Iterable[Document]],
+        chunk: Callable[[Document], List[Document]],
+        embed: Callable[[List[Document]], None],
+        write: Callable[[List[Document]], None],
+    ) -> PipelineStats:
+        """
+        Run every source through the pipeline.
+
+        Args:
+            sources: Items to read, e.g. file paths.
+            read: Returns the documents of a source; a generator is advanced one document at a time.
+            chunk: Splits a document into the documents to embed.
+            embed: Sets the embedding of every document in a batch.
+            write: Writes a batch of embedded documents to the vector db.
+
+        Returns:
+            The per-stage statistics. Raises the first error of any stage.
+        """
+        stats = PipelineStats(stages={
+            "read": StageStats("read", self.read_concurrency),
+            "chunk": StageStats("chunk", self.chunk_concurrency),
+            "embed": StageStats("embed", self.embed_concurrency),
+            "write": StageStats("write", self.write_concurrency),
+        })
+        source_queue: asyncio.Queue = asyncio.Queue()
+        for source in sources:
+            source_queue.put_nowait(source)
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        queues = {"read": source_queue, "chunk": chunk_queue, "embed": embed_queue, "write": write_queue}
+
+        async def read_worker():
+            stage = stats.stages["read"]
+            while True:
+                try:
+                    source = source_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                stage.items += 1
+                start = time.perf_counter()
+                documents = iter(await asyncio.to_thread(read, source))
+                stage.busy_seconds += time.perf_counter() - start
+                while True:
+                    start = time.perf_counter()
+                    document = await asyncio.to_thread(next, documents, None)
+                    stage.busy_seconds += time.perf_counter() - start
+                    if document is None:
+                        break
+                    stage.documents += 1
+                    await chunk_queue.put(document)
+
+        async def chunk_worker():
+            stage = stats.stages["chunk"]
+            batch: List[Document] = []
+            while True:
+                document = await chunk_queue.get()
+                if document is _DONE:
+                    break
+                stage.items += 1
+                start = time.perf_counter()
+                batch.extend(await asyncio.to_thread(chunk, document))
+                stage.busy_seconds += time.perf_counter() - start
+                while len(batch) >= self.batch_size:
+                    stage.documents += self.batch_size
+                    await embed_queue.put(batch[: self.batch_size])
+                    batch = batch[self.batch_size :]
+            if batch:
+                stage.documents += len(batch)
+                await embed_queue.put(batch)
+
+        async def batch_worker(name: str, function: Callable[[List[Document]], None], queue, next_queue):
+            stage = stats.stages[name]
+            while True:
+                batch = await queue.get()
+                if batch is _DONE:
+                    return
+                stage.items += 1
+                start = time.perf_counter()
+                await asyncio.to_thread(function, batch)
+                stage.busy_seconds += time.perf_counter() - start
+                stage.documents += len(batch)
+                if next_queue is not None:
+                    await next_queue.put(batch)
+
+        async def run_stage(workers, next_queue, next_concurrency):
+            await asyncio.gather(*workers)
+            if next_queue is not None:
+                for _ in range(next_concurrency):
+                    await next_queue.put(_DONE)
+
+        async def monitor():
+            last_log = time.monotonic()
+            while True:
+                await asyncio.sleep(0.1)
+                for name, queue in queues.items():
+                    stats.stages[name].sample_queue_depth(queue.qsize())
+                if self.log_interval and time.monotonic() - last_log >= self.log_interval:
+                    last_log = time.monotonic()
+                    log_info(", ".join(
+                        f"{name}: {stage.documents} docs (queue {queues[name].qsize()})"
+                        for name, stage in stats.stages.items()
+                    ))
+
+        start = time.perf_counter()
+        stage_tasks = [
+            asyncio.create_task(run_stage(
+                [read_worker() for _ in range(self.read_concurrency)], chunk_queue, self.chunk_concurrency
+            )),
+            asyncio.create_task(run_stage(
+                [chunk_worker() for _ in range(self.chunk_concurrency)], embed_queue, self.embed_concurrency
+            )),
+            asyncio.create_task(run_stage(
+                [batch_worker("embed", embed, embed_queue, write_queue) for _ in range(self.embed_concurrency)],
+                write_queue,
+                self.write_concurrency,
+            )),
+            asyncio.create_task(run_stage(
+                [batch_worker("write", write, write_queue, None) for _ in range(self.write_concurrency)], None, 0
+            )),
+        ]
+        monitor_task = asyncio.create_task(monitor())
+        try:
+            await asyncio.gather(*stage_tasks)
+        except BaseException:
+            for task in stage_tasks:
+                task.cancel()
+            await asyncio.gather(*stage_tasks, return_exceptions=True)
+            raise
+        finally:
+            monitor_task.cancel()
+            stats.seconds = time.perf_counter() - start
+
+        log_info(str(stats))
+        return stats
@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from agno.utils.log import log_info, logger
+from custom.knowledge.fileWatcher import FileChanges, FileWatcher
+from custom.knowledge.pdfKnowledge import PDFKnowledgeBase
+
+
+class KnowledgeIndexer:
+    """
+    Keeps knowledge tables in sync with their PDF directories while running.
+
+    A watcher thread turns file events into debounced batches and puts them on a
+    work queue. A single worker thread takes them off, merging everything queued
+    for the same knowledge base, and indexes only the files that changed through
+    PDFKnowledgeBase.load_files: added and modified files are loaded page by
+    page, the vectors of removed files are deleted. One file is indexed at a
+    time, so the indexer needs one or two database connections; give its
+    knowledge bases an engine of their own (see db.engine.create_db_engine) to
+    keep it off the pool serving requests.
+
+    Every knowledge base gets an incremental load() at start, to catch up with
+    what changed while the indexer was not running, after a lost-events rescan,
+    and every reconcile_seconds as a safety net.
+    """
+
+    def __init__(
+        self,
+        knowledge_bases: Dict[str, PDFKnowledgeBase],
+        watcher: Optional[FileWatcher] = None,
+        reconcile_seconds: float = 3600.0,
+        retry_seconds: float = 30.0,
+    ):
+        """
+        Args:
+            knowledge_bases: Knowledge bases by name, each with a directory as path.
+            watcher: File watcher over the knowledge directories, defaults to one with the default settings.
+            reconcile_seconds: Seconds between full incremental loads, 0 to only load at start.
+            retry_seconds: Wait before retrying a batch that failed, e.g. while the database is down.
+        """
+        self.knowledge_bases = knowledge_bases
+        self.roots = {name: Path(knowledge.path).resolve() for name, knowledge in knowledge_bases.items()}
+        self.watcher = watcher or FileWatcher(list(self.roots.values()))
+        self.reconcile_seconds = reconcile_seconds
+        self.retry_seconds = retry_seconds
+        # (knowledge base name, changed paths or None for a full incremental load)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def _owner(self, path: Path) -> Optional[str]:
+        path = path.resolve()
+        for name, root in self.roots.items():
+            if path == root or root in path.parents:
+                return name
+        return None
+
+    def _watch(self) -> None:
+        for changes in self.watcher.changes(self._stop):
+            self._enqueue(changes)
+
+    def _enqueue(self, changes: FileChanges) -> None:
+        if changes.rescan:
+            for name in self.knowledge_bases:
+                self._queue.put((name, None))
+            return
+        by_owner: Dict[str, Set[Path]] = {}
+        for path in changes.paths:
+            owner = self._owner(path)
+            if owner is not None:
+                by_owner.setdefault(owner, set()).add(path)
+        for name, paths in by_owner.items():
+            self._queue.put((name, paths))
+
+    def _next_work(self, timeout: float) -> Dict[str, Optional[Set[Path]]]:
+        """Everything queued, merged per knowledge base: None (full load) absorbs paths"""
+        work: Dict[str, Optional[Set[Path]]] = {}
+        try:
+            items = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return work
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for name, paths in items:
+            if paths is None or work.get(name, set()) is None:
+                work[name] = None
+            else:
+                work.setdefault(name, set()).update(paths)
+        return work
+
+    def _index(self, name: str, paths: Optional[Set[Path]]) -> None:
+        knowledge = self.knowledge_bases[name]
+        start = time.perf_counter()
+        if paths is None:
+            knowledge.load()
+            log_info(f"Indexer: '{name}' reconciled in {time.perf_counter() - start:.1f}s")
+        else:
+            knowledge.load_files(sorted(paths))
+            log_info(f"Indexer: '{name}' indexed {len(paths)} changed paths in {time.perf_counter() - start:.1f}s")
+
+    def _work(self) -> None:
+        next_reconcile = time.monotonic() + self.reconcile_seconds if self.reconcile_seconds else None
+        while not self._stop.is_set():
+            if next_reconcile is not None and time.monotonic() >= next_reconcile:
+                for name in self.knowledge_bases:
+                    self._queue.put((name, None))
+                next_reconcile = time.monotonic() + self.reconcile_seconds
+            for name, paths in self._next_work(timeout=1.0).items():
+                if self._stop.is_set():
+                    return
+                try:
+                    self._index(name, paths)
+                except Exception as e:
+                    logger.error(f"Indexer: indexing '{name}' failed, retrying in {self.retry_seconds}s: {e}")
+                    self._stop.wait(self.retry_seconds)
+                    self._queue.put((name, paths))
+
+    def start(self) -> None:
+        """Queue the catch-up loads and start the watcher and worker threads"""
+        for name in self.knowledge_bases:
+            self._queue.put((name, None))
+        self._threads = [
+            threading.Thread(target=self._watch, name="indexer-watcher", daemon=True),
+            threading.Thread(target=self._work, name="indexer-worker", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        log_info(f"Indexer watching {', '.join(f'{n} ({r})' for n, r in self.roots.items())}")
+
+    def stop(self) -> None:
+        """Ask the threads to stop, safe to call from a signal handler. Queued work is dropped"""
+        self._stop.set()
+
+    def wait(self) -> None:
+        """Block until stop() is called"""
+        while not self._stop.wait(1.0):
+            pass
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Wait for the threads to stop, the file being indexed is finished first"""
+        for thread in self._threads:
+            thread.join(timeout)
+        self.watcher.close()
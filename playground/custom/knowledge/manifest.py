@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+
+def hash_text(text: str) -> str:
+    """Return the sha256 hex digest of a piece of text"""
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def hash_file(path: Union[str, Path], block_size: int = 1 << 20) -> str:
+    """Return the sha256 hex digest of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class KnowledgeManifest:
+    """
+    JSON manifest of what has already been loaded into a vector table.
+
+    Every entry is keyed by the file path relative to the knowledge directory and
+    stores the file hash, size, mtime and the content hash of each page/section, e.g.
+
+        {"specs/screening.pdf": {"name": "screening", "source": "specs/screening.pdf", "hash": "...",
+                                 "size": 1024, "mtime": 1718000000.0, "pages": {"1": "...", "2": "..."}}}
+
+    The rows of a file carry its key as meta_data["source"].
+
+    Markdown entries hold "sections" instead of "pages", keyed by section id.
+    """
+
+    version: int = 1
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self) -> None:
+        """Load the manifest from disk, starting empty if it is missing or unreadable"""
+        self.files = {}
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.version:
+                self.files = data.get("files", {})
+        except (OSError, ValueError):
+            # A corrupt manifest only costs us a full reload
+            self.files = {}
+
+    def save(self) -> None:
+        """Atomically write the manifest to disk"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "files": self.files}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.files.get(key)
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        self.files[key] = entry
+
+    def remove(self, key: str) -> None:
+        self.files.pop(key, None)
+
+    def keys(self) -> List[str]:
+        return list(self.files.keys())
+
+    def clear(self) -> None:
+        self.files = {}
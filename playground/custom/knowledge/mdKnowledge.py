@@ -1,20 +1,23 @@
+import asyncio
 from pathlib import Path
-from typing import AsyncIterator, Iterator, List, Union
-
-from pydantic import Field
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 from agno.document import Document
-from agno.knowledge.agent import AgentKnowledge
+from agno.utils.log import log_debug, log_info, logger
+from custom.knowledge.incrementalKnowledge import IncrementalKnowledgeBase
+from custom.knowledge.ingestionPipeline import IngestionPipeline, PipelineStats
+from custom.knowledge.manifest import KnowledgeManifest, hash_text
 from custom.knowledge.mdReader import MDReader
 
 
-class MDKnowledgeBase(AgentKnowledge):
-    path: Union[str, Path]
-
-    exclude_files: List[str] = Field(default_factory=list)
+class MDKnowledgeBase(IncrementalKnowledgeBase):
+    """Knowledge base of Markdown files; incremental loads re-process the changed sections of changed files"""
 
     reader: MDReader = MDReader()
 
+    def _files(self) -> Iterator[Path]:
+        return self._files_with_suffix(".md")
+
     @property
     def document_lists(self) -> Iterator[List[Document]]:
         """Iterate over Markdown files and yield lists of documents.
@@ -23,18 +26,8 @@ class MDKnowledgeBase(AgentKnowledge):
         Returns:
             Iterator[List[Document]]: Iterator yielding list of documents
         """
-
-        _md_path: Path = Path(self.path) if isinstance(self.path, str) else self.path
-
-        if _md_path.exists() and _md_path.is_dir():
-            for _md in _md_path.glob("**/*.md"):
-                if _md.name in self.exclude_files:
-                    continue
-                yield self.reader.read(md_file=_md)
-        elif _md_path.exists() and _md_path.is_file() and _md_path.suffix == ".md":
-            if _md_path.name in self.exclude_files:
-                return
-            yield self.reader.read(md_file=_md_path)
+        for _md in self._files():
+            yield self.reader.read(md_file=_md)
 
     @property
     async def async_document_lists(self) -> AsyncIterator[List[Document]]:
@@ -44,15 +37,174 @@ class MDKnowledgeBase(AgentKnowledge):
         Returns:
             Iterator[List[Document]]: Iterator yielding list of documents
         """
+        for _md in self._files():
+            yield await self.reader.async_read(md_file=_md)
+
+    def _changed_section_documents(
+        self,
+        manifest: KnowledgeManifest,
+        key: str,
+        changed_file: Tuple[Path, str, Any],
+    ) -> List[Document]:
+        """Return the (unchunked) documents of the changed sections of a file, deleting the rows they replace.
+
+        The file's manifest entry is updated, but not saved.
+        """
+        _md, file_hash, stat = changed_file
+        entry = manifest.get(key)
+        signature = self._chunking_signature
+
+        doc_name = self.reader.get_doc_name(_md)
+        if entry is None or entry.get("chunking") != signature or "source" not in entry:
+            self._delete_file_rows(key, doc_name)
+            # Also clears rows of whole-file documents written before sections or the source file were tracked
+            self._delete_unsourced_rows(doc_name)
+            entry = None
+
+        old_sections: Dict[str, str] = entry["sections"] if entry else {}
+        new_sections: Dict[str, str] = {}
+        documents: List[Document] = []
+        for document in self.reader.read_sections(_md, source=key):
+            section_id = document.meta_data["section_id"]
+            section_hash = hash_text(document.content)
+            new_sections[section_id] = section_hash
+            if old_sections.get(section_id) == section_hash:
+                continue
+            if section_id in old_sections:
+                # The section may now have fewer chunks, drop the stale ones
+                self._delete_file_rows(key, doc_name, meta_data={"section_id": section_id})
+            documents.append(document)
+
+        for section_id in old_sections.keys() - new_sections.keys():
+            self._delete_file_rows(key, doc_name, meta_data={"section_id": section_id})
+
+        log_debug(
+            f"'{key}': {len(documents)} of {len(new_sections)} sections changed, "
+            f"{len(old_sections.keys() - new_sections.keys())} removed"
+        )
+        new_entry = {
+            "name": doc_name,
+            "source": key,
+            "hash": file_hash,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sections": new_sections,
+        }
+        if signature is not None:
+            new_entry["chunking"] = signature
+        manifest.set(key, new_entry)
+        return documents
+
+    def load(
+        self,
+        recreate: bool = False,
+        upsert: bool = False,
+        skip_existing: bool = True,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Load the knowledge base to the vector db, re-processing only what changed.
+
+        Files are split into sections on their headings. Unchanged files (same
+        size/mtime or same file hash) are not read at all. For changed files every
+        section is hashed and only the changed sections are chunked, embedded and
+        written. Rows of deleted files and sections are removed.
+
+        Args:
+            recreate (bool): If True, recreates the collection in the vector db. Defaults to False.
+            upsert (bool): If True, upserts documents to the vector db. Defaults to False.
+            skip_existing (bool): Only used for non-incremental loads. Defaults to True.
+            filters (Optional[Dict[str, Any]]): Filters to add to each row that can be used to limit results during querying. Defaults to None.
+        """
+        if not self.incremental or self.vector_db is None or not hasattr(self.vector_db, "delete_documents"):
+            if self.incremental and self.vector_db is not None:
+                logger.warning("Vector db does not support deleting documents, falling back to a full load")
+            return super().load(recreate=recreate, upsert=upsert, skip_existing=skip_existing, filters=filters)
+
+        manifest = self._prepare_load(recreate)
+
+        log_info("Loading knowledge base")
+        changed, seen_keys = self._find_changed_files(manifest)
+
+        num_documents = 0
+        for key in changed:
+            documents: List[Document] = []
+            for section in self._changed_section_documents(manifest, key, changed[key]):
+                documents.extend(self._chunk(section))
+            # Upsert, as an interrupted load may have written part of this file already
+            self._write_documents(documents, upsert=True, filters=filters)
+            num_documents += len(documents)
+            log_info(f"Added {len(documents)} documents from '{key}' to knowledge base")
+            manifest.save()
+
+        self._finish_load(manifest, set(manifest.keys()) - seen_keys)
+        log_debug(f"Incremental load wrote {num_documents} documents")
+
+    async def aload_pipeline(
+        self,
+        pipeline: Optional[IngestionPipeline] = None,
+        recreate: bool = False,
+        upsert: bool = False,
+        skip_existing: bool = True,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> PipelineStats:
+        """Load the knowledge base through the concurrent ingestion pipeline.
+
+        Reading, chunking, embedding and writing overlap, with bounded queues in
+        between. Like load(), only changed sections are re-processed when incremental.
+
+        Args:
+            pipeline (Optional[IngestionPipeline]): Pipeline to use, defaults to IngestionPipeline().
+            recreate (bool): If True, recreates the collection in the vector db. Defaults to False.
+            upsert (bool): If True, upserts documents to the vector db. Only used for non-incremental loads.
+            skip_existing (bool): If True, skips documents which already exist in the vector db when inserting. Defaults to True.
+            filters (Optional[Dict[str, Any]]): Filters to add to each row that can be used to limit results during querying. Defaults to None.
+
+        Returns:
+            PipelineStats: Per-stage throughput and queue depth.
+        """
+        if self.vector_db is None:
+            raise ValueError("No vector db provided")
+        pipeline = pipeline or IngestionPipeline()
+        embed = getattr(self.vector_db, "embed_documents", None) or (
+            lambda documents: [document.embed(embedder=self.vector_db.embedder) for document in documents]
+        )
+
+        if not self.incremental or not hasattr(self.vector_db, "delete_documents"):
+            if recreate:
+                log_info("Dropping collection")
+                await asyncio.to_thread(self.vector_db.drop)
+            if not self.vector_db.exists():
+                log_info("Creating collection")
+                await asyncio.to_thread(self.vector_db.create)
+
+            upsert = upsert and self.vector_db.upsert_available()
+
+            def chunk(document: Document) -> List[Document]:
+                documents = self._chunk(document)
+                if not upsert and skip_existing:
+                    documents = [doc for doc in documents if not self.vector_db.doc_exists(doc)]
+                return documents
+
+            return await pipeline.run(
+                sources=list(self._files()),
+                read=self.reader.read_sections,
+                chunk=chunk,
+                embed=embed,
+                write=lambda documents: self._write_documents(documents, upsert=upsert, filters=filters),
+            )
+
+        manifest = await asyncio.to_thread(self._prepare_load, recreate)
+        changed, seen_keys = await asyncio.to_thread(self._find_changed_files, manifest)
 
-        _md_path: Path = Path(self.path) if isinstance(self.path, str) else self.path
-
-        if _md_path.exists() and _md_path.is_dir():
-            for _md in _md_path.glob("**/*.md"):
-                if _md.name in self.exclude_files:
-                    continue
-                yield await self.reader.async_read(md_file=_md)
-        elif _md_path.exists() and _md_path.is_file() and _md_path.suffix == ".md":
-            if _md_path.name in self.exclude_files:
-                return
-            yield await self.reader.async_read(md_file=_md_path)
\ No newline at end of file
+        stats = await pipeline.run(
+            sources=list(changed),
+            read=lambda key: self._changed_section_documents(manifest, key, changed[key]),
+            chunk=self._chunk,
+            embed=embed,
+            # Upsert, as an interrupted load may have written part of a file already
+            write=lambda documents: self._write_documents(documents, upsert=True, filters=filters),
+        )
+        # Only record the files once all their documents are written
+        manifest.save()
+        await asyncio.to_thread(self._finish_load, manifest, set(manifest.keys()) - seen_keys)
+        return stats
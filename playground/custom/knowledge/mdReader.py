@@ -1,38 +1,136 @@
 from agno.document.reader.base import Reader
 from agno.document.base import Document
-from typing import List, Any, Union, IO
+from typing import Dict, List, Any, Optional, Tuple, Union, IO
 import os
+import re
 from pathlib import Path
 
+# ATX headings ("## Setup"), closing hashes optional
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)(?:\s+#+)?\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "section"
+
 
 class MDReader(Reader):
     """Markdown reader that reads markdown documents from a file path"""
 
-    def __init__(self, chunk: bool = True, chunk_size: int = 3000, **kwargs):
+    def __init__(self, chunk: bool = True, chunk_size: int = 3000, max_heading_level: int = 3, **kwargs):
+        """
+        Args:
+            chunk: Chunk the sections.
+            chunk_size: Chunk size of the chunking strategy.
+            max_heading_level: Deepest heading that starts a section of its own, deeper ones stay in their parent.
+        """
         super().__init__(chunk=chunk, chunk_size=chunk_size, **kwargs)
+        self.max_heading_level = max_heading_level
 
-    def read(self, md_file: Union[str, Path, IO[Any]]) -> List[Document]:
+    def get_doc_name(self, md_file: Union[str, Path, IO[Any]]) -> str:
+        if isinstance(md_file, str):
+            return os.path.basename(md_file).split(".")[0].replace(" ", "_")
+        elif isinstance(md_file, Path):
+            return md_file.name.split(".")[0].replace(" ", "_")
+        else:
+            return getattr(md_file, 'name', 'md').split(".")[0].replace(" ", "_")
+
+    def split_sections(self, content: str) -> List[Tuple[List[str], str]]:
+        """
+        Split Markdown text on its headings, ignoring heading-like lines inside fenced code blocks.
+
+        Args:
+            content: The Markdown text.
+
+        Returns:
+            (heading path, section text) tuples in document order. The heading path
+            lists the section's heading and those of its parents, outermost first;
+            text before the first heading has an empty path. Section text starts
+            with its own heading line.
+        """
+        sections: List[Tuple[List[str], List[str]]] = [([], [])]
+        # (level, heading) of the enclosing sections
+        stack: List[Tuple[int, str]] = []
+        in_fence = False
+        for line in content.splitlines():
+            if _FENCE.match(line):
+                in_fence = not in_fence
+            match = None if in_fence else _HEADING.match(line)
+            if match and len(match.group(1)) <= self.max_heading_level:
+                level = len(match.group(1))
+                while stack and stack[-1][0] >= level:
+                    stack.pop()
+                stack.append((level, match.group(2).strip()))
+                sections.append(([heading for _, heading in stack], []))
+            sections[-1][1].append(line)
+        return [(path, "\n".join(lines).strip()) for path, lines in sections]
+
+    def read_sections(self, md_file: Union[str, Path, IO[Any]], source: Optional[str] = None) -> List[Document]:
+        """
+        Read a Markdown file into one unchunked Document per section.
+
+        Section ids are built from the heading path, not the content, so a section
+        keeps its id when it is edited. The headings of the parent sections are
+        repeated at the start of each section, so the section reads on its own.
+        Sections with nothing under their heading are left out, their heading
+        lives on in the sections below it.
+
+        Args:
+            md_file: Path to the Markdown file to read, can be a string path, Path object, or file-like object.
+            source: Path of the file in its knowledge base, recorded in meta_data["source"] and the ids.
+
+        Returns:
+            Section Documents with the heading path in meta_data["headings"] and the
+            stable section id in meta_data["section_id"].
         """
-        Read a Markdown file and convert it to a list of Documents.
+        document = self.read_document(md_file)
+        doc_name = document.name
+        documents: List[Document] = []
+        seen: Dict[str, int] = {}
+        for path, text in self.split_sections(document.content):
+            # What is under the heading line
+            body = text.partition("\n")[2].strip() if path else text
+            if not body:
+                continue
+            section_id = "/".join(_slug(heading) for heading in path) or "_preamble"
+            # Repeated heading paths (e.g. two "Notes" sections) are numbered in document order
+            seen[section_id] = seen.get(section_id, 0) + 1
+            if seen[section_id] > 1:
+                section_id = f"{section_id}-{seen[section_id]}"
+            breadcrumb = "".join(f"{'#' * (level + 1)} {heading}\n" for level, heading in enumerate(path[:-1]))
+            meta_data: Dict[str, Any] = {
+                "file": doc_name,
+                "section_id": section_id,
+                "headings": path,
+                "heading_path": " > ".join(path),
+            }
+            if source is not None:
+                meta_data["source"] = source
+            documents.append(Document(
+                name=doc_name,
+                id=f"{source or doc_name}_{section_id}",
+                meta_data=meta_data,
+                content=breadcrumb + text,
+            ))
+        return documents
+
+    def read_document(self, md_file: Union[str, Path, IO[Any]]) -> Document:
+        """
+        Read a Markdown file into a single, unchunked Document.
         
         Args:
             md_file: Path to the Markdown file to read, can be a string path, Path object, or file-like object.
             
         Returns:
-            A list of Document objects containing the Markdown content.
+            A Document object containing the whole Markdown content.
         """
         if isinstance(md_file, str) and not os.path.exists(md_file):
             raise FileNotFoundError(f"Markdown file not found: {md_file}")
         
         try:
             # Get document name for metadata
-            if isinstance(md_file, str):
-                doc_name = os.path.basename(md_file).split(".")[0].replace(" ", "_")
-            elif isinstance(md_file, Path):
-                doc_name = md_file.name.split(".")[0].replace(" ", "_")
-            else:
-                doc_name = getattr(md_file, 'name', 'md').split(".")[0].replace(" ", "_")
-                
+            doc_name = self.get_doc_name(md_file)
+
             # Read the Markdown file
             if isinstance(md_file, (str, Path)):
                 with open(md_file, 'r', encoding='utf-8') as f:
@@ -43,24 +141,34 @@ class MDReader(Reader):
                     content = content.decode('utf-8')
             
             # Create a Document object for the markdown content
-            document = Document(
+            return Document(
                 name=doc_name,
                 id=f"{doc_name}_content",
                 meta_data={"file": doc_name},
                 content=content
             )
-            
-            documents = [document]
-            
-            # Chunk the documents if needed
-            if self.chunk:
-                return self._build_chunked_documents(documents)
-            
-            return documents
         
         except Exception as e:
             raise Exception(f"Failed to read Markdown file: {str(e)}")
 
+    def read(self, md_file: Union[str, Path, IO[Any]]) -> List[Document]:
+        """
+        Read a Markdown file and convert it to a list of Documents, one or more per section.
+        
+        Args:
+            md_file: Path to the Markdown file to read, can be a string path, Path object, or file-like object.
+            
+        Returns:
+            A list of Document objects containing the Markdown content.
+        """
+        documents = self.read_sections(md_file)
+        
+        # Chunk the documents if needed
+        if self.chunk:
+            return self._build_chunked_documents(documents)
+        
+        return documents
+
     def _build_chunked_documents(self, documents: List[Document]) -> List[Document]:
         """Helper method to chunk a list of documents"""
         chunked_documents: List[Document] = []
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+
+from agno.utils.log import log_debug, logger
+from custom.knowledge.manifest import hash_file
+
+_MAGIC = b"PGTXT1\0\0"
+_HEADER_LENGTH = struct.Struct("<I")
+
+
+class PageTextCache:
+    """
+    On-disk cache of the text PyMuPDF extracts from each page of a PDF.
+
+    One cache file per PDF, named after its absolute path:
+
+        magic | header length | JSON header | zlib block of page 1 | page 2 | ...
+
+    The header records the size, mtime and content hash of the PDF, the PyMuPDF
+    version and the offset of every page block. An entry is used when size and
+    mtime match, or else when the content hash does (e.g. after a copy or a
+    touch), and never across PyMuPDF versions. Pages are compressed one by one,
+    so a hit reads them lazily from a memory map of the cache file, in page
+    order, without decompressing the whole file.
+
+    Entries are written once a file was fully extracted, atomically, so
+    concurrent readers and interrupted extractions never see partial entries.
+    When max_bytes is set, the least recently used entries are removed past it.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 0, compression_level: int = 6):
+        """
+        Args:
+            directory: Directory of the cache files, created if missing.
+            max_bytes: Size limit of the cache directory, 0 for no limit.
+            compression_level: zlib level of the page blocks.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, pdf: Path) -> Path:
+        digest = hashlib.sha256(os.fsencode(pdf.resolve())).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.pages"
+
+    @staticmethod
+    def _read_header(data: Any) -> Tuple[Dict[str, Any], int]:
+        """Header and offset of the first page block, from bytes or a memory map"""
+        if data[: len(_MAGIC)] != _MAGIC:
+            raise ValueError("not a page text cache file")
+        start = len(_MAGIC) + _HEADER_LENGTH.size
+        (length,) = _HEADER_LENGTH.unpack(data[len(_MAGIC): start])
+        return json.loads(bytes(data[start: start + length])), start + length
+
+    def get(self, pdf: Union[str, Path]) -> Optional[Iterator[Tuple[int, str]]]:
+        """
+        Look up the pages of a PDF.
+
+        Args:
+            pdf: Path of the PDF file.
+
+        Returns:
+            Iterator of (page number, page text) tuples in page order, or None on a miss.
+        """
+        pdf = Path(pdf)
+        entry_path = self._entry_path(pdf)
+        try:
+            stat = pdf.stat()
+            with open(entry_path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Missing entry, or an empty file that cannot be mapped
+            return self._miss(pdf)
+
+        try:
+            header, body = self._read_header(data)
+            if header.get("extractor") != fitz.VersionBind:
+                data.close()
+                return self._miss(pdf)
+            if header["size"] != stat.st_size or header["mtime_ns"] != stat.st_mtime_ns:
+                if header["size"] != stat.st_size or header["hash"] != hash_file(pdf):
+                    data.close()
+                    return self._miss(pdf)
+                # Same content, new mtime: record it so the next lookup takes the fast path
+                try:
+                    self._write(entry_path, self._header(pdf, stat, header["hash"], header["pages"]), data[body:])
+                except OSError as e:
+                    log_debug(f"Could not refresh page text cache entry {entry_path}: {e}")
+        except (ValueError, KeyError) as e:
+            data.close()
+            logger.warning(f"Ignoring unreadable page text cache entry {entry_path}: {e}")
+            return self._miss(pdf)
+
+        with self._lock:
+            self.hits += 1
+        with suppress(OSError):
+            # Recently used entries are pruned last
+            os.utime(entry_path)
+        log_debug(f"Page text cache hit for {pdf}")
+        return self._iter_pages(data, body, header["pages"])
+
+    def _miss(self, pdf: Path) -> None:
+        with self._lock:
+            self.misses += 1
+        log_debug(f"Page text cache miss for {pdf}")
+        return None
+
+    @staticmethod
+    def _iter_pages(data: mmap.mmap, body: int, pages: List[List[int]]) -> Iterator[Tuple[int, str]]:
+        try:
+            for page, offset, length in pages:
+                start = body + offset
+                yield page, zlib.decompress(data[start: start + length]).decode("utf-8", errors="surrogatepass")
+        finally:
+            data.close()
+
+    def record(self, pdf: Union[str, Path], pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        """
+        Pass the extracted pages of a PDF through, caching them once all were read.
+
+        Nothing is cached when the iteration stops early or the PDF changed while it was read.
+
+        Args:
+            pdf: Path of the PDF file.
+            pages: (page number, page text) tuples being extracted from it.
+
+        Returns:
+            The same pages.
+        """
+        pdf = Path(pdf)
+        stat = pdf.stat()
+        blocks: List[bytes] = []
+        index: List[List[int]] = []
+        offset = 0
+        for page, text in pages:
+            block = zlib.compress(text.encode("utf-8", errors="surrogatepass"), self.compression_level)
+            blocks.append(block)
+            index.append([page, offset, len(block)])
+            offset += len(block)
+            yield page, text
+
+        try:
+            after = pdf.stat()
+            if (after.st_size, after.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                return
+            self._write(self._entry_path(pdf), self._header(pdf, stat, hash_file(pdf), index), b"".join(blocks))
+            self._prune()
+        except OSError as e:
+            logger.warning(f"Could not cache the page text of {pdf}: {e}")
+
+    @staticmethod
+    def _header(pdf: Path, stat: os.stat_result, file_hash: str, pages: List[List[int]]) -> Dict[str, Any]:
+        return {
+            "path": str(pdf.resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": file_hash,
+            "extractor": fitz.VersionBind,
+            "pages": pages,
+        }
+
+    @staticmethod
+    def _write(entry_path: Path, header: Dict[str, Any], body: bytes) -> None:
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        tmp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC + _HEADER_LENGTH.pack(len(encoded)) + encoded)
+            f.write(body)
+        os.replace(tmp_path, entry_path)
+
+    def _prune(self) -> None:
+        if not self.max_bytes:
+            return
+        entries = []
+        for path in self.directory.glob("*/*.pages"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
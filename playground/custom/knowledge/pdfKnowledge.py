@@ -1,20 +1,29 @@
+import asyncio
+from contextlib import nullcontext
 from pathlib import Path
-from typing import AsyncIterator, Iterator, List, Union
-
-from pydantic import Field
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from agno.document import Document
-from agno.knowledge.agent import AgentKnowledge
+from agno.utils.log import log_debug, log_info, logger
+from custom.knowledge.incrementalKnowledge import IncrementalKnowledgeBase
+from custom.knowledge.ingestionPipeline import IngestionPipeline, PipelineStats
+from custom.knowledge.manifest import KnowledgeManifest, hash_text
 from custom.knowledge.pdfReader import PDFReader
 
 
-class PDFKnowledgeBase(AgentKnowledge):
-    path: Union[str, Path]
-
-    exclude_files: List[str] = Field(default_factory=list)
+class PDFKnowledgeBase(IncrementalKnowledgeBase):
+    """Knowledge base of PDF files; incremental loads re-process the changed pages of changed files"""
 
     reader: PDFReader = PDFReader()
 
+    # Read files page by page and write them in batches of batch_size, so memory
+    # stays flat however large a PDF is and writes start before a file is fully read
+    streaming: bool = True
+    batch_size: int = 100
+
+    def _files(self) -> Iterator[Path]:
+        return self._files_with_suffix(".pdf")
+
     @property
     def document_lists(self) -> Iterator[List[Document]]:
         """Iterate over PDFs and yield lists of documents.
@@ -23,18 +32,12 @@ class PDFKnowledgeBase(AgentKnowledge):
         Returns:
             Iterator[List[Document]]: Iterator yielding list of documents
         """
-
-        _pdf_path: Path = Path(self.path) if isinstance(self.path, str) else self.path
-
-        if _pdf_path.exists() and _pdf_path.is_dir():
-            for _pdf in _pdf_path.glob("**/*.pdf"):
-                if _pdf.name in self.exclude_files:
-                    continue
-                yield self.reader.read(pdf=_pdf)
-        elif _pdf_path.exists() and _pdf_path.is_file() and _pdf_path.suffix == ".pdf":
-            if _pdf_path.name in self.exclude_files:
-                return
-            yield self.reader.read(pdf=_pdf_path)
+        if self.streaming:
+            with self.reader.shared_pool():
+                for _pdf in self._files():
+                    yield from self.reader.iter_batches(_pdf, batch_size=self.batch_size)
+            return
+        yield from self.reader.read_many(list(self._files()))
 
     @property
     async def async_document_lists(self) -> AsyncIterator[List[Document]]:
@@ -44,15 +47,271 @@ class PDFKnowledgeBase(AgentKnowledge):
         Returns:
             Iterator[List[Document]]: Iterator yielding list of documents
         """
+        # Advance the (possibly process-pool backed) reader off the event loop
+        document_lists = self.document_lists
+        while True:
+            document_list = await asyncio.to_thread(next, document_lists, None)
+            if document_list is None:
+                break
+            yield document_list
+
+    def _changed_page_documents(
+        self,
+        manifest: KnowledgeManifest,
+        key: str,
+        pages: Iterable[Tuple[int, str]],
+        changed_file: Tuple[Path, str, Any],
+    ) -> Iterator[Document]:
+        """Yield the (unchunked) documents of the changed pages of a file, deleting the rows they replace.
+
+        When chunks span pages, or the file was chunked with other settings, every
+        page of the file is yielded and all its rows are replaced.
+
+        Once all pages are consumed the file's manifest entry is updated, but not saved.
+        """
+        _pdf, file_hash, stat = changed_file
+        entry = manifest.get(key)
+        signature = self._chunking_signature
+
+        doc_name = self.reader.get_doc_name(_pdf)
+        rechunk = self.reader.chunks_across_pages or (
+            entry is not None and (entry.get("chunking") != signature or "source" not in entry)
+        )
+        if entry is None or rechunk:
+            self._delete_file_rows(key, doc_name)
+            # Also clears rows left behind by loads that did not track a manifest or the source file
+            self._delete_unsourced_rows(doc_name)
+            entry = None
+
+        old_pages: Dict[str, str] = entry["pages"] if entry else {}
+        new_pages: Dict[str, str] = {}
+        for page, content in pages:
+            page_hash = hash_text(content)
+            new_pages[str(page)] = page_hash
+            if old_pages.get(str(page)) == page_hash:
+                continue
+            if str(page) in old_pages:
+                # The page may now have fewer chunks, drop the stale ones
+                self._delete_file_rows(key, doc_name, meta_data={"page": page})
+            yield self.reader.build_page_document(doc_name, page, content, source=key)
+
+        for page in old_pages.keys() - new_pages.keys():
+            self._delete_file_rows(key, doc_name, meta_data={"page": int(page)})
+
+        new_entry = {
+            "name": doc_name,
+            "source": key,
+            "hash": file_hash,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "pages": new_pages,
+        }
+        if signature is not None:
+            new_entry["chunking"] = signature
+        manifest.set(key, new_entry)
+
+    def _pipeline_read(self, page_documents: Iterator[Document]) -> Iterator[Document]:
+        # Chunks spanning pages need the page stream of the whole file, so they are built while reading
+        if self.reader.chunks_across_pages:
+            return self.reader.chunk_pages(page_documents)
+        return page_documents
+
+    def _pipeline_chunk(self, document: Document) -> List[Document]:
+        if self.reader.chunks_across_pages:
+            return [document]
+        return self._chunk(document)
+
+    def _deferred_indexes(self, recreate: bool):
+        """Defer ANN index builds until the end of a full reload, when the vector db supports it"""
+        if recreate and hasattr(self.vector_db, "deferred_indexes"):
+            return self.vector_db.deferred_indexes()
+        return nullcontext()
+
+    def load(
+        self,
+        recreate: bool = False,
+        upsert: bool = False,
+        skip_existing: bool = True,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Load the knowledge base to the vector db, re-processing only what changed.
+
+        Unchanged files (same size/mtime or same file hash) are not opened at all.
+        For changed files every page is hashed and only the changed pages are
+        chunked, embedded and written. Rows of deleted files and pages are removed.
+        In streaming mode pages are read one at a time and written every batch_size documents.
+
+        Args:
+            recreate (bool): If True, recreates the collection in the vector db. Defaults to False.
+            upsert (bool): If True, upserts documents to the vector db. Defaults to False.
+            skip_existing (bool): Only used for non-incremental loads. Defaults to True.
+            filters (Optional[Dict[str, Any]]): Filters to add to each row that can be used to limit results during querying. Defaults to None.
+        """
+        with self._deferred_indexes(recreate):
+            self._load(recreate=recreate, upsert=upsert, skip_existing=skip_existing, filters=filters)
+
+    def _load(
+        self,
+        recreate: bool,
+        upsert: bool,
+        skip_existing: bool,
+        filters: Optional[Dict[str, Any]],
+    ) -> None:
+        if not self.incremental or self.vector_db is None or not hasattr(self.vector_db, "delete_documents"):
+            if self.incremental and self.vector_db is not None:
+                logger.warning("Vector db does not support deleting documents, falling back to a full load")
+            return super().load(recreate=recreate, upsert=upsert, skip_existing=skip_existing, filters=filters)
+
+        manifest = self._prepare_load(recreate)
+
+        log_info("Loading knowledge base")
+        changed, seen_keys = self._find_changed_files(manifest)
+        self._load_changed(manifest, changed, upsert=upsert, filters=filters)
+        self._finish_load(manifest, set(manifest.keys()) - seen_keys)
+
+    def load_files(self, paths: Iterable[Union[str, Path]], filters: Optional[Dict[str, Any]] = None) -> None:
+        """Incrementally index only the given files, e.g. those a file watcher reported.
+
+        Added and modified files are loaded like in load(), only their changed pages
+        are re-processed. The vectors of given files (or directories) that no longer
+        exist are removed. Other files of the knowledge base are not looked at.
+
+        Args:
+            paths: Changed files or directories inside the knowledge base path.
+            filters (Optional[Dict[str, Any]]): Filters to add to each row that can be used to limit results during querying. Defaults to None.
+        """
+        if self.vector_db is None or not hasattr(self.vector_db, "delete_documents"):
+            raise ValueError("Indexing single files needs a vector db that can delete documents")
+
+        manifest = self._prepare_load(recreate=False)
+        files: List[Path] = []
+        removed_keys: Set[str] = set()
+        for path in map(Path, paths):
+            if path.is_file():
+                if path.suffix == ".pdf" and path.name not in self.exclude_files:
+                    files.append(path)
+            elif not path.exists():
+                # A removed directory takes all the files below it
+                key = self._manifest_key(path)
+                removed_keys.update(k for k in manifest.keys() if k == key or k.startswith(key + "/"))
+
+        changed, _ = self._find_changed_files(manifest, files)
+        self._load_changed(manifest, changed, upsert=True, filters=filters)
+        self._finish_load(manifest, removed_keys)
+
+    def _load_changed(
+        self,
+        manifest: KnowledgeManifest,
+        changed: Dict[str, Any],
+        upsert: bool,
+        filters: Optional[Dict[str, Any]],
+    ) -> None:
+        num_documents = 0
+        changed_pdfs = [_pdf for _pdf, _, _ in changed.values()]
+        if self.streaming:
+            file_pages = ((_pdf, self.reader.stream_pages(_pdf)) for _pdf in changed_pdfs)
+        else:
+            file_pages = self.reader.iter_file_pages(changed_pdfs)
+        with self.reader.shared_pool():
+            for _pdf, pages in file_pages:
+                key = self._manifest_key(_pdf)
+                documents: List[Document] = []
+                num_file_documents = 0
+                page_documents = self._changed_page_documents(manifest, key, pages, changed[key])
+                for document in self.reader.chunk_pages(page_documents):
+                    documents.append(document)
+                    if self.streaming and len(documents) >= self.batch_size:
+                        # Upsert, as an interrupted load may have written part of this file already
+                        self._write_documents(documents, upsert=True, filters=filters)
+                        num_file_documents += len(documents)
+                        documents = []
+
+                self._write_documents(documents, upsert=upsert or self.streaming, filters=filters)
+                num_file_documents += len(documents)
+                num_documents += num_file_documents
+                log_info(f"Added {num_file_documents} documents from '{key}' to knowledge base")
+                manifest.save()
+        log_debug(f"Incremental load wrote {num_documents} documents")
+
+    async def aload_pipeline(
+        self,
+        pipeline: Optional[IngestionPipeline] = None,
+        recreate: bool = False,
+        upsert: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> PipelineStats:
+        """Load the knowledge base through the concurrent ingestion pipeline.
+
+        Reading, chunking, embedding and writing overlap, with bounded queues in
+        between. Like load(), only changed pages are re-processed when incremental.
+
+        Args:
+            pipeline (Optional[IngestionPipeline]): Pipeline to use, defaults to one with batch_size batches.
+            recreate (bool): If True, recreates the collection in the vector db. Defaults to False.
+            upsert (bool): If True, upserts documents to the vector db. Only used for non-incremental loads.
+            filters (Optional[Dict[str, Any]]): Filters to add to each row that can be used to limit results during querying. Defaults to None.
+
+        Returns:
+            PipelineStats: Per-stage throughput and queue depth.
+        """
+        with self._deferred_indexes(recreate), self.reader.shared_pool():
+            return await self._aload_pipeline(pipeline=pipeline, recreate=recreate, upsert=upsert, filters=filters)
+
+    async def _aload_pipeline(
+        self,
+        pipeline: Optional[IngestionPipeline],
+        recreate: bool,
+        upsert: bool,
+        filters: Optional[Dict[str, Any]],
+    ) -> PipelineStats:
+        if self.vector_db is None:
+            raise ValueError("No vector db provided")
+        pipeline = pipeline or IngestionPipeline(batch_size=self.batch_size)
+        embed = getattr(self.vector_db, "embed_documents", None) or (
+            lambda documents: [document.embed(embedder=self.vector_db.embedder) for document in documents]
+        )
+
+        if not self.incremental or not hasattr(self.vector_db, "delete_documents"):
+            if recreate:
+                log_info("Dropping collection")
+                await asyncio.to_thread(self.vector_db.drop)
+            if not self.vector_db.exists():
+                log_info("Creating collection")
+                await asyncio.to_thread(self.vector_db.create)
+
+            def read_file(_pdf: Path) -> Iterator[Document]:
+                doc_name = self.reader.get_doc_name(_pdf)
+                page_documents = (
+                    self.reader.build_page_document(doc_name, page, content)
+                    for page, content in self.reader.stream_pages(_pdf)
+                )
+                return self._pipeline_read(page_documents)
+
+            return await pipeline.run(
+                sources=list(self._files()),
+                read=read_file,
+                chunk=self._pipeline_chunk,
+                embed=embed,
+                write=lambda documents: self._write_documents(documents, upsert=upsert, filters=filters),
+            )
+
+        manifest = await asyncio.to_thread(self._prepare_load, recreate)
+        changed, seen_keys = await asyncio.to_thread(self._find_changed_files, manifest)
+
+        def read_changed(key: str) -> Iterator[Document]:
+            _pdf = changed[key][0]
+            page_documents = self._changed_page_documents(manifest, key, self.reader.stream_pages(_pdf), changed[key])
+            return self._pipeline_read(page_documents)
 
-        _pdf_path: Path = Path(self.path) if isinstance(self.path, str) else self.path
-
-        if _pdf_path.exists() and _pdf_path.is_dir():
-            for _pdf in _pdf_path.glob("**/*.pdf"):
-                if _pdf.name in self.exclude_files:
-                    continue
-                yield await self.reader.async_read(pdf=_pdf)
-        elif _pdf_path.exists() and _pdf_path.is_file() and _pdf_path.suffix == ".pdf":
-            if _pdf_path.name in self.exclude_files:
-                return
-            yield await self.reader.async_read(pdf=_pdf_path)
+        stats = await pipeline.run(
+            sources=list(changed),
+            read=read_changed,
+            chunk=self._pipeline_chunk,
+            embed=embed,
+            # Upsert, as an interrupted load may have written part of a file already
+            write=lambda documents: self._write_documents(documents, upsert=True, filters=filters),
+        )
+        # Only record the files once all their documents are written
+        manifest.save()
+        await asyncio.to_thread(self._finish_load, manifest, set(manifest.keys()) - seen_keys)
+        return stats
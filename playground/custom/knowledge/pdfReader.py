@@ -1,83 +1,347 @@
 from agno.document.reader.base import Reader
 from agno.document.base import Document
-from typing import List, Any, Union, IO
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Any, Optional, Sequence, Tuple, Union, IO
 import fitz  # PyMuPDF
 import os
 from pathlib import Path
 
+from custom.knowledge.crossPageChunking import CrossPageChunking
+from custom.knowledge.pageTextCache import PageTextCache
+
+
+def _page_count(pdf: str) -> int:
+    """Number of pages in a PDF, without extracting any text"""
+    doc = fitz.open(pdf)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def _extract_page_range(pdf: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract the text of pages [start, end) of a PDF. Runs inside the worker processes."""
+    doc = fitz.open(pdf)
+    try:
+        return [(page_num + 1, doc.load_page(page_num).get_text()) for page_num in range(start, end)]
+    finally:
+        doc.close()
+
 
 class PDFReader(Reader):
     """PDF reader that reads PDF documents from a file path"""
 
-    def __init__(self, chunk: bool = True, chunk_size: int = 3000, **kwargs):
+    def __init__(
+        self,
+        chunk: bool = True,
+        chunk_size: int = 3000,
+        num_workers: int = 1,
+        pages_per_task: int = 50,
+        page_cache: Optional[PageTextCache] = None,
+        **kwargs
+    ):
+        """
+        Args:
+            chunk: Whether to chunk the page documents.
+            chunk_size: Chunk size passed to the base reader.
+            num_workers: Number of processes used to extract text, 1 keeps extraction in-process.
+            pages_per_task: Page range size each worker task extracts, so large PDFs are split across workers.
+            page_cache: On-disk cache of extracted page text, files found in it are not parsed again.
+        """
         super().__init__(chunk=chunk, chunk_size=chunk_size, **kwargs)
+        self.num_workers = max(1, num_workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self.page_cache = page_cache
+        # Process pool shared by the files read inside shared_pool()
+        self._executor: Optional[ProcessPoolExecutor] = None
 
-    def read(self, pdf: Union[str, Path, IO[Any]]) -> List[Document]:
+    @contextmanager
+    def shared_pool(self) -> Iterator[Optional[ProcessPoolExecutor]]:
         """
-        Read a PDF file and convert it to a list of Documents.
-        
+        Share one process pool across all the files read inside the block.
+
+        Without it, each file read with num_workers > 1 starts a pool of its own.
+        Nested blocks reuse the outer pool.
+
+        Returns:
+            The pool, or None when num_workers is 1.
+        """
+        if self.num_workers <= 1 or self._executor is not None:
+            yield self._executor
+            return
+        with ProcessPoolExecutor(max_workers=self.num_workers) as executor:
+            self._executor = executor
+            try:
+                yield executor
+            finally:
+                self._executor = None
+
+    def get_doc_name(self, pdf: Union[str, Path, IO[Any]]) -> str:
+        """Get the document name used for ids and metadata"""
+        if isinstance(pdf, str):
+            return os.path.basename(pdf).split(".")[0].replace(" ", "_")
+        elif isinstance(pdf, Path):
+            return pdf.name.split(".")[0].replace(" ", "_")
+        else:
+            return getattr(pdf, 'name', 'pdf').split(".")[0].replace(" ", "_")
+
+    def iter_pages(self, pdf: Union[str, Path, IO[Any]]) -> Iterator[Tuple[int, str]]:
+        """
+        Iterate over the pages of a PDF file.
+
         Args:
             pdf: Path to the PDF file to read, can be a string path, Path object, or file-like object.
-            
+
         Returns:
-            A list of Document objects containing the PDF content.
+            Iterator of (page number starting at 1, page text) tuples.
         """
-        if isinstance(pdf, str) and not os.path.exists(pdf):
-            raise FileNotFoundError(f"PDF file not found: {pdf}")
-        
+        yield from self._through_cache(pdf, lambda: self._extract_pages(pdf))
+
+    def _through_cache(
+        self, pdf: Union[str, Path, IO[Any]], extract: Callable[[], Iterator[Tuple[int, str]]]
+    ) -> Iterator[Tuple[int, str]]:
+        """Pages from the page cache, or extracted with extract() and cached"""
+        if self.page_cache is None or not isinstance(pdf, (str, Path)):
+            yield from extract()
+            return
+        cached = self.page_cache.get(pdf)
+        yield from cached if cached is not None else self.page_cache.record(pdf, extract())
+
+    @staticmethod
+    def _extract_pages(pdf: Union[str, Path, IO[Any]]) -> Iterator[Tuple[int, str]]:
+        doc = fitz.open(pdf)
         try:
-            # Get document name for metadata
-            if isinstance(pdf, str):
-                doc_name = os.path.basename(pdf).split(".")[0].replace(" ", "_")
-            elif isinstance(pdf, Path):
-                doc_name = pdf.name.split(".")[0].replace(" ", "_")
-            else:
-                doc_name = getattr(pdf, 'name', 'pdf').split(".")[0].replace(" ", "_")
-                
-            # Open the PDF file
-            doc = fitz.open(pdf)
-            
-            documents = []
-            # Process each page and create a Document for it
             for page_num in range(len(doc)):
                 page = doc.load_page(page_num)
-                content = page.get_text()
-                
-                # Create a Document object for each page
-                document = Document(
-                    name=doc_name,
-                    id=f"{doc_name}_{page_num+1}",
-                    meta_data={"page": page_num+1},
-                    content=content
-                )
-                documents.append(document)
-            
-            # Close the PDF
+                yield page_num + 1, page.get_text()
+        finally:
             doc.close()
-            
-            # Chunk the documents if needed
-            if self.chunk:
-                return self._build_chunked_documents(documents)
-            
-            return documents
-        
+
+    def iter_file_pages(
+        self, pdfs: Sequence[Union[str, Path]]
+    ) -> Iterator[Tuple[Union[str, Path], List[Tuple[int, str]]]]:
+        """
+        Extract the pages of several PDF files, in parallel when num_workers > 1.
+
+        Files are split into page ranges of pages_per_task pages and spread over a
+        process pool. Results are yielded in the order of pdfs with pages in order,
+        so the output is the same as extracting serially.
+
+        Args:
+            pdfs: Paths of the PDF files to read.
+
+        Returns:
+            Iterator of (pdf, [(page number, page text), ...]) tuples.
+        """
+        if self.num_workers <= 1:
+            for pdf in pdfs:
+                yield pdf, list(self.iter_pages(pdf))
+            return
+
+        with self.shared_pool() as executor:
+            # Keep a bounded window of files in flight so results do not pile up in memory
+            # (pdf, futures of its page ranges, or [cached pages] when in the page cache)
+            pending: Deque[Tuple[Union[str, Path], List[Any]]] = deque()
+            max_pending = self.num_workers * 2
+            for pdf in pdfs:
+                cached = self.page_cache.get(pdf) if self.page_cache is not None else None
+                if cached is not None:
+                    # Yielded in turn, after the files submitted before it
+                    pending.append((pdf, [cached]))
+                else:
+                    num_pages = _page_count(str(pdf))
+                    futures = [
+                        executor.submit(_extract_page_range, str(pdf), start, min(start + self.pages_per_task, num_pages))
+                        for start in range(0, num_pages, self.pages_per_task)
+                    ]
+                    pending.append((pdf, futures))
+                while len(pending) >= max_pending:
+                    yield self._collect(pending.popleft())
+            while pending:
+                yield self._collect(pending.popleft())
+
+    def _collect(
+        self, item: Tuple[Union[str, Path], List[Any]]
+    ) -> Tuple[Union[str, Path], List[Tuple[int, str]]]:
+        pdf, parts = item
+        if parts and not isinstance(parts[0], Future):
+            # Served from the page cache
+            return pdf, list(parts[0])
+        pages: List[Tuple[int, str]] = []
+        for future in parts:
+            pages.extend(future.result())
+        if self.page_cache is not None:
+            pages = list(self.page_cache.record(pdf, pages))
+        return pdf, pages
+
+    def build_page_document(self, doc_name: str, page: int, content: str, source: Optional[str] = None) -> Document:
+        """Create the Document for a single page, of the file at path `source` when given"""
+        meta_data: Dict[str, Any] = {"page": page}
+        if source is not None:
+            meta_data["source"] = source
+        return Document(
+            name=doc_name,
+            id=f"{source or doc_name}_{page}",
+            meta_data=meta_data,
+            content=content
+        )
+
+    def chunk_document(self, document: Document) -> List[Document]:
+        chunks = super().chunk_document(document)
+        if not self.chunks_across_pages:
+            # Lets search tell the last chunk of a page, the one the next page continues
+            for chunk in chunks:
+                chunk.meta_data["page_chunks"] = len(chunks)
+        return chunks
+
+    @property
+    def chunks_across_pages(self) -> bool:
+        """Whether chunks are built from the whole page stream of a file rather than page by page"""
+        return self.chunk and isinstance(self.chunking_strategy, CrossPageChunking)
+
+    def chunk_pages(self, page_documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Chunk the page documents of one file, in page order.
+
+        Args:
+            page_documents: Documents built by build_page_document.
+
+        Returns:
+            Iterator of chunk Documents, or the page documents themselves when chunking is off.
+        """
+        if not self.chunk:
+            yield from page_documents
+        elif self.chunks_across_pages:
+            yield from self.chunking_strategy.chunk_pages(page_documents)
+        else:
+            for page_document in page_documents:
+                yield from self.chunk_document(page_document)
+
+    def stream_pages(self, pdf: Union[str, Path, IO[Any]]) -> Iterator[Tuple[int, str]]:
+        """
+        Iterate over the pages of a PDF file, keeping only a bounded number of pages in memory.
+
+        With num_workers > 1 page ranges of a file path are extracted by the process pool,
+        with at most num_workers * 2 ranges in flight. Files of a single page range are
+        extracted in-process. Read many files inside shared_pool(), so they share one pool.
+
+        Args:
+            pdf: Path to the PDF file to read, can be a string path, Path object, or file-like object.
+
+        Returns:
+            Iterator of (page number starting at 1, page text) tuples, in page order.
+        """
+        if self.num_workers <= 1 or not isinstance(pdf, (str, Path)):
+            yield from self.iter_pages(pdf)
+            return
+
+        yield from self._through_cache(pdf, lambda: self._extract_pages_parallel(pdf))
+
+    def _extract_pages_parallel(self, pdf: Union[str, Path]) -> Iterator[Tuple[int, str]]:
+        num_pages = _page_count(str(pdf))
+        if num_pages <= self.pages_per_task:
+            # One task: a worker process would only add the cost of shipping the text back
+            yield from self._extract_pages(pdf)
+            return
+        with self.shared_pool() as executor:
+            pending: Deque[Future] = deque()
+            max_pending = self.num_workers * 2
+            for start in range(0, num_pages, self.pages_per_task):
+                end = min(start + self.pages_per_task, num_pages)
+                pending.append(executor.submit(_extract_page_range, str(pdf), start, end))
+                while len(pending) >= max_pending:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def iter_documents(self, pdf: Union[str, Path, IO[Any]]) -> Iterator[Document]:
+        """
+        Read a PDF file page by page, yielding its (chunked) Documents as the pages are read.
+
+        Args:
+            pdf: Path to the PDF file to read, can be a string path, Path object, or file-like object.
+
+        Returns:
+            Iterator of Document objects, in page order.
+        """
+        if isinstance(pdf, str) and not os.path.exists(pdf):
+            raise FileNotFoundError(f"PDF file not found: {pdf}")
+
+        doc_name = self.get_doc_name(pdf)
+        try:
+            page_documents = (
+                self.build_page_document(doc_name, page, content) for page, content in self.stream_pages(pdf)
+            )
+            yield from self.chunk_pages(page_documents)
         except Exception as e:
             raise Exception(f"Failed to read PDF file: {str(e)}")
 
-    def _build_chunked_documents(self, documents: List[Document]) -> List[Document]:
-        """Helper method to chunk a list of documents"""
-        chunked_documents: List[Document] = []
-        for document in documents:
-            chunked_documents.extend(self.chunk_document(document))
-        return chunked_documents
+    def iter_batches(self, pdf: Union[str, Path, IO[Any]], batch_size: int = 100) -> Iterator[List[Document]]:
+        """
+        Read a PDF file page by page, yielding its Documents in lists of at most batch_size.
+
+        Memory use stays flat however large the PDF is, and the first batch can be
+        embedded and written while the rest of the file is still being read.
+
+        Args:
+            pdf: Path to the PDF file to read, can be a string path, Path object, or file-like object.
+            batch_size: Maximum number of Documents per batch.
+
+        Returns:
+            Iterator of Document lists.
+        """
+        batch: List[Document] = []
+        for document in self.iter_documents(pdf):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def read(self, pdf: Union[str, Path, IO[Any]]) -> List[Document]:
+        """
+        Read a PDF file and convert it to a list of Documents.
+
+        Args:
+            pdf: Path to the PDF file to read, can be a string path, Path object, or file-like object.
+
+        Returns:
+            A list of Document objects containing the PDF content.
+        """
+        return list(self.iter_documents(pdf))
+
+    def read_many(self, pdfs: Sequence[Union[str, Path]]) -> Iterator[List[Document]]:
+        """
+        Read several PDF files, extracting text in parallel when num_workers > 1.
+
+        Args:
+            pdfs: Paths of the PDF files to read.
+
+        Returns:
+            Iterator yielding the list of Documents of each file, in the order of pdfs.
+        """
+        for pdf in pdfs:
+            if isinstance(pdf, str) and not os.path.exists(pdf):
+                raise FileNotFoundError(f"PDF file not found: {pdf}")
+
+        try:
+            for pdf, pages in self.iter_file_pages(pdfs):
+                doc_name = self.get_doc_name(pdf)
+                documents = [self.build_page_document(doc_name, page, content) for page, content in pages]
+                yield list(self.chunk_pages(documents))
+        except Exception as e:
+            raise Exception(f"Failed to read PDF file: {str(e)}")
 
     async def async_read(self, pdf: Union[str, Path, IO[Any]]) -> List[Document]:
         """
         Asynchronously read a PDF file.
-        
+
         Args:
             pdf: Path to the PDF file to read.
-            
+
         Returns:
             A list of Document objects containing the PDF content.
         """
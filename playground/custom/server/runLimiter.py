@@ -0,0 +1,138 @@
+import re
+import signal
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Pattern
+
+# Streaming run endpoints of the Playground
+RUN_PATH = re.compile(r"^/v1/playground/(agents|teams|workflows)/[^/]+/runs/?$")
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class RunLimiter:
+    """
+    Per-process limit on concurrent runs.
+
+    A run counts as in flight from the request until its (streamed) response
+    has been sent completely. Requests over the limit, and every run request
+    while the process is draining, are shed with 503 + Retry-After instead of
+    queueing behind the runs already in flight.
+
+    The process drains from SIGTERM on when drain_on_sigterm was called; the
+    runs in flight are left to the server's graceful shutdown.
+    """
+
+    def __init__(self, max_concurrent: int = 0, retry_after: int = 5, path: Pattern[str] = RUN_PATH):
+        """
+        Args:
+            max_concurrent: Maximum runs in flight in this process, 0 for no limit.
+            retry_after: Seconds clients are told to wait before retrying a shed request.
+            path: Paths that count as runs; other requests are never limited.
+        """
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.path = path
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total = 0
+        self.shed = 0
+        self.draining = False
+
+    def try_acquire(self) -> bool:
+        # Only called from the event loop, so no lock is needed
+        if self.draining or (self.max_concurrent and self.in_flight >= self.max_concurrent):
+            self.shed += 1
+            return False
+        self.in_flight += 1
+        self.total += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    def start_draining(self) -> None:
+        """Shed every run request from now on"""
+        self.draining = True
+
+    def drain_on_sigterm(self, delay: float = 0.0) -> bool:
+        """
+        Start draining as soon as the process gets SIGTERM, before the server reacts to it.
+
+        The SIGTERM handler installed so far (the server's, which stops accepting
+        connections) is called delay seconds later, so load balancers polling a
+        readiness check that looks at draining stop routing here first.
+
+        Args:
+            delay: Seconds between draining and passing SIGTERM on to the server.
+
+        Returns:
+            False when not called from the main thread, the only one signals can be handled in.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return False
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def handle_sigterm(sig, frame) -> None:
+            self.start_draining()
+            if not callable(previous):
+                if previous == signal.SIG_DFL:
+                    signal.signal(sig, previous)
+                    signal.raise_signal(sig)
+                return
+            if delay > 0:
+                timer = threading.Timer(delay, previous, args=(sig, frame))
+                timer.daemon = True
+                timer.start()
+            else:
+                previous(sig, frame)
+
+        signal.signal(signal.SIGTERM, handle_sigterm)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "max_concurrent": self.max_concurrent,
+            "total": self.total,
+            "shed": self.shed,
+            "draining": self.draining,
+        }
+
+
+class RunLimitMiddleware:
+    """ASGI middleware applying a RunLimiter to run requests, streaming responses included"""
+
+    def __init__(self, app, limiter: Optional[RunLimiter] = None):
+        self.app = app
+        self.limiter = limiter or RunLimiter()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("method") != "POST" or not self.limiter.path.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        if not self.limiter.try_acquire():
+            await self._shed(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # The app returns once the last body chunk is sent, or when the client disconnects
+            self.limiter.release()
+
+    async def _shed(self, send: Send) -> None:
+        reason = b"draining" if self.limiter.draining else b"too many concurrent runs"
+        body = b'{"detail":"Server busy: ' + reason + b', retry later"}'
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(self.limiter.retry_after).encode()),
+        ]
+        if self.limiter.draining:
+            headers.append((b"connection", b"close"))
+        await send({"type": "http.response.start", "status": 503, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,501 @@
+import atexit
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from dataclasses import replace
+from typing import Any, Dict, List, Literal, Optional, Set
+
+from agno.storage.postgres import PostgresStorage
+from agno.storage.session import Session
+from agno.storage.session.agent import AgentSession
+from agno.utils.log import log_debug, log_info, log_warning, logger
+from custom.telemetry.telemetry import telemetry
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session as DbSession
+from sqlalchemy.schema import Column, Index, Table, UniqueConstraint
+from sqlalchemy.sql.expression import select, text
+from sqlalchemy.types import BigInteger, String
+
+# Sessions whose stored run keys are remembered, to append without reading them back first
+_KNOWN_SESSIONS = 1024
+
+
+def _run_key(run: Dict[str, Any]) -> str:
+    """Identity of a run: its run_id, or a hash of its content for runs without one"""
+    run_id = run.get("run_id")
+    if run_id:
+        return str(run_id)
+    return hashlib.sha256(json.dumps(run, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class AppendOnlyPostgresStorage(PostgresStorage):
+    """
+    Agent session storage that appends each run as a row of its own.
+
+    PostgresStorage keeps a session in one row, with every run and message of
+    the session in its memory column, and rewrites the whole row after each
+    run: the write grows with the session and every update leaves a dead tuple
+    as large as the session. Here the session row (table_name) only keeps the
+    header: ids, session and agent data, and the memory without its runs. Runs
+    go to "<table_name>-runs", one immutable row each, and an upsert inserts
+    only the runs that are not stored yet. Each write is one header update and
+    the new run, whatever the length of the session.
+
+    Sessions are reassembled on read: read() joins the header with the session's
+    run rows. get_all_sessions(), which serves the session lists of the
+    Playground, only attaches the first run of each session, enough for its
+    title; read() a session for all of its runs.
+
+    Tables written by PostgresStorage can be used as they are: runs still inline
+    in a header are read with the appended ones, and moved to run rows by the
+    next upsert of their session.
+
+    With write_behind, upsert() only queues the session and returns: a
+    background thread writes the queued sessions every flush_interval seconds,
+    several per transaction, keeping the database write off the run. Only the
+    latest state of a session is queued, and reads in this process see queued
+    sessions. Other processes see them after the flush, so keep the interval
+    well under the time between two messages of a user. close() (also run at
+    exit) writes what is queued.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        schema: Optional[str] = "ai",
+        db_url: Optional[str] = None,
+        db_engine: Optional[Engine] = None,
+        mode: Optional[Literal["agent", "team", "workflow"]] = "agent",
+        write_behind: bool = False,
+        flush_interval: float = 0.5,
+        max_batch_sessions: int = 50,
+    ):
+        """
+        Args:
+            table_name: Name of the session header table, runs go to "<table_name>-runs".
+            schema: The schema of the tables.
+            db_url: The database URL to connect to.
+            db_engine: The SQLAlchemy database engine to use.
+            mode: Only "agent" sessions are supported.
+            write_behind: Queue upserts and write them from a background thread.
+            flush_interval: Seconds between two writes of the queued sessions.
+            max_batch_sessions: Most sessions written in one transaction.
+        """
+        if mode not in (None, "agent"):
+            raise ValueError(f"AppendOnlyPostgresStorage only stores agent sessions, not {mode} sessions")
+        self.runs_table_name = f"{table_name}-runs"
+        super().__init__(table_name=table_name, schema=schema, db_url=db_url, db_engine=db_engine, mode="agent")
+        self.runs_table: Table = self.get_runs_table()
+
+        # session_id -> keys of its run rows, for the most recently used sessions
+        self._stored_runs: "OrderedDict[str, Set[str]]" = OrderedDict()
+        self._stored_lock = threading.Lock()
+
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.max_batch_sessions = max_batch_sessions
+        # Latest queued state of each session, in queue order
+        self._pending: "OrderedDict[str, AgentSession]" = OrderedDict()
+        # Sessions taken off the queue by the writer and not committed yet
+        self._in_flight: Dict[str, AgentSession] = {}
+        self._pending_cond = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+
+    def get_runs_table(self) -> Table:
+        return Table(
+            self.runs_table_name,
+            self.metadata,
+            # Insertion order is the order of the runs in their session
+            Column("id", BigInteger, primary_key=True, autoincrement=True),
+            Column("session_id", String, nullable=False),
+            Column("run_key", String, nullable=False),
+            Column("run", postgresql.JSONB),
+            Column("created_at", BigInteger, server_default=text("(extract(epoch from now()))::bigint")),
+            UniqueConstraint("session_id", "run_key", name=f"{self.runs_table_name}-session-run-key"),
+            Index(f"{self.runs_table_name}-session-id-idx", "session_id", "id"),
+            extend_existing=True,
+            schema=self.schema,  # type: ignore
+        )
+
+    def create(self) -> None:
+        """Create the header and run tables if they do not exist"""
+        super().create()
+        try:
+            self.runs_table.create(self.db_engine, checkfirst=True)
+        except Exception as e:
+            logger.error(f"Could not create table: '{self.runs_table.fullname}': {e}")
+            raise
+
+    # -*- Reads
+
+    def _remember_runs(self, session_id: str, keys: Set[str]) -> None:
+        with self._stored_lock:
+            self._stored_runs[session_id] = keys
+            self._stored_runs.move_to_end(session_id)
+            while len(self._stored_runs) > _KNOWN_SESSIONS:
+                self._stored_runs.popitem(last=False)
+
+    def _queued(self, session_id: str) -> Optional[AgentSession]:
+        with self._pending_cond:
+            session = self._pending.get(session_id) or self._in_flight.get(session_id)
+        # Callers take run dicts apart (RunResponse.from_dict pops their messages), the queued ones are still to be written
+        return deepcopy(session) if session is not None else None
+
+    @staticmethod
+    def _assemble(header: AgentSession, runs: List[Dict[str, Any]]) -> AgentSession:
+        memory = dict(header.memory or {})
+        # Runs of sessions last written by PostgresStorage are still inline
+        inline = memory.get("runs") or []
+        inline_keys = {_run_key(run) for run in inline}
+        memory["runs"] = list(inline) + [run for run in runs if _run_key(run) not in inline_keys]
+        return replace(header, memory=memory)
+
+    def read(self, session_id: str, user_id: Optional[str] = None, create_and_retry: bool = True) -> Optional[Session]:
+        """
+        Read a session: its header and all of its runs.
+
+        Args:
+            session_id: ID of the session to read.
+            user_id: User ID to filter by.
+            create_and_retry: Create the tables and retry if they do not exist.
+
+        Returns:
+            The AgentSession, or None if not found.
+        """
+        queued = self._queued(session_id)
+        if queued is not None and (not user_id or queued.user_id == user_id):
+            return queued
+        try:
+            with self.Session() as sess:
+                stmt = select(self.table).where(self.table.c.session_id == session_id)
+                if user_id:
+                    stmt = stmt.where(self.table.c.user_id == user_id)
+                row = sess.execute(stmt).fetchone()
+                if row is None:
+                    return None
+                rows = sess.execute(
+                    select(self.runs_table.c.run_key, self.runs_table.c.run)
+                    .where(self.runs_table.c.session_id == session_id)
+                    .order_by(self.runs_table.c.id)
+                ).fetchall()
+        except Exception as e:
+            if "does not exist" not in str(e):
+                log_debug(f"Exception reading from table: {e}")
+                return None
+            log_debug(f"Table does not exist: {self.table.name} or {self.runs_table.name}")
+            self.create()
+            # The header table may exist already, written by PostgresStorage
+            return self.read(session_id, user_id, create_and_retry=False) if create_and_retry else None
+
+        self._remember_runs(session_id, {run_key for run_key, _ in rows})
+        header = AgentSession.from_dict(row._mapping)
+        if header is None:
+            return None
+        return self._assemble(header, [run for _, run in rows])
+
+    def get_all_sessions(
+        self, user_id: Optional[str] = None, entity_id: Optional[str] = None, create_and_retry: bool = True
+    ) -> List[Session]:
+        """
+        Get all sessions, newest first, each with its first run only.
+
+        Args:
+            user_id: The ID of the user to filter by.
+            entity_id: The ID of the agent to filter by.
+            create_and_retry: Create the tables and retry if they do not exist.
+
+        Returns:
+            List of AgentSessions matching the criteria.
+        """
+        try:
+            with self.Session() as sess:
+                stmt = select(self.table)
+                if user_id is not None:
+                    stmt = stmt.where(self.table.c.user_id == user_id)
+                if entity_id is not None:
+                    stmt = stmt.where(self.table.c.agent_id == entity_id)
+                rows = sess.execute(stmt.order_by(self.table.c.created_at.desc())).fetchall()
+                session_ids = [row._mapping["session_id"] for row in rows]
+                first_runs: Dict[str, Dict[str, Any]] = {}
+                if session_ids:
+                    first = (
+                        select(self.runs_table.c.session_id, self.runs_table.c.run)
+                        .where(self.runs_table.c.session_id.in_(session_ids))
+                        .order_by(self.runs_table.c.session_id, self.runs_table.c.id)
+                        .distinct(self.runs_table.c.session_id)
+                    )
+                    first_runs = {session_id: run for session_id, run in sess.execute(first)}
+        except Exception as e:
+            if "does not exist" not in str(e):
+                log_debug(f"Exception reading from table: {e}")
+                return []
+            log_debug(f"Table does not exist: {self.table.name} or {self.runs_table.name}")
+            self.create()
+            return self.get_all_sessions(user_id, entity_id, create_and_retry=False) if create_and_retry else []
+
+        sessions: List[AgentSession] = []
+        for row in rows:
+            header = AgentSession.from_dict(row._mapping)
+            if header is None:
+                continue
+            first_run = first_runs.get(header.session_id)
+            session = self._assemble(header, [first_run] if first_run is not None else [])
+            session.memory["runs"] = session.memory["runs"][:1]  # type: ignore
+            sessions.append(session)
+        return self._with_queued(sessions, user_id, entity_id)
+
+    def _with_queued(
+        self, sessions: List[AgentSession], user_id: Optional[str], entity_id: Optional[str]
+    ) -> List[Session]:
+        """Replace listed sessions by their queued state and add queued new sessions"""
+        with self._pending_cond:
+            queued = {**self._in_flight, **self._pending}
+        if not queued:
+            return sessions  # type: ignore
+        by_id = {session.session_id: session for session in sessions}
+        listed: List[AgentSession] = []
+        for session_id, session in queued.items():
+            if user_id is not None and session.user_id != user_id:
+                continue
+            if entity_id is not None and session.agent_id != entity_id:
+                continue
+            memory = dict(session.memory or {})
+            memory["runs"] = deepcopy((memory.get("runs") or [])[:1])
+            stored = by_id.pop(session_id, None)
+            created_at = stored.created_at if stored is not None else session.created_at
+            listed.append(replace(session, memory=memory, created_at=created_at))
+        listed.extend(by_id.values())
+        listed.sort(key=lambda session: session.created_at or 0, reverse=True)
+        return listed  # type: ignore
+
+    # -*- Writes
+
+    def _stored_run_keys(self, sess: DbSession, session_id: str) -> Set[str]:
+        with self._stored_lock:
+            keys = self._stored_runs.get(session_id)
+            if keys is not None:
+                self._stored_runs.move_to_end(session_id)
+                return set(keys)
+        rows = sess.execute(
+            select(self.runs_table.c.run_key).where(self.runs_table.c.session_id == session_id)
+        ).fetchall()
+        return {run_key for (run_key,) in rows}
+
+    def _write(self, sess: DbSession, session: AgentSession) -> Set[str]:
+        """Upsert the header of a session and append its new runs, returning the keys of its stored runs"""
+        memory = dict(session.memory or {})
+        runs = memory.pop("runs", None) or []
+        header = dict(
+            agent_id=session.agent_id,
+            team_session_id=session.team_session_id,
+            user_id=session.user_id,
+            memory=memory,
+            agent_data=session.agent_data,
+            session_data=session.session_data,
+            extra_data=session.extra_data,
+        )
+        stmt = postgresql.insert(self.table).values(session_id=session.session_id, **header)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["session_id"],
+            set_=dict(header, updated_at=int(time.time())),
+        )
+        sess.execute(stmt)
+
+        stored = self._stored_run_keys(sess, session.session_id)
+        new_runs = []
+        for run in runs:
+            key = _run_key(run)
+            if key not in stored:
+                stored.add(key)
+                new_runs.append({"session_id": session.session_id, "run_key": key, "run": run})
+        if new_runs:
+            # A run is written once: concurrent writers of the same session append it once too
+            sess.execute(
+                postgresql.insert(self.runs_table).on_conflict_do_nothing(index_elements=["session_id", "run_key"]),
+                new_runs,
+            )
+        log_debug(f"Session {session.session_id}: header written, {len(new_runs)} of {len(runs)} runs appended")
+        return stored
+
+    def _write_sessions(self, sessions: List[AgentSession], create_and_retry: bool = True) -> None:
+        try:
+            with self.Session() as sess, sess.begin():
+                written = [(session.session_id, self._write(sess, session)) for session in sessions]
+        except Exception as e:
+            if create_and_retry and "does not exist" in str(e):
+                log_debug(f"Table does not exist: {self.table.name} or {self.runs_table.name}")
+                log_debug("Creating tables and retrying upsert")
+                self.create()
+                return self._write_sessions(sessions, create_and_retry=False)
+            # Run keys remembered for this transaction may not have been committed
+            with self._stored_lock:
+                for session in sessions:
+                    self._stored_runs.pop(session.session_id, None)
+            raise
+        for session_id, keys in written:
+            self._remember_runs(session_id, keys)
+
+    def upsert(self, session: Session, create_and_retry: bool = True) -> Optional[Session]:
+        """
+        Write the header of a session and append its runs that are not stored yet.
+
+        With write_behind, the session is queued instead and written by the background thread.
+
+        Args:
+            session: The AgentSession to write.
+            create_and_retry: Create the tables and retry if they do not exist.
+
+        Returns:
+            The session, or None if the write failed.
+        """
+        if self.write_behind and self._enqueue(session):  # type: ignore
+            return session
+        try:
+            self._write_sessions([session], create_and_retry=create_and_retry)  # type: ignore
+        except Exception as e:
+            log_warning(f"Exception upserting into table: {e}")
+            return None
+        return session
+
+    def delete_session(self, session_id: Optional[str] = None):
+        """Delete the header and the runs of a session"""
+        if session_id is None:
+            logger.warning("No session_id provided for deletion.")
+            return
+        with self._pending_cond:
+            self._pending.pop(session_id, None)
+        with self._stored_lock:
+            self._stored_runs.pop(session_id, None)
+        try:
+            with self.Session() as sess, sess.begin():
+                sess.execute(self.runs_table.delete().where(self.runs_table.c.session_id == session_id))
+                result = sess.execute(self.table.delete().where(self.table.c.session_id == session_id))
+                if result.rowcount == 0:
+                    log_debug(f"No session found with session_id: {session_id}")
+                else:
+                    log_debug(f"Successfully deleted session with session_id: {session_id}")
+        except Exception as e:
+            logger.error(f"Error deleting session: {e}")
+
+    def drop(self) -> None:
+        """Drop the header and run tables if they exist"""
+        self.runs_table.drop(self.db_engine, checkfirst=True)
+        metadata = self.metadata
+        super().drop()
+        if self.metadata is not metadata:
+            # PostgresStorage.drop() started a new MetaData for the header table
+            self.runs_table = self.get_runs_table()
+        with self._stored_lock:
+            self._stored_runs.clear()
+
+    # -*- Write-behind
+
+    def _enqueue(self, session: AgentSession) -> bool:
+        """Queue a session for the background thread, False once closed"""
+        # The memory is built for each write, session state and extra data are the agent's own and keep changing
+        session = replace(
+            session,
+            session_data=deepcopy(session.session_data),
+            extra_data=deepcopy(session.extra_data),
+            agent_data=deepcopy(session.agent_data),
+        )
+        with self._pending_cond:
+            if self._closed:
+                return False
+            self._pending[session.session_id] = session
+            self._pending.move_to_end(session.session_id)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_queued, name="session-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+                log_info(f"Writing sessions of {self.table_name} every {self.flush_interval}s in the background")
+            elif len(self._pending) >= self.max_batch_sessions:
+                self._pending_cond.notify_all()
+        return True
+
+    def _take_batch(self) -> List[AgentSession]:
+        batch: List[AgentSession] = []
+        while self._pending and len(batch) < self.max_batch_sessions:
+            session_id, session = self._pending.popitem(last=False)
+            self._in_flight[session_id] = session
+            batch.append(session)
+        return batch
+
+    def _write_queued(self) -> None:
+        while True:
+            with self._pending_cond:
+                if not self._closed and len(self._pending) < self.max_batch_sessions:
+                    self._pending_cond.wait(self.flush_interval)
+                batch = self._take_batch()
+                if not batch and self._closed:
+                    return
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                self._write_sessions(batch)
+                failed = False
+            except Exception as e:
+                logger.error(f"Could not write {len(batch)} queued sessions, retrying: {e}")
+                failed = True
+            telemetry.observe_stage("storage_flush", time.perf_counter() - start, agent="")
+            with self._pending_cond:
+                self._pending_cond.notify_all()
+                for session in batch:
+                    self._in_flight.pop(session.session_id, None)
+                    # Put failed sessions back, unless a newer state was queued meanwhile
+                    if failed and session.session_id not in self._pending:
+                        self._pending[session.session_id] = session
+                if failed and not self._closed:
+                    self._pending_cond.wait(max(self.flush_interval, 5.0))
+                elif failed:
+                    # Closing with the database down: give up rather than block the shutdown
+                    logger.error(f"Dropping {len(self._pending)} queued sessions of {self.table_name}")
+                    self._pending.clear()
+                    return
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the sessions queued so far are written.
+
+        Args:
+            timeout: Most seconds to wait, None to wait until done.
+
+        Returns:
+            True when nothing is left to write.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._pending_cond:
+            while self._pending or self._in_flight:
+                if self._writer is None or not self._writer.is_alive():
+                    return False
+                self._pending_cond.notify_all()
+                remaining = deadline - time.monotonic() if deadline is not None else 0.1
+                if remaining <= 0:
+                    return False
+                self._pending_cond.wait(min(remaining, 0.1))
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Write the queued sessions and stop the background thread; later upserts are written directly"""
+        with self._pending_cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending_cond.notify_all()
+            writer = self._writer
+        if writer is not None:
+            writer.join(timeout)
+            if writer.is_alive():
+                logger.warning(f"Sessions of {self.table_name} still being written after {timeout}s")
+
+    def __deepcopy__(self, memo):
+        # Copies share the tables, the queue and the background thread
+        memo[id(self)] = self
+        return self
@@ -0,0 +1,248 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from agno.utils.log import log_info, logger
+
+# Seconds; covers a cache lookup up to a long model generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 10, 20, 50)
+
+# Agent of the run being served, used as the agent label of everything measured inside it
+current_agent: contextvars.ContextVar[str] = contextvars.ContextVar("current_agent", default="")
+
+# (metric name, type, help, [(labels, value)]), produced by collectors at scrape time
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        names = self.labels + ("le",)
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                yield f"{self.name}_bucket{_format_labels(names, label_values + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {count}"
+
+
+class _NoopStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NOOP_STAGE = _NoopStage()
+
+
+class _Stage:
+    """Times one stage into the stage histogram, and into a trace span when tracing is on"""
+
+    __slots__ = ("telemetry", "name", "attributes", "start", "span")
+
+    def __init__(self, telemetry: "Telemetry", name: str, attributes: Dict[str, Any]):
+        self.telemetry = telemetry
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        if self.telemetry.tracer is not None:
+            self.span = self.telemetry.tracer.start_as_current_span(self.name, attributes=self.attributes)
+            self.span.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.start
+        self.telemetry.stage_seconds.observe(elapsed, self.name, current_agent.get())
+        if self.span is not None:
+            self.span.__exit__(*exc)
+        return None
+
+
+class Telemetry:
+    """
+    Hot-path metrics of the agent runs, rendered in the Prometheus text format.
+
+    Disabled until configure(enabled=True), which the app does unless
+    TELEMETRY_ENABLED is "false" (scripts that do not configure it stay
+    disabled). While disabled, stage() returns a shared no-op context manager
+    and the record methods return immediately, so instrumented code costs one
+    attribute check. Metrics live in process memory, so with several workers
+    each worker reports its own.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.tracer = None
+        self.stage_seconds = Histogram(
+            "playground_stage_seconds", "Time spent per run stage", ("stage", "agent")
+        )
+        self.time_to_first_token = Histogram(
+            "playground_time_to_first_token_seconds", "Time from run start to the first streamed content", ("agent",)
+        )
+        self.runs = Counter("playground_runs_total", "Agent runs", ("agent", "status"))
+        self.tokens = Counter("playground_tokens_total", "Model tokens", ("agent", "type"))
+        self.retrieved_documents = Histogram(
+            "playground_retrieved_documents", "Documents returned per knowledge search", ("agent",), COUNT_BUCKETS
+        )
+        self.cache_requests = Counter("playground_cache_requests_total", "Cache lookups", ("cache", "result"))
+        self.context_tokens_saved = Counter(
+            "playground_context_tokens_saved_total", "Prompt tokens saved by the context budget", ("agent", "context")
+        )
+        self._metrics = [
+            self.stage_seconds, self.time_to_first_token, self.runs, self.tokens,
+            self.retrieved_documents, self.cache_requests, self.context_tokens_saved,
+        ]
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def configure(self, enabled: bool, trace_endpoint: Optional[str] = None, service_name: str = "playground") -> None:
+        """
+        Turn metrics on or off, and export trace spans over OTLP/HTTP to trace_endpoint.
+
+        Trace export needs the optional opentelemetry-sdk and
+        opentelemetry-exporter-otlp-proto-http packages.
+        """
+        self.enabled = enabled
+        self.tracer = None
+        if enabled and trace_endpoint:
+            self.tracer = self._otlp_tracer(trace_endpoint, service_name)
+
+    @staticmethod
+    def _otlp_tracer(endpoint: str, service_name: str):
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError:
+            logger.warning(
+                "Trace export disabled: `pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http`"
+            )
+            return None
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        # Spans are exported in batches from a background thread, off the request path
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+        log_info(f"Exporting trace spans to {endpoint}")
+        return provider.get_tracer("playground")
+
+    def stage(self, name: str, **attributes: Any):
+        """Context manager timing a stage of the current run"""
+        if not self.enabled:
+            return _NOOP_STAGE
+        return _Stage(self, name, attributes)
+
+    def observe_stage(self, name: str, seconds: float, agent: Optional[str] = None) -> None:
+        """Record a stage timed elsewhere, e.g. model time reported in the run metrics"""
+        if self.enabled:
+            self.stage_seconds.observe(seconds, name, agent if agent is not None else current_agent.get())
+
+    def record_first_token(self, seconds: float) -> None:
+        if self.enabled:
+            self.time_to_first_token.observe(seconds, current_agent.get())
+
+    def record_run(self, status: str) -> None:
+        if self.enabled:
+            self.runs.inc(1, current_agent.get(), status)
+
+    def record_tokens(self, input_tokens: int, output_tokens: int) -> None:
+        if self.enabled:
+            agent = current_agent.get()
+            if input_tokens:
+                self.tokens.inc(input_tokens, agent, "input")
+            if output_tokens:
+                self.tokens.inc(output_tokens, agent, "output")
+
+    def record_retrieval(self, num_documents: int) -> None:
+        if self.enabled:
+            self.retrieved_documents.observe(num_documents, current_agent.get())
+
+    def record_cache(self, cache: str, hit: bool, count: int = 1) -> None:
+        if self.enabled and count:
+            self.cache_requests.inc(count, cache, "hit" if hit else "miss")
+
+    def record_context_saved(self, context: str, tokens: int) -> None:
+        if self.enabled and tokens > 0:
+            self.context_tokens_saved.inc(tokens, current_agent.get(), context)
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """Add a function producing gauges or counters at scrape time, e.g. connection pool usage"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                for name, metric_type, help, values in collector():
+                    lines.append(f"# HELP {name} {help}")
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    for labels, value in values:
+                        lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide instance used by the instrumented code
+telemetry = Telemetry()
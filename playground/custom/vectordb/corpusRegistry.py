@@ -0,0 +1,79 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+from sqlalchemy.inspection import inspect
+from sqlalchemy.schema import Column, MetaData, Table
+from sqlalchemy.sql.expression import func, select, text
+from sqlalchemy.types import DateTime, Integer, String
+
+from agno.utils.log import log_debug, logger
+
+
+class CorpusRegistry:
+    """
+    Registry of the corpora stored in shared knowledge tables.
+
+    Each corpus is ingested once into a shared table and every agent using it
+    reads a filtered view of that table. The registry records which table holds
+    a corpus, where it was loaded from and when.
+    """
+
+    def __init__(self, db_engine: Engine, schema: str = "ai", table_name: str = "knowledge_corpora"):
+        self.db_engine = db_engine
+        self.schema = schema
+        self.table_name = table_name
+        self.table = Table(
+            table_name,
+            MetaData(schema=schema),
+            Column("corpus", String, primary_key=True),
+            Column("table_name", String, nullable=False),
+            Column("source", String),
+            Column("document_count", Integer, server_default=text("0")),
+            Column("created_at", DateTime(timezone=True), server_default=func.now()),
+            Column("loaded_at", DateTime(timezone=True)),
+            extend_existing=True,
+        )
+
+    def create(self) -> None:
+        if not inspect(self.db_engine).has_table(self.table_name, schema=self.schema):
+            log_debug(f"Creating corpus registry: {self.table.fullname}")
+            with self.db_engine.begin() as conn:
+                conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {self.schema};"))
+            self.table.create(self.db_engine, checkfirst=True)
+
+    def register(self, corpus: str, table_name: str, source: Optional[str] = None) -> None:
+        """Register a corpus, updating its table and source if it already exists"""
+        self.create()
+        values: Dict[str, Any] = {"corpus": corpus, "table_name": table_name}
+        if source is not None:
+            values["source"] = source
+        stmt = postgresql.insert(self.table).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=["corpus"], set_={k: v for k, v in values.items() if k != "corpus"})
+        with self.db_engine.begin() as conn:
+            conn.execute(stmt)
+
+    def mark_loaded(self, corpus: str, document_count: int) -> None:
+        """Record that a corpus finished loading"""
+        try:
+            with self.db_engine.begin() as conn:
+                conn.execute(
+                    self.table.update()
+                    .where(self.table.c.corpus == corpus)
+                    .values(document_count=document_count, loaded_at=func.now())
+                )
+        except Exception as e:
+            logger.error(f"Error updating corpus registry for '{corpus}': {e}")
+
+    def get(self, corpus: str) -> Optional[Dict[str, Any]]:
+        with self.db_engine.connect() as conn:
+            row = conn.execute(select(self.table).where(self.table.c.corpus == corpus)).mappings().first()
+            return dict(row) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self.db_engine.connect() as conn:
+            return [dict(row) for row in conn.execute(select(self.table).order_by(self.table.c.corpus)).mappings()]
+
+    def __deepcopy__(self, memo):
+        # Only holds the engine and table definition, share it between copies
+        return self
@@ -0,0 +1,831 @@
+import json
+import math
+import time
+import weakref
+from contextlib import contextmanager
+from hashlib import md5
+from typing import Any, Dict, Iterator, List, Optional
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import bindparam, delete
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.expression import func, select, text
+from sqlalchemy.types import Float, String
+
+from agno.document import Document
+from agno.utils.log import log_debug, log_info, logger
+from agno.vectordb.distance import Distance
+from agno.vectordb.pgvector import HNSW, Ivfflat, PgVector as AgnoPgVector
+from agno.vectordb.search import SearchType
+from custom.telemetry.telemetry import telemetry
+from custom.vectordb.corpusRegistry import CorpusRegistry
+from custom.vectordb.searchPostProcessor import SearchPostProcessor
+
+# Columns written by bulk loads, with their types for binary COPY
+_COPY_COLUMNS = ("id", "name", "meta_data", "filters", "content", "embedding", "usage", "content_hash")
+_COPY_TYPES = ("text", "text", "jsonb", "jsonb", "text", "vector", "jsonb", "text")
+
+# pgvector distance operators, in the order the ANN index returns nearest rows
+_DISTANCE_OPERATORS = {Distance.l2: "<->", Distance.cosine: "<=>", Distance.max_inner_product: "<#>"}
+
+# Seconds before re-checking a table that had no stored tsvector column
+_TEXT_SEARCH_RECHECK_SECONDS = 60.0
+
+# psycopg connections the pgvector types are registered on
+_vector_connections: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+class PgVector(AgnoPgVector):
+    """PgVector with the extra table operations the knowledge bases need.
+
+    When a corpus is given the table is shared between corpora: every row is
+    tagged with {"corpus": corpus} in the filters column, and searches, counts,
+    deletes and drops only see that corpus. Each corpus gets its own partial ANN
+    index (WHERE filters @> '{"corpus": ...}'), so an index scan only visits the
+    rows of the corpus instead of returning ef_search rows of the whole table
+    and filtering them afterwards.
+
+    With bulk_load, inserts and upserts binary-COPY the rows into a temporary
+    staging table and merge them into the table with a single statement. With
+    defer_index_build, full reloads drop the ANN indexes and rebuild them once
+    the reload is done (see deferred_indexes).
+
+    The ANN index described by vector_index is managed with create_vector_index,
+    ensure_vector_index and index_report. Its query-time knobs (HNSW ef_search,
+    IVFFlat probes) are set per search, so each agent's PgVector can use its own.
+
+    Hybrid and keyword tables keep a stored, GIN-indexed content_tsv column.
+    Hybrid search takes the top hybrid_candidates rows from the vector index and
+    from the text index separately and fuses the two rankings with reciprocal
+    rank fusion: score = w / (rrf_k + vector rank) + (1 - w) / (rrf_k + keyword rank),
+    with w = vector_score_weight.
+
+    With a post_processor, search fetches a larger candidate pool and returns
+    the post-processor's selection of it (see SearchPostProcessor).
+    """
+
+    def __init__(
+        self,
+        *args,
+        corpus: Optional[str] = None,
+        bulk_load: bool = False,
+        defer_index_build: bool = False,
+        hybrid_candidates: int = 40,
+        rrf_k: int = 60,
+        post_processor: Optional[SearchPostProcessor] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.corpus: Optional[str] = corpus
+        self.bulk_load = bulk_load
+        self.defer_index_build = defer_index_build
+        # Report of the last vector index build, see create_vector_index
+        self.last_index_build: Optional[Dict[str, Any]] = None
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.post_processor = post_processor
+        # (checked_at, has content_tsv column), see _text_search_ready
+        self._text_search_checked: Optional[tuple] = None
+        self.corpus_registry: Optional[CorpusRegistry] = (
+            CorpusRegistry(db_engine=self.db_engine, schema=self.schema) if corpus else None
+        )
+
+    @property
+    def quoted_table_name(self) -> str:
+        """Schema-qualified, quoted table name for raw SQL (table names may contain '-')"""
+        return f'"{self.schema}"."{self.table_name}"'
+
+    def _scoped_filters(self, filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if self.corpus is None:
+            return filters
+        return {**(filters or {}), "corpus": self.corpus}
+
+    def _scope(self, stmt):
+        if self.corpus is None:
+            return stmt
+        return stmt.where(self.table.c.filters.contains({"corpus": self.corpus}))
+
+    @property
+    def _corpus_predicate(self) -> Optional[str]:
+        """
+        Predicate of the partial ANN index of the corpus, None when the table is not shared.
+
+        Searches repeat it literally: the planner only uses a partial index when
+        the query contains its predicate, which a bound parameter does not prove.
+        """
+        if self.corpus is None:
+            return None
+        corpus = json.dumps({"corpus": self.corpus}).replace("'", "''")
+        return f"filters @> '{corpus}'::jsonb"
+
+    @property
+    def _corpus_clause(self) -> str:
+        return f"AND {self._corpus_predicate} " if self.corpus is not None else ""
+
+    def _unscoped_filters(self, filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Filters without the corpus, for queries that scope with _corpus_clause"""
+        if self.corpus is None or filters is None:
+            return filters
+        # Repeating the corpus as a parameter makes the planner count it twice and misjudge the row estimate
+        return {k: v for k, v in filters.items() if k != "corpus"} or None
+
+    def create(self) -> None:
+        """Create the table if it does not exist, and register the corpus of a shared table"""
+        super().create()
+        self.ensure_text_search()
+        if self.corpus is not None:
+            with self.Session() as sess, sess.begin():
+                sess.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS "{self.table_name}_filters_gin_index" '
+                    f"ON {self.quoted_table_name} USING GIN (filters jsonb_path_ops);"
+                ))
+            self.corpus_registry.register(corpus=self.corpus, table_name=self.table_name)
+
+    def drop(self) -> None:
+        """Drop the table, or only the corpus rows when the table is shared"""
+        if self.corpus is None:
+            return super().drop()
+        if self.table_exists():
+            self.delete()
+
+    def delete(self) -> bool:
+        """Delete all records from the table, or only the corpus rows when the table is shared"""
+        if self.corpus is None:
+            return super().delete()
+        try:
+            with self.Session() as sess, sess.begin():
+                sess.execute(self._scope(delete(self.table)))
+            log_info(f"Deleted corpus '{self.corpus}' from table '{self.table.fullname}'.")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting corpus '{self.corpus}' from '{self.table.fullname}': {e}")
+            return False
+
+    def get_count(self) -> int:
+        """Get the number of records in the table, or in the corpus when the table is shared"""
+        if self.corpus is None:
+            return super().get_count()
+        try:
+            with self.Session() as sess, sess.begin():
+                stmt = self._scope(select(func.count(self.table.c.id)).select_from(self.table))
+                return int(sess.execute(stmt).scalar() or 0)
+        except Exception as e:
+            logger.error(f"Error getting count of corpus '{self.corpus}': {e}")
+            return 0
+
+    def _record_exists(self, column, value) -> bool:
+        try:
+            with self.Session() as sess, sess.begin():
+                stmt = self._scope(select(1).where(column == value)).limit(1)
+                return sess.execute(stmt).first() is not None
+        except Exception as e:
+            logger.error(f"Error checking if record exists: {e}")
+            return False
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Search the table, restricted to the corpus when the table is shared"""
+        with telemetry.stage("retrieval", search_type=self.search_type.value, table=self.table_name):
+            if self.post_processor is None or self.search_type == SearchType.keyword:
+                documents = super().search(query=query, limit=limit, filters=self._scoped_filters(filters))
+            else:
+                candidates = super().search(
+                    query=query, limit=self.post_processor.candidates(limit), filters=self._scoped_filters(filters)
+                )
+                with telemetry.stage("post_process"):
+                    documents = self.post_processor.process(candidates, limit)
+        telemetry.record_retrieval(len(documents))
+        return documents
+
+    @property
+    def text_search_index_name(self) -> str:
+        return f"{self.table_name}_content_tsv_gin_index"
+
+    def ensure_text_search(self) -> None:
+        """Add the stored content_tsv column and its GIN index to hybrid and keyword tables"""
+        if self.search_type not in (SearchType.hybrid, SearchType.keyword) or not self.table_exists():
+            return
+        language = self.content_language.replace("'", "''")
+        with self.Session() as sess, sess.begin():
+            sess.execute(text(
+                f"ALTER TABLE {self.quoted_table_name} ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('{language}'::regconfig, coalesce(content, ''))) STORED"
+            ))
+            sess.execute(text(
+                f'CREATE INDEX IF NOT EXISTS "{self.text_search_index_name}" '
+                f"ON {self.quoted_table_name} USING GIN (content_tsv)"
+            ))
+        self._text_search_checked = (time.monotonic(), True)
+
+    def _text_search_ready(self) -> bool:
+        """Whether the table has the stored content_tsv column, cached per instance"""
+        now = time.monotonic()
+        if self._text_search_checked is not None:
+            checked_at, ready = self._text_search_checked
+            if ready or now - checked_at < _TEXT_SEARCH_RECHECK_SECONDS:
+                return ready
+        try:
+            with self.Session() as sess, sess.begin():
+                ready = sess.execute(
+                    text(
+                        "SELECT 1 FROM information_schema.columns "
+                        "WHERE table_schema = :schema AND table_name = :table AND column_name = 'content_tsv'"
+                    ),
+                    {"schema": self.schema, "table": self.table_name},
+                ).first() is not None
+        except Exception as e:
+            logger.error(f"Error checking for the content_tsv column: {e}")
+            ready = False
+        if not ready:
+            log_debug(f"{self.quoted_table_name} has no content_tsv column, using unindexed text search")
+        self._text_search_checked = (now, ready)
+        return ready
+
+    def _search_statement(self, sql: str, filters: Optional[Dict[str, Any]]):
+        stmt = text(sql).columns(
+            id=String,
+            name=String,
+            meta_data=postgresql.JSONB,
+            content=String,
+            embedding=Vector(self.dimensions),
+            usage=postgresql.JSONB,
+            score=Float,
+        )
+        if filters is not None:
+            stmt = stmt.bindparams(bindparam("filters", value=filters, type_=postgresql.JSONB))
+        return stmt
+
+    def _set_search_knobs(self, sess, candidates: int) -> None:
+        if isinstance(self.vector_index, Ivfflat):
+            sess.execute(text(f"SET LOCAL ivfflat.probes = {int(self.vector_index.probes)}"))
+        elif isinstance(self.vector_index, HNSW):
+            # The HNSW scan returns at most ef_search rows
+            sess.execute(text(f"SET LOCAL hnsw.ef_search = {max(int(self.vector_index.ef_search), candidates)}"))
+
+    def _to_documents(self, rows) -> List[Document]:
+        return [
+            Document(
+                id=row.id,
+                name=row.name,
+                meta_data=row.meta_data,
+                content=row.content,
+                embedder=self.embedder,
+                embedding=row.embedding,
+                usage=row.usage,
+            )
+            for row in rows
+        ]
+
+    def vector_search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Nearest neighbours from the ANN index, the corpus's own index when the table is shared"""
+        operator = _DISTANCE_OPERATORS.get(self.distance)
+        if operator is None:
+            return super().vector_search(query=query, limit=limit, filters=filters)
+
+        with telemetry.stage("embed_query"):
+            query_embedding = self.embedder.get_embedding(query)
+        if not query_embedding:
+            logger.error(f"Error getting embedding for Query: {query}")
+            return []
+
+        filters = self._unscoped_filters(filters)
+        filter_clause = "AND filters @> :filters " if filters is not None else ""
+        sql = (
+            f"SELECT id, name, meta_data, content, embedding, usage, embedding {operator} :embedding AS score "
+            f"FROM {self.quoted_table_name} WHERE true {self._corpus_clause}{filter_clause}"
+            "ORDER BY score LIMIT :limit"
+        )
+        stmt = self._search_statement(sql, filters).bindparams(
+            bindparam("embedding", value=query_embedding, type_=Vector(self.dimensions))
+        )
+        try:
+            with telemetry.stage("db_search"), self.Session() as sess, sess.begin():
+                self._set_search_knobs(sess, limit)
+                rows = sess.execute(stmt, {"limit": limit}).fetchall()
+        except Exception as e:
+            logger.error(f"Error performing vector search: {e}")
+            return []
+        documents = self._to_documents(rows)
+        if self.reranker:
+            documents = self.reranker.rerank(query=query, documents=documents)
+        return documents
+
+    def keyword_search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Full-text search over the stored, GIN-indexed content_tsv column"""
+        if not self._text_search_ready():
+            return super().keyword_search(query=query, limit=limit, filters=filters)
+
+        filter_clause = "AND t.filters @> :filters " if filters is not None else ""
+        sql = (
+            "SELECT t.id, t.name, t.meta_data, t.content, t.embedding, t.usage, ts_rank_cd(t.content_tsv, q) AS score "
+            f"FROM {self.quoted_table_name} t, websearch_to_tsquery(CAST(:language AS regconfig), :query) q "
+            f"WHERE t.content_tsv @@ q {filter_clause}"
+            "ORDER BY score DESC LIMIT :limit"
+        )
+        processed_query = self.enable_prefix_matching(query) if self.prefix_match else query
+        try:
+            with telemetry.stage("db_search"), self.Session() as sess, sess.begin():
+                rows = sess.execute(
+                    self._search_statement(sql, filters),
+                    {"language": self.content_language, "query": processed_query, "limit": limit},
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"Error performing keyword search: {e}")
+            return []
+        return self._to_documents(rows)
+
+    def hybrid_search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """
+        Hybrid search: vector and keyword candidates from their own indexes, fused with reciprocal rank fusion.
+
+        Args:
+            query (str): The search query.
+            limit (int): Maximum number of results to return.
+            filters (Optional[Dict[str, Any]]): Filters to apply to the search.
+
+        Returns:
+            List[Document]: List of matching documents.
+        """
+        operator = _DISTANCE_OPERATORS.get(self.distance)
+        if operator is None or not self._text_search_ready():
+            return super().hybrid_search(query=query, limit=limit, filters=filters)
+        if not 0 <= self.vector_score_weight <= 1:
+            raise ValueError("vector_score_weight must be between 0 and 1")
+
+        with telemetry.stage("embed_query"):
+            query_embedding = self.embedder.get_embedding(query)
+        if not query_embedding:
+            logger.error(f"Error getting embedding for Query: {query}")
+            return []
+
+        candidates = max(self.hybrid_candidates, limit)
+        filters = self._unscoped_filters(filters)
+        filter_clause = "AND filters @> :filters " if filters is not None else ""
+        sql = (
+            "WITH vector_candidates AS ("
+            " SELECT id, row_number() OVER (ORDER BY distance) AS rank FROM ("
+            f"  SELECT id, embedding {operator} :embedding AS distance FROM {self.quoted_table_name}"
+            f"  WHERE true {self._corpus_clause}{filter_clause}ORDER BY distance LIMIT :candidates) v"
+            "), keyword_candidates AS ("
+            " SELECT id, row_number() OVER (ORDER BY text_rank DESC) AS rank FROM ("
+            f"  SELECT id, ts_rank_cd(content_tsv, q) AS text_rank FROM {self.quoted_table_name},"
+            "   websearch_to_tsquery(CAST(:language AS regconfig), :query) q"
+            f"  WHERE content_tsv @@ q {filter_clause}ORDER BY text_rank DESC LIMIT :candidates) k"
+            "), fused AS ("
+            " SELECT coalesce(v.id, k.id) AS id,"
+            "  coalesce(:vector_weight / (:rrf_k + v.rank), 0) + coalesce(:keyword_weight / (:rrf_k + k.rank), 0) AS score"
+            " FROM vector_candidates v FULL OUTER JOIN keyword_candidates k ON v.id = k.id"
+            ") "
+            "SELECT t.id, t.name, t.meta_data, t.content, t.embedding, t.usage, f.score "
+            f"FROM fused f JOIN {self.quoted_table_name} t ON t.id = f.id "
+            "ORDER BY f.score DESC LIMIT :limit"
+        )
+        stmt = self._search_statement(sql, filters).bindparams(
+            bindparam("embedding", value=query_embedding, type_=Vector(self.dimensions))
+        )
+        processed_query = self.enable_prefix_matching(query) if self.prefix_match else query
+        try:
+            with telemetry.stage("db_search"), self.Session() as sess, sess.begin():
+                self._set_search_knobs(sess, candidates)
+                rows = sess.execute(
+                    stmt,
+                    {
+                        "language": self.content_language,
+                        "query": processed_query,
+                        "candidates": candidates,
+                        "vector_weight": float(self.vector_score_weight),
+                        "keyword_weight": float(1 - self.vector_score_weight),
+                        "rrf_k": float(self.rrf_k),
+                        "limit": limit,
+                    },
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"Error performing hybrid search: {e}")
+            return []
+        return self._to_documents(rows)
+
+    def mark_loaded(self, source: Optional[str] = None) -> None:
+        """Record in the corpus registry that the corpus finished loading"""
+        if self.corpus_registry is not None:
+            self.corpus_registry.register(corpus=self.corpus, table_name=self.table_name, source=source)
+            self.corpus_registry.mark_loaded(self.corpus, self.get_count())
+
+    def knowledge_version(self) -> Optional[str]:
+        """
+        Fingerprint of the table contents (row count and last write time), or of the
+        corpus when the table is shared. It changes whenever the table is re-ingested.
+        """
+        try:
+            with self.Session() as sess, sess.begin():
+                last_write = func.max(func.coalesce(self.table.c.updated_at, self.table.c.created_at))
+                stmt = self._scope(select(func.count(self.table.c.id), last_write).select_from(self.table))
+                count, last_written_at = sess.execute(stmt).one()
+                return f"{count}:{last_written_at.isoformat() if last_written_at else ''}"
+        except Exception as e:
+            logger.error(f"Error getting knowledge version of '{self.table.fullname}': {e}")
+            return None
+
+    def delete_documents(
+        self, name: str, meta_data: Optional[Dict[str, Any]] = None, missing_key: Optional[str] = None
+    ) -> int:
+        """
+        Delete all rows of a document, optionally only those matching some metadata.
+
+        Args:
+            name: Name of the document whose rows should be removed.
+            meta_data: Optional metadata the rows must contain, e.g. {"page": 3}.
+            missing_key: Optional metadata key the rows must not have.
+
+        Returns:
+            The number of deleted rows.
+        """
+        if not self.table_exists():
+            return 0
+
+        stmt = self._scope(delete(self.table).where(self.table.c.name == name))
+        if meta_data:
+            stmt = stmt.where(self.table.c.meta_data.contains(meta_data))
+        if missing_key:
+            stmt = stmt.where(~self.table.c.meta_data.has_key(missing_key))
+
+        try:
+            with self.Session() as sess, sess.begin():
+                result = sess.execute(stmt)
+                log_debug(f"Deleted {result.rowcount} rows for '{name}' {meta_data or ''}")
+                return result.rowcount
+        except Exception as e:
+            logger.error(f"Error deleting rows for '{name}' from '{self.table.fullname}': {e}")
+            raise
+
+    def embed_documents(self, documents: List[Document]) -> None:
+        """Embed documents, in batches when the embedder supports it"""
+        if hasattr(self.embedder, "embed_documents"):
+            self.embedder.embed_documents(documents)
+            return
+        for doc in documents:
+            doc.embed(embedder=self.embedder)
+
+    def _build_records(self, documents: List[Document], filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        filters = self._scoped_filters(filters)
+        records = []
+        for doc in documents:
+            if not doc.embedding:
+                logger.error(f"Skipping document '{doc.name}' without an embedding")
+                continue
+            cleaned_content = self._clean_content(doc.content)
+            content_hash = md5(cleaned_content.encode()).hexdigest()
+            _id = doc.id or content_hash
+            if self.corpus is not None:
+                # Ids only need to be unique within a corpus
+                _id = f"{self.corpus}:{_id}"
+            records.append({
+                "id": _id,
+                "name": doc.name,
+                "meta_data": doc.meta_data,
+                "filters": filters,
+                "content": cleaned_content,
+                "embedding": doc.embedding,
+                "usage": doc.usage,
+                "content_hash": content_hash,
+            })
+        return records
+
+    def _copy_records(self, records: List[Dict[str, Any]], upsert: bool) -> None:
+        """Binary COPY records into a staging table and merge them into the table in one statement"""
+        from pgvector.psycopg import register_vector
+
+        columns = ", ".join(_COPY_COLUMNS)
+        staging = f'"stage_{md5(self.table.fullname.encode()).hexdigest()[:16]}"'
+        merge = f"INSERT INTO {self.quoted_table_name} ({columns}) "
+        if upsert:
+            # DISTINCT ON: a batch may repeat an id, which ON CONFLICT cannot update twice
+            merge += f"SELECT DISTINCT ON (id) {columns} FROM {staging} ORDER BY id "
+            merge += "ON CONFLICT (id) DO UPDATE SET "
+            merge += ", ".join(f"{c} = EXCLUDED.{c}" for c in _COPY_COLUMNS if c != "id")
+            merge += ", updated_at = now()"
+        else:
+            merge += f"SELECT {columns} FROM {staging}"
+
+        raw_connection = self.db_engine.raw_connection()
+        try:
+            connection = raw_connection.driver_connection
+            if connection not in _vector_connections:
+                register_vector(connection)
+                _vector_connections.add(connection)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS "
+                    f"SELECT {columns} FROM {self.quoted_table_name} WITH NO DATA"
+                )
+                with cursor.copy(f"COPY {staging} ({columns}) FROM STDIN (FORMAT BINARY)") as copy:
+                    copy.set_types(list(_COPY_TYPES))
+                    for record in records:
+                        copy.write_row(tuple(record[c] for c in _COPY_COLUMNS))
+                cursor.execute(merge)
+            raw_connection.commit()
+        except Exception:
+            raw_connection.rollback()
+            raise
+        finally:
+            raw_connection.close()
+
+    def _write(
+        self,
+        documents: List[Document],
+        filters: Optional[Dict[str, Any]],
+        batch_size: int,
+        upsert: bool,
+    ) -> None:
+        # Embed everything up front so the embedder can batch and parallelize requests,
+        # skipping documents an ingestion pipeline already embedded
+        to_embed = [doc for doc in documents if not doc.embedding]
+        if to_embed:
+            self.embed_documents(to_embed)
+
+        if self.bulk_load:
+            records = self._build_records(documents, filters)
+            if records:
+                start = time.perf_counter()
+                self._copy_records(records, upsert=upsert)
+                log_info(
+                    f"Bulk {'upserted' if upsert else 'inserted'} {len(records)} documents "
+                    f"in {time.perf_counter() - start:.2f}s."
+                )
+            return
+
+        with self.Session() as sess:
+            for i in range(0, len(documents), batch_size):
+                batch_records = self._build_records(documents[i : i + batch_size], filters)
+                if not batch_records:
+                    continue
+                try:
+                    insert_stmt = postgresql.insert(self.table).values(batch_records)
+                    if upsert:
+                        insert_stmt = insert_stmt.on_conflict_do_update(
+                            index_elements=["id"],
+                            set_=dict(
+                                name=insert_stmt.excluded.name,
+                                meta_data=insert_stmt.excluded.meta_data,
+                                filters=insert_stmt.excluded.filters,
+                                content=insert_stmt.excluded.content,
+                                embedding=insert_stmt.excluded.embedding,
+                                usage=insert_stmt.excluded.usage,
+                                content_hash=insert_stmt.excluded.content_hash,
+                                updated_at=func.now(),
+                            ),
+                        )
+                    sess.execute(insert_stmt)
+                    sess.commit()  # Commit batch independently
+                    log_info(f"{'Upserted' if upsert else 'Inserted'} batch of {len(batch_records)} documents.")
+                except Exception as e:
+                    logger.error(f"Error with batch starting at index {i}: {e}")
+                    sess.rollback()
+                    raise
+
+    @property
+    def vector_index_name(self) -> Optional[str]:
+        if self.vector_index is None:
+            return None
+        if self.vector_index.name:
+            return self.vector_index.name
+        index_type = "ivfflat" if isinstance(self.vector_index, Ivfflat) else "hnsw"
+        if self.corpus is not None:
+            # Postgres truncates identifiers to 63 characters, so the lookups have to as well
+            return f"{self.table_name}_{self.corpus}_{index_type}_index"[:63]
+        return f"{self.table_name}_{index_type}_index"
+
+    @staticmethod
+    def recommended_ivfflat_lists(num_rows: int) -> int:
+        """pgvector's guideline: rows / 1000 lists up to 1M rows, sqrt(rows) above"""
+        if num_rows < 1_000_000:
+            return max(num_rows // 1000, 1)
+        return max(int(math.sqrt(num_rows)), 1)
+
+    def _table_row_count(self) -> int:
+        """Rows the ANN index covers: the corpus rows of a shared table, else all rows"""
+        if self.corpus is not None:
+            return self.get_count()
+        with self.Session() as sess, sess.begin():
+            return int(sess.execute(text(f"SELECT count(*) FROM {self.quoted_table_name}")).scalar() or 0)
+
+    def _index_method(self) -> str:
+        operators = {
+            Distance.l2: "vector_l2_ops",
+            Distance.max_inner_product: "vector_ip_ops",
+            Distance.cosine: "vector_cosine_ops",
+        }.get(self.distance, "vector_cosine_ops")
+        if isinstance(self.vector_index, Ivfflat):
+            lists = self.vector_index.lists
+            if self.vector_index.dynamic_lists:
+                lists = self.recommended_ivfflat_lists(self._table_row_count())
+            return f"ivfflat (embedding {operators}) WITH (lists = {int(lists)})"
+        return (
+            f"hnsw (embedding {operators}) "
+            f"WITH (m = {int(self.vector_index.m)}, ef_construction = {int(self.vector_index.ef_construction)})"
+        )
+
+    def create_vector_index(self, force_recreate: bool = False, concurrently: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Create the ANN index described by vector_index, or rebuild it.
+
+        A rebuild builds the new index next to the old one and swaps them, so with
+        concurrently=True searches keep using the old index (and writes are not
+        blocked) until the new one is ready.
+
+        Args:
+            force_recreate: Rebuild the index if it already exists.
+            concurrently: Build with CREATE INDEX CONCURRENTLY.
+
+        Returns:
+            The index report with the build time in seconds, or None if nothing was built.
+        """
+        if self.vector_index is None or not self.table_exists():
+            return None
+
+        index_name = self.vector_index_name
+        exists = self._index_exists(index_name)
+        if exists and not force_recreate:
+            log_debug(f"Vector index '{index_name}' already exists")
+            return None
+
+        build_name = f"{index_name}_new" if exists else index_name
+        method = self._index_method()
+        concurrent = "CONCURRENTLY " if concurrently else ""
+        log_info(f"Building vector index '{index_name}' on {self.quoted_table_name} USING {method}")
+
+        start = time.perf_counter()
+        with self.db_engine.connect() as conn:
+            if concurrently:
+                # CONCURRENTLY cannot run in a transaction, so settings are reset by hand
+                conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            scope = "" if concurrently else "LOCAL "
+            try:
+                for key, value in (self.vector_index.configuration or {}).items():
+                    value = str(value).replace("'", "''")
+                    conn.execute(text(f"SET {scope}{key} = '{value}'"))
+                conn.execute(text(f'DROP INDEX {concurrent}IF EXISTS "{self.schema}"."{build_name}"'))
+                where = f" WHERE {self._corpus_predicate}" if self.corpus is not None else ""
+                conn.execute(text(
+                    f'CREATE INDEX {concurrent}"{build_name}" ON {self.quoted_table_name} USING {method}{where}'
+                ))
+                if exists:
+                    conn.execute(text(f'DROP INDEX {concurrent}"{self.schema}"."{index_name}"'))
+                    conn.execute(text(f'ALTER INDEX "{self.schema}"."{build_name}" RENAME TO "{index_name}"'))
+                if not concurrently:
+                    conn.commit()
+            finally:
+                if concurrently:
+                    for key in self.vector_index.configuration or {}:
+                        conn.execute(text(f"RESET {key}"))
+        seconds = time.perf_counter() - start
+
+        report = next((r for r in self.index_report() if r["name"] == index_name), {"name": index_name})
+        report["build_seconds"] = seconds
+        self.last_index_build = report
+        log_info(f"Built vector index '{index_name}' ({report.get('size', '?')}) in {seconds:.1f}s")
+        return report
+
+    def optimize(self, force_recreate: bool = False) -> None:
+        """Create or rebuild the vector index"""
+        self.create_vector_index(force_recreate=force_recreate)
+
+    def index_report(self) -> List[Dict[str, Any]]:
+        """
+        Describe the indexes of the table: method, size, options and scans.
+
+        IVFFlat indexes also report the list count recommended for the current row
+        count, and outgrown=True once the table has grown past twice that. On a shared
+        table only the index of the corpus is checked against the corpus row count.
+        """
+        if not self.table_exists():
+            return []
+        with self.Session() as sess, sess.begin():
+            rows = sess.execute(
+                text(
+                    "SELECT i.relname AS name, am.amname AS method, i.reloptions AS options, "
+                    "pg_relation_size(i.oid) AS size_bytes, pg_size_pretty(pg_relation_size(i.oid)) AS size, "
+                    "s.idx_scan AS scans "
+                    "FROM pg_index x "
+                    "JOIN pg_class t ON t.oid = x.indrelid "
+                    "JOIN pg_namespace n ON n.oid = t.relnamespace "
+                    "JOIN pg_class i ON i.oid = x.indexrelid "
+                    "JOIN pg_am am ON am.oid = i.relam "
+                    "LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = i.oid "
+                    "WHERE n.nspname = :schema AND t.relname = :table ORDER BY i.relname"
+                ),
+                {"schema": self.schema, "table": self.table_name},
+            ).mappings().all()
+
+        report = [dict(row) for row in rows]
+        if any(r["method"] == "ivfflat" for r in report):
+            num_rows = self._table_row_count()
+            for r in report:
+                if r["method"] != "ivfflat" or (self.corpus is not None and r["name"] != self.vector_index_name):
+                    continue
+                options = dict(option.split("=", 1) for option in r["options"] or [])
+                lists = int(options.get("lists", 100))
+                recommended = self.recommended_ivfflat_lists(num_rows)
+                r.update(rows=num_rows, lists=lists, recommended_lists=recommended, outgrown=lists * 2 < recommended)
+        return report
+
+    def ensure_vector_index(self) -> Optional[Dict[str, Any]]:
+        """Create the vector index if it is missing, and warn if an IVFFlat index has outgrown its lists"""
+        if self.vector_index is None or not self.table_exists():
+            return None
+        built = self.create_vector_index()
+        if built is not None:
+            return built
+        for r in self.index_report():
+            if r.get("outgrown"):
+                logger.warning(
+                    f"IVFFlat index '{r['name']}' has {r['lists']} lists for {r['rows']} rows "
+                    f"(recommended {r['recommended_lists']}), rebuild it to keep recall and latency steady"
+                )
+        return None
+
+    def _ann_index_definitions(self) -> Dict[str, str]:
+        """CREATE INDEX statements of the HNSW/IVFFlat indexes on the table, by index name
+
+        On a shared table only the index of the corpus is returned.
+        """
+        with self.Session() as sess, sess.begin():
+            rows = sess.execute(
+                text(
+                    "SELECT indexname, indexdef FROM pg_indexes "
+                    "WHERE schemaname = :schema AND tablename = :table "
+                    "AND (indexdef ILIKE '%USING hnsw%' OR indexdef ILIKE '%USING ivfflat%')"
+                ),
+                {"schema": self.schema, "table": self.table_name},
+            ).fetchall()
+        if self.corpus is not None:
+            rows = [row for row in rows if row.indexname == self.vector_index_name]
+        return {row.indexname: row.indexdef for row in rows}
+
+    @contextmanager
+    def deferred_indexes(self) -> Iterator[None]:
+        """
+        Drop the ANN indexes for the duration of a full reload and rebuild them afterwards.
+
+        Building an index once over the loaded table is much cheaper than updating it
+        row by row. On a shared table only the corpus's own index is deferred, so
+        searches of the other corpora keep their index. Does nothing unless
+        defer_index_build is set.
+        """
+        if not self.defer_index_build or not self.table_exists():
+            yield
+            return
+
+        definitions = self._ann_index_definitions()
+        for index_name in definitions:
+            log_info(f"Deferring build of index '{index_name}' until the reload is done")
+            self._drop_index(index_name)
+        try:
+            yield
+        finally:
+            for index_name, definition in definitions.items():
+                start = time.perf_counter()
+                with self.Session() as sess, sess.begin():
+                    sess.execute(text(definition.replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1)))
+                log_info(f"Built index '{index_name}' in {time.perf_counter() - start:.1f}s")
+            if definitions:
+                with self.Session() as sess, sess.begin():
+                    sess.execute(text(f"ANALYZE {self.quoted_table_name}"))
+
+    def insert(
+        self,
+        documents: List[Document],
+        filters: Optional[Dict[str, Any]] = None,
+        batch_size: int = 100,
+    ) -> None:
+        """
+        Insert documents into the database, embedding them in batches.
+
+        Args:
+            documents (List[Document]): List of documents to insert.
+            filters (Optional[Dict[str, Any]]): Filters to apply to the documents.
+            batch_size (int): Number of documents to insert in each batch.
+        """
+        try:
+            self._write(documents, filters=filters, batch_size=batch_size, upsert=False)
+        except Exception as e:
+            logger.error(f"Error inserting documents: {e}")
+            raise
+
+    def upsert(
+        self,
+        documents: List[Document],
+        filters: Optional[Dict[str, Any]] = None,
+        batch_size: int = 100,
+    ) -> None:
+        """
+        Upsert (insert or update) documents in the database, embedding them in batches.
+
+        Args:
+            documents (List[Document]): List of documents to upsert.
+            filters (Optional[Dict[str, Any]]): Filters to apply to the documents.
+            batch_size (int): Number of documents to upsert in each batch.
+        """
+        try:
+            self._write(documents, filters=filters, batch_size=batch_size, upsert=True)
+        except Exception as e:
+            logger.error(f"Error upserting documents: {e}")
+            raise
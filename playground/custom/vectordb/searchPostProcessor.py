@@ -0,0 +1,214 @@
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agno.document import Document
+from agno.utils.log import log_debug
+
+# Overlap looked for when joining adjacent chunks whose chunker did not record it: shorter
+# matches are coincidences (a digit, a letter of the next word), not repeated text
+_MIN_OVERLAP_CHARS = 32
+_MAX_OVERLAP_CHARS = 1000
+
+
+# (page, chunk, whether it is the last chunk of its page) of a chunk in its document
+_Position = Tuple[int, int, bool]
+
+
+def _position(meta_data: Optional[Dict[str, Any]]) -> Optional[_Position]:
+    """Position of a chunk in its document, None when the reader did not record it"""
+    meta_data = meta_data or {}
+    if meta_data.get("chunk_index") is not None:
+        # Chunks spanning pages are numbered through the whole document
+        return 0, int(meta_data["chunk_index"]), False
+    page = meta_data.get("page")
+    if page is None:
+        return None
+    if meta_data.get("chunk") is None:
+        # The whole page
+        return int(page), 1, True
+    chunk = int(meta_data["chunk"])
+    # Chunks loaded before page_chunks was recorded are only merged within their page
+    page_chunks = meta_data.get("page_chunks")
+    return int(page), chunk, page_chunks is not None and chunk == int(page_chunks)
+
+
+def _is_adjacent(before: _Position, after: _Position) -> bool:
+    """Next chunk of the same page, or first chunk of the next page when before ends its page"""
+    (page, chunk, last), (next_page, next_chunk, _) = before, after
+    return (next_page == page and next_chunk == chunk + 1) or (last and next_page == page + 1 and next_chunk == 1)
+
+
+def _same_file(first: Document, second: Document) -> bool:
+    """Whether two chunks come from the same file, by source path when the loader recorded it"""
+    if first.name != second.name:
+        return False
+    return (first.meta_data or {}).get("source") == (second.meta_data or {}).get("source")
+
+
+def _join(first: str, second: str, overlap_chars: Optional[int] = None) -> str:
+    """
+    Concatenate two consecutive chunks, dropping the text they overlap on.
+
+    Args:
+        first: Content of the first chunk.
+        second: Content of the chunk after it.
+        overlap_chars: Length of the text second repeats from first, as recorded by the chunker.
+            When None, an overlap of at least _MIN_OVERLAP_CHARS is looked for.
+    """
+    if overlap_chars is not None:
+        if 0 < overlap_chars <= len(second) and first.endswith(second[:overlap_chars]):
+            return first + second[overlap_chars:]
+        return first + "\n" + second
+    for size in range(min(len(first), len(second), _MAX_OVERLAP_CHARS), _MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+
+class SearchPostProcessor:
+    """
+    Turns a candidate pool from vector or hybrid search into fewer, more distinct results.
+
+    1. Near-duplicate suppression: in rank order, a candidate whose embedding has a
+       cosine similarity of at least duplicate_threshold with a kept one is dropped.
+    2. Maximal Marginal Relevance: candidates are ordered by
+       mmr_lambda * relevance - (1 - mmr_lambda) * max sim(doc, already picked),
+       relevance falling linearly from 1 with the search rank. Using the rank
+       rather than the similarity to the query keeps what hybrid search fused
+       in, and needs no query embedding.
+    3. Adjacency merging: walking that order, a chunk that directly precedes or
+       follows a picked chunk of the same file is merged into it (up to
+       max_merged_chars), until limit results are picked.
+
+    Similarities of the whole pool are computed at once with NumPy.
+    """
+
+    def __init__(
+        self,
+        candidate_multiplier: int = 4,
+        duplicate_threshold: float = 0.95,
+        mmr_lambda: float = 0.7,
+        merge_adjacent: bool = True,
+        max_merged_chars: int = 6000,
+    ):
+        """
+        Args:
+            candidate_multiplier: Candidates fetched per result.
+            duplicate_threshold: Cosine similarity from which two chunks are near-duplicates, 1 to keep all.
+            mmr_lambda: Relevance versus diversity, 1 ranks by relevance only.
+            merge_adjacent: Merge adjacent chunks of the same document.
+            max_merged_chars: Longest merged result.
+        """
+        if not 0 <= mmr_lambda <= 1:
+            raise ValueError("mmr_lambda must be between 0 and 1")
+        self.candidate_multiplier = max(candidate_multiplier, 1)
+        self.duplicate_threshold = duplicate_threshold
+        self.mmr_lambda = mmr_lambda
+        self.merge_adjacent = merge_adjacent
+        self.max_merged_chars = max_merged_chars
+
+    def candidates(self, limit: int) -> int:
+        return limit * self.candidate_multiplier
+
+    def process(self, documents: List[Document], limit: int) -> List[Document]:
+        """
+        Select up to limit results from the candidates.
+
+        Args:
+            documents: Candidates, best ranked first, with their embeddings.
+            limit: Maximum number of results.
+
+        Returns:
+            The selected documents, merged ones included, most relevant first.
+        """
+        if len(documents) <= 1 or any(d.embedding is None for d in documents):
+            return documents[:limit]
+
+        embeddings = np.asarray([d.embedding for d in documents], dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1, norms)
+        similarity = embeddings @ embeddings.T
+        relevance = 1 - np.arange(len(documents), dtype=np.float32) / len(documents)
+
+        kept = self._suppress_duplicates(similarity)
+        order = self._mmr_order(relevance[kept], similarity[np.ix_(kept, kept)])
+        ranked = [documents[kept[i]] for i in order]
+        results = self._merge_adjacent(ranked, limit) if self.merge_adjacent else ranked[:limit]
+        log_debug(
+            f"Search post-processing: {len(documents)} candidates, {len(documents) - len(kept)} near-duplicates, "
+            f"{len(results)} results"
+        )
+        return results
+
+    def _suppress_duplicates(self, similarity: np.ndarray) -> List[int]:
+        if self.duplicate_threshold >= 1:
+            return list(range(len(similarity)))
+        # Candidate j is a duplicate of i when i ranks higher and is kept
+        duplicate = np.triu(similarity >= self.duplicate_threshold, k=1)
+        keep = np.ones(len(similarity), dtype=bool)
+        for i in range(len(similarity)):
+            if keep[i]:
+                keep[duplicate[i]] = False
+        return np.flatnonzero(keep).tolist()
+
+    def _mmr_order(self, relevance: np.ndarray, similarity: np.ndarray) -> List[int]:
+        n = len(relevance)
+        picked = np.zeros(n, dtype=bool)
+        max_similarity = np.zeros(n, dtype=np.float32)
+        order: List[int] = []
+        for step in range(n):
+            scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_similarity if step else relevance
+            scores = np.where(picked, -np.inf, scores)
+            best = int(np.argmax(scores))
+            order.append(best)
+            picked[best] = True
+            max_similarity = np.maximum(max_similarity, similarity[best])
+        return order
+
+    def _merge_adjacent(self, ranked: List[Document], limit: int) -> List[Document]:
+        # Each result is a run of consecutive chunks of one document: [(position, document)]
+        results: List[List[Tuple[Optional[_Position], Document]]] = []
+        for document in ranked:
+            position = _position(document.meta_data)
+            merged = False
+            if position is not None:
+                for chunks in results:
+                    first_position, first = chunks[0]
+                    last_position = chunks[-1][0]
+                    if not _same_file(first, document) or first_position is None:
+                        continue
+                    size = sum(len(d.content) for _, d in chunks) + len(document.content)
+                    if size > self.max_merged_chars:
+                        continue
+                    if _is_adjacent(last_position, position):
+                        chunks.append((position, document))
+                        merged = True
+                    elif _is_adjacent(position, first_position):
+                        chunks.insert(0, (position, document))
+                        merged = True
+                    if merged:
+                        break
+            if not merged:
+                if len(results) == limit:
+                    break
+                results.append([(position, document)])
+        return [self._combine(chunks) for chunks in results]
+
+    @staticmethod
+    def _combine(chunks: List[Tuple[Optional[_Position], Document]]) -> Document:
+        if len(chunks) == 1:
+            return chunks[0][1]
+        documents = [d for _, d in chunks]
+        content = documents[0].content
+        for document in documents[1:]:
+            overlap_chars = (document.meta_data or {}).get("overlap_chars")
+            content = _join(content, document.content, int(overlap_chars) if overlap_chars is not None else None)
+        meta_data = dict(documents[0].meta_data or {})
+        last = documents[-1].meta_data or {}
+        meta_data["page_end"] = last.get("page_end", last.get("page"))
+        meta_data["merged_chunks"] = len(documents)
+        for key in ("chunk_size", "tokens"):
+            meta_data.pop(key, None)
+        return replace(documents[0], content=content, meta_data=meta_data, embedding=None)
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine, create_engine
+from sqlalchemy.pool import QueuePool
+
+
+@dataclass
+class PoolStats:
+    """Counters of connection checkouts from a pool"""
+
+    checkouts: int = 0
+    # Checkouts that found the pool exhausted and had to wait for a connection
+    waits: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    timeouts: int = 0
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that counts checkouts and how long callers waited for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        exhausted = self.checkedin() == 0 and self._max_overflow > -1 and self.overflow() >= self._max_overflow
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.stats.timeouts += 1
+            raise
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.stats.checkouts += 1
+            if exhausted:
+                self.stats.waits += 1
+                self.stats.wait_seconds += elapsed
+                self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, elapsed)
+        return connection
+
+
+# Process-wide engines, one per database url, shared by PgVector, PostgresStorage and PostgresMemoryDb
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_db_url() -> str:
+    return os.getenv("PGVECTOR_URI", "postgresql+psycopg://ai:ai@localhost:5532/ai")
+
+
+def create_db_engine(
+    db_url: Optional[str] = None,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+) -> Engine:
+    """
+    Create an engine with a pool of its own, not shared with get_db_engine.
+
+    For background work like the knowledge indexer, which should not take
+    connections from the pool serving requests. Settings not given come from
+    the same env vars as get_db_engine.
+    """
+    connect_args: Dict[str, Any] = {}
+    statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    if statement_timeout > 0:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+
+    return create_engine(
+        db_url or get_db_url(),
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size if pool_size is not None else int(os.getenv("DB_POOL_SIZE", "10")),
+        max_overflow=max_overflow if max_overflow is not None else int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+        connect_args=connect_args,
+    )
+
+
+def get_db_engine(db_url: Optional[str] = None) -> Engine:
+    """
+    Get the shared engine for a database url, creating it on first use.
+
+    Pool settings come from DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING and DB_STATEMENT_TIMEOUT_MS.
+    """
+    db_url = db_url or get_db_url()
+    with _engines_lock:
+        engine = _engines.get(db_url)
+        if engine is None:
+            engine = create_db_engine(db_url)
+            _engines[db_url] = engine
+        return engine
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Pool size, usage and wait counters of every shared engine, keyed by url without password"""
+    with _engines_lock:
+        engines = list(_engines.values())
+
+    stats: Dict[str, Dict[str, Any]] = {}
+    for engine in engines:
+        pool = engine.pool
+        pool_stats: Dict[str, Any] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        }
+        if isinstance(pool, InstrumentedQueuePool):
+            pool_stats.update(asdict(pool.stats))
+        stats[engine.url.render_as_string(hide_password=True)] = pool_stats
+    return stats
+
+
+def dispose_engines() -> None:
+    """Dispose every shared engine, e.g. after forking a worker process"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
@@ -0,0 +1,46 @@
+import os
+import threading
+from typing import List, Optional
+
+from agno.storage.postgres import PostgresStorage
+from custom.storage.appendOnlyStorage import AppendOnlyPostgresStorage
+from db.engine import get_db_engine
+
+from sqlalchemy.engine import Engine
+
+# Storages built in this process, closed (queued sessions written) on shutdown
+_storages: List[AppendOnlyPostgresStorage] = []
+_storages_lock = threading.Lock()
+
+
+def get_agent_storage(table_name: str, db_engine: Optional[Engine] = None) -> PostgresStorage:
+    """
+    Get the session storage of an agent.
+
+    Sessions are stored append-only (a header row per session, a row per run)
+    unless SESSION_STORAGE_APPEND_ONLY is "false". SESSION_WRITE_BEHIND queues
+    the writes for a background thread, flushed every
+    SESSION_WRITE_BEHIND_INTERVAL_MS.
+    """
+    db_engine = db_engine or get_db_engine()
+    if os.getenv("SESSION_STORAGE_APPEND_ONLY", "true").lower() != "true":
+        return PostgresStorage(table_name=table_name, db_engine=db_engine)
+
+    storage = AppendOnlyPostgresStorage(
+        table_name=table_name,
+        db_engine=db_engine,
+        write_behind=os.getenv("SESSION_WRITE_BEHIND", "false").lower() == "true",
+        flush_interval=int(os.getenv("SESSION_WRITE_BEHIND_INTERVAL_MS", "500")) / 1000,
+        max_batch_sessions=int(os.getenv("SESSION_WRITE_BEHIND_BATCH", "50")),
+    )
+    with _storages_lock:
+        _storages.append(storage)
+    return storage
+
+
+def close_storages(timeout: Optional[float] = None) -> None:
+    """Write the sessions still queued by every storage, before the engines are disposed"""
+    with _storages_lock:
+        storages = list(_storages)
+    for storage in storages:
+        storage.close(timeout)
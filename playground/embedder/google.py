@@ -1,9 +1,39 @@
 import os
-from agno.embedder.google import GeminiEmbedder
+from pathlib import Path
+from typing import Optional
+from agno.embedder import Embedder
 
-def get_google_embedder()->GeminiEmbedder:
+from custom.embedder.batchEmbedder import BatchEmbedder
+from custom.embedder.cachedEmbedder import CachedEmbedder, EmbeddingCache
+from custom.embedder.gemini import GeminiEmbedder
+
+# One cache per process, shared by every agent's knowledge table and query path
+_embedding_cache: Optional[EmbeddingCache] = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _embedding_cache
+    if _embedding_cache is None:
+        # ../data/cache/embeddings.sqlite3
+        default_path = Path(__file__).resolve().parent.parent / "data" / "cache" / "embeddings.sqlite3"
+        _embedding_cache = EmbeddingCache(
+            path=os.getenv("EMBEDDING_CACHE_PATH", str(default_path)),
+            max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000")),
+            touch_interval=float(os.getenv("EMBEDDING_CACHE_TOUCH_INTERVAL_SECONDS", "60")),
+        )
+    return _embedding_cache
+
+def get_google_embedder()->Embedder:
     embedder=GeminiEmbedder(
         id=os.getenv("GEMINI_EMBEDDER_MODEL_ID", "models/text-embedding-004"),
         dimensions=int(os.getenv("GEMINI_EMBEDDER_DIMENSIONS", "768"))
     )
-    return embedder
\ No newline at end of file
+    # Batch document embeddings and back off on rate limits
+    embedder = BatchEmbedder(
+        embedder=embedder,
+        batch_size=int(os.getenv("GEMINI_EMBEDDER_BATCH_SIZE", "100")),
+        max_concurrency=int(os.getenv("GEMINI_EMBEDDER_CONCURRENCY", "4")),
+    )
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() != "true":
+        return embedder
+    # Serve repeated chunks and queries from the local embedding cache
+    return CachedEmbedder(embedder=embedder, cache=get_embedding_cache())
\ No newline at end of file
@@ -0,0 +1,18 @@
+import os
+
+from custom.knowledge.crossPageChunking import CrossPageChunking
+
+from agno.document.chunking.recursive import RecursiveChunking
+from agno.document.chunking.strategy import ChunkingStrategy
+
+def get_chunking_strategy() -> ChunkingStrategy:
+    """Chunking of the PDF knowledge bases, from KNOWLEDGE_CHUNKING ("recursive" or "cross_page")"""
+    chunking = os.getenv("KNOWLEDGE_CHUNKING", "recursive").lower()
+    if chunking == "recursive":
+        return RecursiveChunking()
+    if chunking != "cross_page":
+        raise ValueError(f"Unknown KNOWLEDGE_CHUNKING: {chunking}")
+    return CrossPageChunking(
+        chunk_tokens=int(os.getenv("KNOWLEDGE_CHUNK_TOKENS", "512")),
+        overlap_tokens=int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP_TOKENS", "0")),
+    )
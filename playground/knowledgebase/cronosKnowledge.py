@@ -1,13 +1,14 @@
 import os
 from pathlib import Path
 
-from custom.knowledge.pdfKnowledge import PDFKnowledgeBase, PDFReader
+from custom.knowledge.pdfKnowledge import PDFKnowledgeBase
 from vectordb.pgvector import get_pgvector
 from embedder.google import get_google_embedder
+from knowledgebase.chunking import get_chunking_strategy
+from knowledgebase.reader import get_pdf_reader
 
 from agno.knowledge.agent import AgentKnowledge
 from agno.vectordb.base import VectorDb
-from agno.document.chunking.recursive import RecursiveChunking
 
 def get_cronos_knowledge(
         vector_db: VectorDb,
@@ -19,11 +20,15 @@ def get_cronos_knowledge(
     pdf_path = current_file.parent.parent / "data" / "cronos" / "pdfs"
     knowledge = PDFKnowledgeBase(
         path=pdf_path,
-        reader=PDFReader(),
+        reader=get_pdf_reader(),
+        # Read page by page and write in fixed-size batches
+        streaming=os.getenv("KNOWLEDGE_STREAMING", "true").lower() == "true",
+        batch_size=int(os.getenv("KNOWLEDGE_BATCH_SIZE", "100")),
         # Table name: ai.pdf_documents
         vector_db=vector_db,
         num_documents=num_documents,
-        chunking_strategy=RecursiveChunking(),
+        # Token-budgeted chunks spanning pages, see KNOWLEDGE_CHUNKING
+        chunking_strategy=get_chunking_strategy(),
     )
 
     return knowledge
@@ -35,6 +40,12 @@ if __name__ == "__main__":
     table_name = os.getenv("CRONOS_KNOWLEDGE_TABLE", "cronos_knowledge")
     
     embedder = get_google_embedder()
-    vectordb = get_pgvector(table_name=table_name, embedder=embedder)
+    vectordb = get_pgvector(table_name=table_name, embedder=embedder, corpus="cronos")
     knowledge = get_cronos_knowledge(vector_db=vectordb)
-    knowledge.load()
\ No newline at end of file
+    if os.getenv("KNOWLEDGE_PIPELINE", "false").lower() == "true":
+        # Overlap reading, chunking, embedding and writing
+        import asyncio
+        from knowledgebase.ingestion import get_ingestion_pipeline
+        asyncio.run(knowledge.aload_pipeline(pipeline=get_ingestion_pipeline()))
+    else:
+        knowledge.load()
\ No newline at end of file
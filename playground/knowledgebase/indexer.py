@@ -0,0 +1,88 @@
+"""
+Knowledge indexer daemon.
+
+    python -m knowledgebase.indexer
+
+Watches data/<corpus>/pdfs of every corpus in INDEXER_CORPORA and keeps the
+knowledge tables in sync: added and modified PDFs are indexed (changed pages
+only), the vectors of removed ones are deleted. Replaces running the
+knowledgebase/*Knowledge.py scripts by hand; do not run both at once, they
+share the per-table manifest. Runs in its own process with its own small
+database pool (INDEXER_DB_POOL_SIZE), so indexing never takes connections
+from the serving workers.
+"""
+import os
+import signal
+from typing import Dict
+
+from custom.knowledge.fileWatcher import FileWatcher
+from custom.knowledge.knowledgeIndexer import KnowledgeIndexer
+from custom.knowledge.pdfKnowledge import PDFKnowledgeBase
+from db.engine import create_db_engine
+from embedder.google import get_google_embedder
+from knowledgebase import babeTesterKnowledge, cronosKnowledge, edcTesterKnowledge
+from vectordb.pgvector import get_pgvector
+
+from sqlalchemy.engine import Engine
+
+# corpus -> (knowledge factory, table env var, default table), defaults as in agents/
+CORPORA = {
+    "cronos": (cronosKnowledge.get_cronos_knowledge, "CRONOS_KNOWLEDGE_TABLE", "cronos-knowledge"),
+    "babeTester": (babeTesterKnowledge.get_cronos_knowledge, "BABE_TESTER_KNOWLEDGE_TABLE", "babe-tester-knowledge"),
+    "edcTester": (edcTesterKnowledge.get_cronos_knowledge, "EDC_TESTER_KNOWLEDGE_TABLE", "edc-tester-knowledge"),
+}
+
+def get_indexed_knowledge(db_engine: Engine) -> Dict[str, PDFKnowledgeBase]:
+    """Knowledge bases of the corpora in INDEXER_CORPORA, all on db_engine"""
+    embedder = get_google_embedder()
+    knowledge_bases: Dict[str, PDFKnowledgeBase] = {}
+    for corpus in os.getenv("INDEXER_CORPORA", ",".join(CORPORA)).split(","):
+        corpus = corpus.strip()
+        if not corpus:
+            continue
+        if corpus not in CORPORA:
+            raise ValueError(f"Unknown corpus in INDEXER_CORPORA: {corpus}")
+        get_knowledge, table_env, default_table = CORPORA[corpus]
+        vectordb = get_pgvector(
+            table_name=os.getenv(table_env, default_table),
+            embedder=embedder,
+            corpus=corpus,
+            db_engine=db_engine,
+        )
+        knowledge_bases[corpus] = get_knowledge(vector_db=vectordb)
+    return knowledge_bases
+
+def get_knowledge_indexer() -> KnowledgeIndexer:
+    """Indexer over the INDEXER_CORPORA knowledge bases, configured from the INDEXER_* env vars"""
+    # A pool of its own: one file is indexed at a time
+    db_engine = create_db_engine(
+        pool_size=int(os.getenv("INDEXER_DB_POOL_SIZE", "2")),
+        max_overflow=int(os.getenv("INDEXER_DB_MAX_OVERFLOW", "0")),
+    )
+    knowledge_bases = get_indexed_knowledge(db_engine)
+    for knowledge in knowledge_bases.values():
+        os.makedirs(knowledge.path, exist_ok=True)
+    watcher = FileWatcher(
+        roots=[knowledge.path for knowledge in knowledge_bases.values()],
+        debounce_seconds=float(os.getenv("INDEXER_DEBOUNCE_SECONDS", "2")),
+        max_delay_seconds=float(os.getenv("INDEXER_MAX_DELAY_SECONDS", "30")),
+        poll_interval=float(os.getenv("INDEXER_POLL_INTERVAL", "10")),
+        use_inotify=os.getenv("INDEXER_USE_INOTIFY", "true").lower() == "true",
+    )
+    return KnowledgeIndexer(
+        knowledge_bases=knowledge_bases,
+        watcher=watcher,
+        reconcile_seconds=float(os.getenv("INDEXER_RECONCILE_SECONDS", "3600")),
+    )
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    indexer = get_knowledge_indexer()
+    # Finish the file being indexed on SIGTERM/SIGINT, the next start catches up with the rest
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: indexer.stop())
+    indexer.start()
+    indexer.wait()
+    indexer.join()
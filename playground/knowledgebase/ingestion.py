@@ -0,0 +1,14 @@
+import os
+
+from custom.knowledge.ingestionPipeline import IngestionPipeline
+
+def get_ingestion_pipeline() -> IngestionPipeline:
+    """Concurrent ingestion pipeline configured from the KNOWLEDGE_PIPELINE_* env vars"""
+    return IngestionPipeline(
+        read_concurrency=int(os.getenv("KNOWLEDGE_PIPELINE_READERS", "2")),
+        chunk_concurrency=int(os.getenv("KNOWLEDGE_PIPELINE_CHUNKERS", "2")),
+        embed_concurrency=int(os.getenv("KNOWLEDGE_PIPELINE_EMBEDDERS", "2")),
+        write_concurrency=int(os.getenv("KNOWLEDGE_PIPELINE_WRITERS", "1")),
+        queue_size=int(os.getenv("KNOWLEDGE_PIPELINE_QUEUE_SIZE", "8")),
+        batch_size=int(os.getenv("KNOWLEDGE_BATCH_SIZE", "100")),
+    )
@@ -0,0 +1,31 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+from custom.knowledge.pageTextCache import PageTextCache
+from custom.knowledge.pdfReader import PDFReader
+
+# One cache per process, shared by every knowledge base
+_page_text_cache: Optional[PageTextCache] = None
+
+def get_page_text_cache() -> Optional[PageTextCache]:
+    """Extracted PDF page text cache, or None when PDF_PAGE_CACHE_ENABLED is not "true"."""
+    global _page_text_cache
+    if os.getenv("PDF_PAGE_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    if _page_text_cache is None:
+        # ../data/cache/pages
+        default_path = Path(__file__).resolve().parent.parent / "data" / "cache" / "pages"
+        _page_text_cache = PageTextCache(
+            directory=os.getenv("PDF_PAGE_CACHE_PATH", str(default_path)),
+            max_bytes=int(os.getenv("PDF_PAGE_CACHE_MAX_MB", "0")) * 1024 * 1024,
+        )
+    return _page_text_cache
+
+def get_pdf_reader() -> PDFReader:
+    """PDF reader of the knowledge bases, configured from PDF_READER_WORKERS and PDF_PAGE_CACHE_*"""
+    return PDFReader(
+        num_workers=int(os.getenv("PDF_READER_WORKERS", "1")),
+        # Re-chunking reads page text from the cache instead of parsing the PDFs again
+        page_cache=get_page_text_cache(),
+    )
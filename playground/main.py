@@ -1,26 +1,50 @@
 from dotenv import load_dotenv
 load_dotenv()
+from contextlib import asynccontextmanager
+import asyncio
 from agno.playground import Playground, serve_playground_app
+from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import os
 
-from agents.babeTester import get_babe_tester_agent
-from agents.edcTester import get_edc_tester_agent
-# from agents.cronos import get_cronos_agent
-# from agents.dev import get_dev_agent
+from agno.utils.log import logger
+from custom.agent.agentRegistry import AgentRegistry, AgentSpec
+from custom.server.runLimiter import RunLimiter, RunLimitMiddleware
+from custom.telemetry.telemetry import telemetry
 
-babe_tester_agent = get_babe_tester_agent()
-edc_tester_agent = get_edc_tester_agent()
-# cronos_agent = get_cronos_agent()
-# dev_agent = get_dev_agent()
+# Per-stage latencies, tokens and cache hits of the runs, optionally exported as trace spans
+telemetry.configure(
+    enabled=os.getenv("TELEMETRY_ENABLED", "true").lower() == "true",
+    trace_endpoint=os.getenv("TRACE_EXPORT_ENDPOINT") or None,
+    service_name=os.getenv("TRACE_SERVICE_NAME", "playground"),
+)
+
+# Agents are declared here and built on first use, or by the warmup after startup
+registry = AgentRegistry([
+    AgentSpec(agent_id="babe-tester", name="BABE Tester Assist", factory="agents.babeTester:get_babe_tester_agent"),
+    AgentSpec(agent_id="edc-tester", name="EDC Tester Assist", factory="agents.edcTester:get_edc_tester_agent"),
+    # AgentSpec(agent_id="cronos", name="Cronos Assist", factory="agents.cronos:get_cronos_agent"),
+    # AgentSpec(agent_id="dev", name="Dev Assist", factory="agents.dev:get_dev_agent"),
+])
 
-app = Playground(
-    agents=[
-        babe_tester_agent,
-        edc_tester_agent,
-        # cronos_agent,
-        # dev_agent,
-]).get_app()
+app = Playground(agents=registry.agents).get_app()
+
+# Build the agents a request needs in a thread, not inside the Playground's async handlers
+@app.middleware("http")
+async def build_agents(request: Request, call_next):
+    try:
+        await registry.ensure_for_path(request.url.path)
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"detail": f"Agent not available: {e}"}, headers={"Retry-After": "5"})
+    return await call_next(request)
+
+# Per-worker limit on concurrent runs, the rest are shed with 503 + Retry-After
+run_limiter = RunLimiter(
+    max_concurrent=int(os.getenv("MAX_CONCURRENT_RUNS", "0")),
+    retry_after=int(os.getenv("RUN_RETRY_AFTER_SECONDS", "5")),
+)
+app.add_middleware(RunLimitMiddleware, limiter=run_limiter)
 
 # Get allowed origins from environment variable or use default
 UI_URL = os.environ.get("UI_URL", "http://192.168.10.176:3000")
@@ -35,6 +59,86 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# Warm the agents in the background once the server accepts traffic
+_default_lifespan = app.router.lifespan_context
+
+@asynccontextmanager
+async def lifespan(app):
+    if os.getenv("AGENT_WARMUP", "true").lower() == "true":
+        registry.start_warmup()
+    # On SIGTERM, shed new runs and fail readiness before uvicorn stops accepting connections
+    run_limiter.drain_on_sigterm(delay=float(os.getenv("SHUTDOWN_READINESS_DELAY_SECONDS", "0")))
+    async with _default_lifespan(app) as state:
+        yield state
+    await registry.stop_warmup()
+    # uvicorn has waited up to timeout_graceful_shutdown for the open connections, streamed runs included
+    if run_limiter.in_flight:
+        logger.warning(f"Shutting down with {run_limiter.in_flight} runs still in flight")
+    # Imported here, not at the top: they pull in SQLAlchemy and agno's storage, which only the agents need
+    from cache.memory import close_memory_extractor
+    from db.engine import dispose_engines
+    from db.storage import close_storages
+    # Memories of the last runs are extracted before the pool is closed
+    await asyncio.to_thread(close_memory_extractor, float(os.getenv("MEMORY_EXTRACTION_CLOSE_SECONDS", "30")))
+    # Sessions still queued by write-behind storage go out before the pool is closed
+    await asyncio.to_thread(close_storages, float(os.getenv("SESSION_WRITE_BEHIND_CLOSE_SECONDS", "10")))
+    dispose_engines()
+
+app.router.lifespan_context = lifespan
+
+# Per-agent build state and run load of this worker, 503 until every agent is ready or while draining
+@app.get("/v1/ready")
+def ready():
+    is_ready = registry.ready and not run_limiter.draining
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "pid": os.getpid(), "agents": registry.status(), "runs": run_limiter.stats()},
+    )
+
+# Connection pool usage of the shared database engines
+@app.get("/v1/db/pool")
+def db_pool_stats():
+    from db.engine import get_pool_stats
+    return get_pool_stats()
+
+def _server_metrics():
+    stats = run_limiter.stats()
+    yield "playground_runs_in_flight", "gauge", "Runs in flight in this worker", [({}, stats["in_flight"])]
+    yield "playground_runs_shed_total", "counter", "Run requests shed with 503", [({}, stats["shed"])]
+    from db.engine import get_pool_stats
+    pools = get_pool_stats()
+    for name, metric_type, key in (
+        ("playground_db_pool_size", "gauge", "size"),
+        ("playground_db_pool_checked_out", "gauge", "checked_out"),
+        ("playground_db_pool_overflow", "gauge", "overflow"),
+        ("playground_db_pool_waits_total", "counter", "waits"),
+        ("playground_db_pool_wait_seconds_total", "counter", "wait_seconds"),
+    ):
+        values = [({"url": url}, pool[key]) for url, pool in pools.items() if key in pool]
+        yield name, metric_type, f"Database connection pool {key.replace('_', ' ')}", values
+
+telemetry.register_collector(_server_metrics)
+
+# Prometheus scrape endpoint; with several workers each scrape reaches one of them, so label targets per worker
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
-    serve_playground_app("main:app",host="0.0.0.0", reload=True)
+    if os.getenv("SERVE_MODE", "dev").lower() == "production":
+        import uvicorn
+        # Every worker process imports main, so each builds its own agents and connection pool
+        uvicorn.run(
+            "main:app",
+            host=os.getenv("HOST", "0.0.0.0"),
+            port=int(os.getenv("PORT", "7777")),
+            workers=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+            # Seconds in-flight (streaming) runs get to finish once the server stops accepting connections
+            timeout_graceful_shutdown=int(os.getenv("SHUTDOWN_DRAIN_SECONDS", "60")),
+            timeout_keep_alive=int(os.getenv("KEEP_ALIVE_SECONDS", "5")),
+            proxy_headers=True,
+            log_level=os.getenv("LOG_LEVEL", "info"),
+        )
+    else:
+        serve_playground_app("main:app",host="0.0.0.0", reload=True)
@@ -0,0 +1,102 @@
+import pytest
+
+from agno.document.base import Document
+from custom.knowledge.crossPageChunking import CrossPageChunking, estimate_tokens
+
+
+def _pages(*texts: str) -> list:
+    return [Document(name="doc", content=text, meta_data={"page": i}) for i, text in enumerate(texts, start=1)]
+
+
+def _sentence(n: int) -> str:
+    # 37 characters, 10 estimated tokens
+    return f"Sentence number {n:03d} is about records."
+
+
+def test_chunks_end_at_sentence_boundaries():
+    text = " ".join(_sentence(i) for i in range(20))
+    chunks = list(CrossPageChunking(chunk_tokens=35).chunk_pages(_pages(text)))
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.content.endswith("records.")
+        assert chunk.meta_data["tokens"] <= 35
+    # Nothing is lost or repeated without overlap
+    assert " ".join(c.content for c in chunks) == text
+
+
+def test_heading_starts_a_new_chunk_and_stays_with_its_text():
+    text = "\n".join([_sentence(1), _sentence(2), "", "2.1 Audit Trail", _sentence(3)])
+    chunks = list(CrossPageChunking(chunk_tokens=100, min_section_tokens=10).chunk_pages(_pages(text)))
+
+    assert [c.content for c in chunks] == [
+        f"{_sentence(1)} {_sentence(2)}",
+        f"2.1 Audit Trail\n{_sentence(3)}",
+    ]
+
+
+def test_heading_below_min_section_tokens_does_not_split():
+    text = "\n".join([_sentence(1), "", "SAMPLE INVENTORY", _sentence(2)])
+    chunks = list(CrossPageChunking(chunk_tokens=100, min_section_tokens=50).chunk_pages(_pages(text)))
+
+    assert len(chunks) == 1
+    assert "\nSAMPLE INVENTORY\n" in chunks[0].content
+
+
+def test_heading_as_first_unit_with_zero_min_section_tokens():
+    chunks = list(CrossPageChunking(chunk_tokens=100, min_section_tokens=0).chunk_pages(_pages("## Setup\n" + _sentence(1))))
+
+    assert [c.content for c in chunks] == [f"## Setup\n{_sentence(1)}"]
+
+
+def test_chunks_span_pages_with_page_and_page_end():
+    pages = _pages(_sentence(1), _sentence(2), " ".join(_sentence(i) for i in range(3, 8)))
+    chunks = list(CrossPageChunking(chunk_tokens=30).chunk_pages(pages))
+
+    positions = [(c.meta_data["page"], c.meta_data["page_end"], c.meta_data["chunk_index"]) for c in chunks]
+    assert positions == [(1, 3, 1), (3, 3, 2), (3, 3, 3)]
+    assert chunks[0].id == "doc_1-3_1"
+    assert chunks[0].content.startswith(f"{_sentence(1)}\n{_sentence(2)}")
+
+
+def test_overlap_repeats_trailing_sentences():
+    text = " ".join(_sentence(i) for i in range(6))
+    chunks = list(CrossPageChunking(chunk_tokens=30, overlap_tokens=10).chunk_pages(_pages(text)))
+
+    assert [c.content for c in chunks] == [
+        " ".join(_sentence(i) for i in (0, 1, 2)),
+        " ".join(_sentence(i) for i in (2, 3, 4)),
+        " ".join(_sentence(i) for i in (4, 5)),
+    ]
+
+
+def test_overlap_must_be_less_than_chunk_tokens():
+    with pytest.raises(ValueError):
+        CrossPageChunking(chunk_tokens=10, overlap_tokens=10)
+
+
+def test_oversized_sentence_is_split_into_word_windows():
+    words = [f"word{i:03d}" for i in range(100)]
+    sentence = " ".join(words) + "."
+    chunks = list(CrossPageChunking(chunk_tokens=20).chunk_pages(_pages(sentence)))
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert estimate_tokens(chunk.content) <= 20
+    assert " ".join(c.content for c in chunks).split() == sentence.split()
+
+
+def test_empty_pages_give_no_chunks():
+    assert list(CrossPageChunking().chunk_pages(_pages("", "   \n  "))) == []
+    assert list(CrossPageChunking().chunk_pages([])) == []
+
+
+def test_overlap_chars_records_the_repeated_text():
+    text = " ".join(_sentence(i) for i in range(6))
+    chunks = list(CrossPageChunking(chunk_tokens=30, overlap_tokens=10).chunk_pages(_pages(text)))
+
+    assert chunks[0].meta_data["overlap_chars"] == 0
+    for before, after in zip(chunks, chunks[1:]):
+        repeated = after.content[: after.meta_data["overlap_chars"]]
+        assert repeated == _sentence(int(repeated.split()[2]))
+        assert before.content.endswith(repeated)
@@ -0,0 +1,65 @@
+import asyncio
+
+from agno.memory.v2.memory import Memory
+from agno.memory.v2.schema import UserMemory
+
+from benchmarks.embedder import HashingEmbedder
+from benchmarks.stubs import MockModel
+from custom.agent.agent import Agent
+from custom.agent.responseCache import ResponseCache
+
+QUESTION = "What is the audit trail for screening?"
+
+
+class _Agent:
+    agent_id = "tester"
+    knowledge = None
+
+
+def test_cached_answers_are_per_user():
+    cache = ResponseCache(embedder=HashingEmbedder(dimensions=64))
+    cached, key = cache.lookup(_Agent(), QUESTION, user_id="alice")
+    assert cached is None
+    cache.store(key, "Alice's answer")
+
+    cached, _ = cache.lookup(_Agent(), QUESTION, user_id="bob")
+    assert cached is None
+    cached, _ = cache.lookup(_Agent(), QUESTION.lower(), user_id="alice")
+    assert cached is not None and cached.content == "Alice's answer"
+
+
+def _agent(cache: ResponseCache) -> Agent:
+    model = MockModel(first_token_latency=0, tokens_per_second=1e6, response_tokens=5, search_tool=None)
+    return Agent(agent_id="tester", model=model, memory=Memory(), response_cache=cache, add_history_to_messages=True)
+
+
+def test_sessions_with_history_and_other_users_do_not_share_answers():
+    cache = ResponseCache(embedder=HashingEmbedder(dimensions=64))
+    agent = _agent(cache)
+
+    async def ask(user_id: str, session_id: str) -> None:
+        await agent.arun(QUESTION, user_id=user_id, session_id=session_id)
+
+    asyncio.run(ask("alice", "s1"))
+    assert (cache.hits, cache.misses, len(cache)) == (0, 1, 1)
+
+    # A follow-up in the same session depends on its history, the cache is not used
+    asyncio.run(ask("alice", "s1"))
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # Another user does not get Alice's answer
+    asyncio.run(ask("bob", "s2"))
+    assert (cache.hits, cache.misses, len(cache)) == (0, 2, 2)
+
+    # The first question of a new session of Alice is answered from the cache
+    asyncio.run(ask("alice", "s3"))
+    assert cache.hits == 1
+
+
+def test_users_with_memories_are_not_cached():
+    agent = _agent(ResponseCache(embedder=HashingEmbedder(dimensions=64)))
+    agent.enable_user_memories = True
+    agent.memory.add_user_memory(UserMemory(memory="Works on the EDC screening module"), user_id="alice")
+
+    assert agent._is_personalized(session_id=None, user_id="alice")
+    assert not agent._is_personalized(session_id=None, user_id="bob")
@@ -0,0 +1,51 @@
+from agno.document.base import Document
+from custom.knowledge.crossPageChunking import CrossPageChunking
+from custom.vectordb.searchPostProcessor import SearchPostProcessor, _join
+
+
+def test_join_without_recorded_overlap_keeps_short_coincidences():
+    assert _join("Total: 10", "0 units shipped") == "Total: 10\n0 units shipped"
+    assert _join("ends with the", "elephant") == "ends with the\nelephant"
+
+
+def test_join_without_recorded_overlap_drops_long_repeats():
+    repeated = "The pump is calibrated every month."
+    assert _join(f"Intro. {repeated}", f"{repeated} Then more.") == f"Intro. {repeated} Then more."
+
+
+def test_join_with_recorded_overlap():
+    assert _join("Total: 10", "0 units shipped", overlap_chars=0) == "Total: 10\n0 units shipped"
+    assert _join("First. Second.", "Second. Third.", overlap_chars=7) == "First. Second. Third."
+    # A recorded overlap that is not there is not dropped
+    assert _join("First.", "Second. Third.", overlap_chars=7) == "First.\nSecond. Third."
+
+
+def _chunks(overlap_tokens: int) -> list:
+    text = " ".join(f"Sentence number {i:03d} is about records." for i in range(6))
+    pages = [Document(name="doc", content=text, meta_data={"page": 1})]
+    chunks = list(CrossPageChunking(chunk_tokens=30, overlap_tokens=overlap_tokens).chunk_pages(pages))
+    for i, chunk in enumerate(chunks):
+        chunk.embedding = [1.0, float(i)]
+    return text, chunks
+
+
+def test_merging_adjacent_chunks_restores_the_text():
+    for overlap_tokens in (0, 10):
+        text, chunks = _chunks(overlap_tokens)
+        processor = SearchPostProcessor(duplicate_threshold=1, mmr_lambda=1)
+        [merged] = processor.process(chunks, limit=1)
+
+        assert merged.meta_data["merged_chunks"] == len(chunks)
+        assert merged.content.replace("\n", " ") == text
+
+
+def test_chunks_of_same_named_files_are_not_merged():
+    chunks = [
+        Document(name="report", content=f"Chunk {i}.", meta_data={"source": source, "page": 1, "chunk": i, "page_chunks": 2})
+        for source, i in (("a/report.pdf", 1), ("b/report.pdf", 2))
+    ]
+    for i, chunk in enumerate(chunks):
+        chunk.embedding = [1.0, float(i)]
+    results = SearchPostProcessor(duplicate_threshold=1, mmr_lambda=1).process(chunks, limit=2)
+
+    assert [r.content for r in results] == ["Chunk 1.", "Chunk 2."]
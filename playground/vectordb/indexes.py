@@ -0,0 +1,77 @@
+"""
+Manage the ANN indexes of the knowledge tables.
+
+    python -m vectordb.indexes report [table ...]
+    python -m vectordb.indexes create [table ...]
+    python -m vectordb.indexes rebuild [--concurrently] [table ...]
+
+Tables default to the knowledge tables of the agents. Index type and build
+parameters come from the PGVECTOR_INDEX* env vars (see vectordb/pgvector.py).
+create and rebuild also add the stored tsvector column and GIN index hybrid
+search uses, when a table does not have them yet. In shared-corpus mode every
+corpus registered for the table has its own partial index, managed one by one.
+"""
+import argparse
+import json
+import os
+from typing import Dict, List
+
+from agno.embedder import Embedder
+
+from custom.vectordb.corpusRegistry import CorpusRegistry
+from custom.vectordb.pgVector import PgVector
+from db.engine import get_db_engine
+from embedder.google import get_google_embedder
+from vectordb.pgvector import get_pgvector
+
+
+def get_knowledge_tables() -> List[str]:
+    if os.getenv("KNOWLEDGE_SHARED_CORPUS", "false").lower() == "true":
+        return [os.getenv("KNOWLEDGE_CORPUS_TABLE", "knowledge-corpus")]
+    return [
+        os.getenv("CRONOS_KNOWLEDGE_TABLE", "cronos-knowledge"),
+        os.getenv("BABE_TESTER_KNOWLEDGE_TABLE", "babe-tester-knowledge"),
+        os.getenv("EDC_TESTER_KNOWLEDGE_TABLE", "edc-tester-knowledge"),
+    ]
+
+
+def get_index_vectordbs(table_name: str, embedder: Embedder) -> Dict[str, PgVector]:
+    """PgVectors owning the ANN indexes of a table, by report key: one per corpus of a shared table"""
+    if os.getenv("KNOWLEDGE_SHARED_CORPUS", "false").lower() != "true":
+        return {table_name: get_pgvector(table_name=table_name, embedder=embedder)}
+    corpora = [c["corpus"] for c in CorpusRegistry(db_engine=get_db_engine()).list() if c["table_name"] == table_name]
+    return {
+        f"{table_name}:{corpus}": get_pgvector(table_name=table_name, embedder=embedder, corpus=corpus)
+        for corpus in corpora
+    }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Manage the ANN indexes of the knowledge tables")
+    parser.add_argument("command", choices=["report", "create", "rebuild"])
+    parser.add_argument("tables", nargs="*")
+    parser.add_argument("--concurrently", action="store_true", help="Rebuild without blocking writes")
+    args = parser.parse_args()
+
+    embedder = get_google_embedder()
+    report = {}
+    for table_name in args.tables or get_knowledge_tables():
+        vectordbs = get_index_vectordbs(table_name, embedder)
+        if not vectordbs:
+            report[table_name] = "no corpora"
+            continue
+        for key, vectordb in vectordbs.items():
+            if not vectordb.table_exists():
+                report[key] = "missing"
+                continue
+            if args.command in ("create", "rebuild"):
+                vectordb.ensure_text_search()
+            if args.command == "create":
+                vectordb.create_vector_index()
+            elif args.command == "rebuild":
+                vectordb.create_vector_index(force_recreate=True, concurrently=args.concurrently)
+            report[key] = {"last_build": vectordb.last_index_build, "indexes": vectordb.index_report()}
+    print(json.dumps(report, indent=2, default=str))
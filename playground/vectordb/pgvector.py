@@ -1,14 +1,87 @@
 import os
-from agno.vectordb.pgvector import PgVector, SearchType
+from typing import Optional, Union
+from agno.vectordb.pgvector import HNSW, Ivfflat, SearchType
 from agno.embedder import Embedder
+from sqlalchemy.engine import Engine
+
+from custom.vectordb.pgVector import PgVector
+from custom.vectordb.searchPostProcessor import SearchPostProcessor
+from db.engine import get_db_engine
+
+
+def get_vector_index(ef_search: Optional[int] = None, probes: Optional[int] = None) -> Optional[Union[HNSW, Ivfflat]]:
+    """
+    ANN index of the knowledge tables, from PGVECTOR_INDEX (hnsw, ivfflat or none).
+
+    Build parameters are per table, ef_search / probes are query-time recall knobs
+    that each agent can override.
+    """
+    index_type = os.getenv("PGVECTOR_INDEX", "hnsw").lower()
+    configuration = {"maintenance_work_mem": os.getenv("PGVECTOR_MAINTENANCE_WORK_MEM", "512MB")}
+    if index_type == "hnsw":
+        return HNSW(
+            m=int(os.getenv("PGVECTOR_HNSW_M", "16")),
+            ef_construction=int(os.getenv("PGVECTOR_HNSW_EF_CONSTRUCTION", "64")),
+            ef_search=ef_search or int(os.getenv("PGVECTOR_HNSW_EF_SEARCH", "40")),
+            configuration=configuration,
+        )
+    if index_type == "ivfflat":
+        # 0 lists: size the index from the row count when it is built
+        lists = int(os.getenv("PGVECTOR_IVFFLAT_LISTS", "0"))
+        return Ivfflat(
+            lists=lists or 100,
+            dynamic_lists=lists == 0,
+            probes=probes or int(os.getenv("PGVECTOR_IVFFLAT_PROBES", "10")),
+            configuration=configuration,
+        )
+    return None
+
+
+def get_search_post_processor() -> Optional[SearchPostProcessor]:
+    """Retrieval post-processing of the knowledge searches, None when SEARCH_POST_PROCESSING is not "true"."""
+    if os.getenv("SEARCH_POST_PROCESSING", "true").lower() != "true":
+        return None
+    return SearchPostProcessor(
+        candidate_multiplier=int(os.getenv("SEARCH_CANDIDATE_MULTIPLIER", "4")),
+        duplicate_threshold=float(os.getenv("SEARCH_DUPLICATE_THRESHOLD", "0.95")),
+        mmr_lambda=float(os.getenv("SEARCH_MMR_LAMBDA", "0.7")),
+        merge_adjacent=os.getenv("SEARCH_MERGE_ADJACENT", "true").lower() == "true",
+        max_merged_chars=int(os.getenv("SEARCH_MAX_MERGED_CHARS", "6000")),
+    )
+
+
+def get_pgvector(
+    table_name: str,
+    embedder: Embedder,
+    corpus: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    db_engine: Optional[Engine] = None,
+)-> PgVector:
+    # Shared-corpus mode: one physical table, each corpus is a filtered view of it
+    if corpus is not None and os.getenv("KNOWLEDGE_SHARED_CORPUS", "false").lower() == "true":
+        table_name = os.getenv("KNOWLEDGE_CORPUS_TABLE", "knowledge-corpus")
+    else:
+        corpus = None
 
-def get_pgvector(table_name: str, embedder: Embedder)-> PgVector:
-    db_url=os.getenv("PGVECTOR_URI", "postgresql+psycopg://ai:ai@localhost:5532/ai")
     pgvector = PgVector(
         table_name=table_name, 
-        db_url=db_url, 
+        # A separate engine keeps e.g. the indexer off the serving pool
+        db_engine=db_engine or get_db_engine(),
         search_type=SearchType.hybrid,
-        embedder=embedder
+        embedder=embedder,
+        corpus=corpus,
+        vector_index=get_vector_index(ef_search=ef_search, probes=probes),
+        # Load through binary COPY + one merge statement instead of row inserts
+        bulk_load=os.getenv("PGVECTOR_BULK_LOAD", "false").lower() == "true",
+        # Rebuild ANN indexes once after a full reload instead of maintaining them per row
+        defer_index_build=os.getenv("PGVECTOR_DEFER_INDEX_BUILD", "true").lower() == "true",
+        # Hybrid search: reciprocal rank fusion of the vector and keyword top candidates
+        vector_score_weight=float(os.getenv("PGVECTOR_HYBRID_VECTOR_WEIGHT", "0.5")),
+        hybrid_candidates=int(os.getenv("PGVECTOR_HYBRID_CANDIDATES", "40")),
+        rrf_k=int(os.getenv("PGVECTOR_RRF_K", "60")),
+        # Near-duplicate suppression, MMR and adjacent chunk merging over a larger candidate pool
+        post_processor=get_search_post_processor(),
     )
 
     return pgvector